@@ -0,0 +1,232 @@
+# analytics.py
+"""
+Relatórios de vendas de uma loja (ou de todo o marketplace) sobre o
+histórico de pedidos: receita, pedidos e ticket médio contra o período
+anterior, distribuição do tamanho das cestas e velocidade de cada produto.
+
+As colunas necessárias são lidas em lote para buffers compactos (array) e
+agregadas de forma vetorizada com NumPy. O NumPy é opcional: sem ele os
+mesmos números são calculados em Python puro sobre os buffers, sem criar um
+dict por linha.
+
+Os resultados ficam em cache por (vendedor, janela). Cada pedido novo
+(evento "pedido" do db.py) muda a versão da loja e do marketplace, e o
+relatório é recalculado na próxima leitura.
+"""
+import threading
+from array import array
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import db
+from cache import CacheTTL
+
+try:
+    import numpy as np
+except ImportError:  # NumPy não instalado: usa o cálculo em Python puro
+    np = None
+
+LOTE = 5000  # linhas lidas por fetchmany
+TTL_CACHE = 300  # segundos; "hoje" muda e pedidos antigos podem ser alterados fora do app
+# Faixas do tamanho da cesta (unidades por pedido): (rótulo, mínimo, máximo)
+FAIXAS_CESTA = [("1", 1, 1), ("2", 2, 2), ("3", 3, 3), ("4-5", 4, 5), ("6-10", 6, 10), ("11+", 11, None)]
+
+_cache = CacheTTL(max_itens=256, ttl=TTL_CACHE)
+_lock = threading.Lock()
+_versoes = {}  # vendedor_id (None = marketplace) -> versão
+
+
+def _novo_pedido(vendedor_id):
+    with _lock:
+        _versoes[vendedor_id] = _versoes.get(vendedor_id, 0) + 1
+        _versoes[None] = _versoes.get(None, 0) + 1
+
+
+db.ouvir("pedido", _novo_pedido)
+
+
+def get_cache_stats():
+    return _cache.stats()
+
+
+# --- LEITURA EM LOTE ---
+def _carregar(consulta, params, tipos):
+    """Lê as colunas da consulta em um array por coluna ('q' inteiro, 'd' real), LOTE linhas por vez."""
+    colunas = [array(tipo) for tipo in tipos]
+    conn = db.get_connection()
+    try:
+        cursor = conn.execute(db.CONSULTAS[consulta], params)
+        while True:
+            linhas = cursor.fetchmany(LOTE)
+            if not linhas:
+                break
+            for coluna, valores in zip(colunas, zip(*linhas)):
+                coluna.extend(valores)
+    finally:
+        conn.close()
+    return colunas
+
+
+def _variacao(atual, anterior):
+    return (atual - anterior) / anterior if anterior else None
+
+
+def _percentil(valores_ordenados, q):
+    """Interpolação linear, igual ao padrão do numpy.percentile."""
+    if not valores_ordenados:
+        return 0.0
+    posicao = (len(valores_ordenados) - 1) * q
+    abaixo = int(posicao)
+    acima = min(abaixo + 1, len(valores_ordenados) - 1)
+    return valores_ordenados[abaixo] + (valores_ordenados[acima] - valores_ordenados[abaixo]) * (posicao - abaixo)
+
+
+# --- AGREGAÇÃO ---
+# As duas versões recebem as colunas (a primeira de cada tabela é 1 para o
+# período atual e 0 para o anterior) e retornam os mesmos números.
+def _agregar_numpy(pedidos, itens, top):
+    periodo_pedido, total = (np.frombuffer(c, dtype=t) for c, t in zip(pedidos, (np.int64, np.float64)))
+    periodo_item, pedido_id, produto_id, quantidade, preco = (
+        np.frombuffer(c, dtype=t) for c, t in zip(itens, (np.int64, np.int64, np.int64, np.int64, np.float64))
+    )
+
+    atual = periodo_pedido != 0
+    resumo = {
+        "receita": (float(total[atual].sum()), float(total[~atual].sum())),
+        "pedidos": (int(atual.sum()), int((~atual).sum())),
+    }
+
+    item_atual = periodo_item != 0
+    # Unidades por pedido no período atual
+    _, posicao_pedido = np.unique(pedido_id[item_atual], return_inverse=True)
+    unidades = np.bincount(posicao_pedido, weights=quantidade[item_atual])
+    bordas = [f[1] for f in FAIXAS_CESTA] + [np.inf]
+    contagens, _ = np.histogram(unidades, bins=bordas)
+    resumo["cesta"] = {
+        "media": float(unidades.mean()) if unidades.size else 0.0,
+        "p50": float(np.percentile(unidades, 50)) if unidades.size else 0.0,
+        "p90": float(np.percentile(unidades, 90)) if unidades.size else 0.0,
+        "contagens": [int(c) for c in contagens],
+    }
+
+    # Unidades e receita por produto (np.unique ordena os ids: desempate pelo menor id)
+    produtos, posicao_produto = np.unique(produto_id, return_inverse=True)
+    n = len(produtos)
+    qtd_atual = np.bincount(posicao_produto, weights=np.where(item_atual, quantidade, 0), minlength=n)
+    qtd_anterior = np.bincount(posicao_produto, weights=np.where(item_atual, 0, quantidade), minlength=n)
+    receita = np.bincount(posicao_produto, weights=np.where(item_atual, quantidade * preco, 0.0), minlength=n)
+    ordem = np.argsort(-qtd_atual, kind="stable")[:top]
+    resumo["produtos"] = [
+        (int(produtos[i]), int(qtd_atual[i]), float(receita[i]), int(qtd_anterior[i]))
+        for i in ordem if qtd_atual[i] > 0
+    ]
+    return resumo
+
+
+def _agregar_python(pedidos, itens, top):
+    receita = [0.0, 0.0]
+    contagem = [0, 0]
+    for atual, total in zip(*pedidos):
+        periodo = 0 if atual else 1
+        receita[periodo] += total
+        contagem[periodo] += 1
+    resumo = {"receita": tuple(receita), "pedidos": tuple(contagem)}
+
+    unidades_pedido = defaultdict(int)
+    qtd_atual = defaultdict(int)
+    qtd_anterior = defaultdict(int)
+    receita_produto = defaultdict(float)
+    for atual, pedido_id, produto_id, quantidade, preco in zip(*itens):
+        if atual:
+            unidades_pedido[pedido_id] += quantidade
+            qtd_atual[produto_id] += quantidade
+            receita_produto[produto_id] += quantidade * preco
+        else:
+            qtd_anterior[produto_id] += quantidade
+
+    unidades = sorted(unidades_pedido.values())
+    contagens = [0] * len(FAIXAS_CESTA)
+    for valor in unidades:
+        for i, (_, minimo, maximo) in enumerate(FAIXAS_CESTA):
+            if valor >= minimo and (maximo is None or valor <= maximo):
+                contagens[i] += 1
+                break
+    resumo["cesta"] = {
+        "media": sum(unidades) / len(unidades) if unidades else 0.0,
+        "p50": float(_percentil(unidades, 0.5)),
+        "p90": float(_percentil(unidades, 0.9)),
+        "contagens": contagens,
+    }
+
+    mais_vendidos = sorted((p for p in qtd_atual if qtd_atual[p] > 0), key=lambda p: (-qtd_atual[p], p))[:top]
+    resumo["produtos"] = [(p, qtd_atual[p], receita_produto[p], qtd_anterior[p]) for p in mais_vendidos]
+    return resumo
+
+
+# --- API ---
+def relatorio_vendas(vendedor_id=None, dias=30, fim=None, top=20):
+    """
+    Relatório dos 'dias' que terminam em 'fim' (date, inclusive; padrão: hoje
+    em UTC, como as datas dos pedidos), comparado aos 'dias' anteriores.
+    vendedor_id=None cobre todo o marketplace.
+
+    Retorna:
+      {"inicio", "fim", "dias",
+       "receita" / "pedidos" / "ticket_medio": {"atual", "anterior", "variacao"},
+       "cesta": {"media", "p50", "p90", "distribuicao": [(faixa, pedidos)]},
+       "produtos": [{"produto_id", "nome", "quantidade", "receita", "velocidade", "velocidade_anterior"}]}
+    'variacao' é relativa (0.1 = +10%) ou None sem base de comparação;
+    'velocidade' é em unidades por dia.
+    """
+    fim = fim or datetime.now(timezone.utc).date()
+    with _lock:
+        versao = _versoes.get(vendedor_id, 0)
+    chave = (vendedor_id, dias, fim, top, versao)
+    achou, relatorio = _cache.get(chave)
+    if achou:
+        return relatorio
+
+    inicio = fim - timedelta(days=dias - 1)
+    # Lê os dois períodos (anterior + atual) de uma vez
+    periodo = ((fim - timedelta(days=2 * dias - 1)).isoformat(), (fim + timedelta(days=1)).isoformat())
+    if vendedor_id is None:
+        pedidos = _carregar("analytics_pedidos_todos", (inicio.isoformat(), *periodo), "qd")
+        itens = _carregar("analytics_itens_todos", (inicio.isoformat(), *periodo), "qqqqd")
+    else:
+        pedidos = _carregar("analytics_pedidos", (inicio.isoformat(), vendedor_id, *periodo), "qd")
+        itens = _carregar("analytics_itens", (inicio.isoformat(), vendedor_id, *periodo), "qqqqd")
+
+    agregar = _agregar_numpy if np is not None else _agregar_python
+    resumo = agregar(pedidos, itens, top)
+
+    (receita, receita_anterior), (n_pedidos, n_anterior) = resumo["receita"], resumo["pedidos"]
+    ticket = receita / n_pedidos if n_pedidos else 0.0
+    ticket_anterior = receita_anterior / n_anterior if n_anterior else 0.0
+    nomes = db.get_produtos_resumo([p[0] for p in resumo["produtos"]])
+    relatorio = {
+        "inicio": inicio,
+        "fim": fim,
+        "dias": dias,
+        "receita": {"atual": receita, "anterior": receita_anterior, "variacao": _variacao(receita, receita_anterior)},
+        "pedidos": {"atual": n_pedidos, "anterior": n_anterior, "variacao": _variacao(n_pedidos, n_anterior)},
+        "ticket_medio": {"atual": ticket, "anterior": ticket_anterior, "variacao": _variacao(ticket, ticket_anterior)},
+        "cesta": {
+            "media": resumo["cesta"]["media"],
+            "p50": resumo["cesta"]["p50"],
+            "p90": resumo["cesta"]["p90"],
+            "distribuicao": [(faixa[0], n) for faixa, n in zip(FAIXAS_CESTA, resumo["cesta"]["contagens"])],
+        },
+        "produtos": [
+            {
+                "produto_id": produto_id,
+                "nome": nomes[produto_id]["nome"] if produto_id in nomes else None,
+                "quantidade": quantidade,
+                "receita": receita_produto,
+                "velocidade": quantidade / dias,
+                "velocidade_anterior": quantidade_anterior / dias,
+            }
+            for produto_id, quantidade, receita_produto, quantidade_anterior in resumo["produtos"]
+        ],
+    }
+    _cache.set(chave, relatorio)
+    return relatorio
@@ -0,0 +1,133 @@
+# bench_analytics.py
+"""
+Benchmark: relatório de vendas de todo o marketplace (analytics.relatorio_vendas)
+comparado ao cálculo linha a linha sobre dict(row), como os helpers do db.py fazem.
+
+Mede o cálculo sem cache, com NumPy (se instalado) e com o fallback em Python
+puro sobre os buffers array, e confere que os três chegam à mesma receita.
+
+    python bench_analytics.py [n_pedidos] [dias]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["APP_DB_PATH"] = os.path.join(_tmp.name, "bench_analytics.db")
+
+import db  # noqa: E402  (precisa do APP_DB_PATH definido antes)
+import analytics  # noqa: E402
+
+N_LOJAS = 50
+N_PRODUTOS = 5000
+FIM = date(2026, 1, 31)
+REPETICOES = 3
+
+
+def preparar(n_pedidos, dias):
+    db.init_db()
+    random.seed(42)
+
+    def _popular(conn):
+        conn.execute("INSERT INTO users (id, name, email, password, ativo) VALUES (1, 'Comprador', 'c@x.com', 'x', 1)")
+        conn.executemany(
+            "INSERT INTO vendedor (id, tipo_pessoa, name, email, cnpj, telefone, rua, numero, bairro, cidade, estado, cep, password, ativo, slug) "
+            "VALUES (?, 'Pessoa Jurídica', ?, ?, ?, '0', 'r', '1', 'b', 'Campinas', 'SP', '0', 'x', 1, ?)",
+            [(v, f"Loja {v}", f"l{v}@x.com", str(v), f"loja-{v}") for v in range(1, N_LOJAS + 1)],
+        )
+        conn.executemany(
+            "INSERT INTO produto (id, vendedor_id, nome, descricao, preco, quantidade, ativo) VALUES (?, ?, ?, '', 10.0, 100, 1)",
+            [(i, i % N_LOJAS + 1, f"Produto {i}") for i in range(1, N_PRODUTOS + 1)],
+        )
+        pedidos = []
+        itens = []
+        for pedido_id in range(1, n_pedidos + 1):
+            dia = FIM - timedelta(days=random.randrange(2 * dias))
+            pedidos.append((pedido_id, random.randint(1, N_LOJAS), 0.0, f"{dia.isoformat()} {random.randrange(24):02d}:00:00"))
+            for produto_id in random.sample(range(1, N_PRODUTOS + 1), random.randint(1, 6)):
+                itens.append((pedido_id, produto_id, random.randint(1, 3), round(random.uniform(5, 200), 2)))
+        conn.executemany(
+            "INSERT INTO pedidos (id, comprador_id, vendedor_id, total, status, data_pedido) VALUES (?, 1, ?, ?, 'Entregue', ?)",
+            pedidos,
+        )
+        conn.executemany("INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unitario) VALUES (?, ?, ?, ?)", itens)
+        conn.execute("UPDATE pedidos SET total = (SELECT SUM(quantidade * preco_unitario) FROM itens_pedido WHERE pedido_id = pedidos.id)")
+
+    inicio = time.perf_counter()
+    db.executar_escrita(_popular, agrupar=False)
+    print(f"{n_pedidos} pedidos gerados em {time.perf_counter() - inicio:.1f}s")
+
+
+def linha_a_linha(dias):
+    """Mesmo relatório no estilo dos helpers do db.py: fetchall + dict(row) + laço em Python."""
+    inicio = FIM - timedelta(days=dias - 1)
+    params = ((FIM - timedelta(days=2 * dias - 1)).isoformat(), (FIM + timedelta(days=1)).isoformat())
+    conn = db.get_connection()
+    conn.row_factory = sqlite3.Row
+    try:
+        pedidos = [dict(row) for row in conn.execute(
+            "SELECT id, data_pedido, total FROM pedidos WHERE data_pedido >= ? AND data_pedido < ?", params)]
+        itens = [dict(row) for row in conn.execute(
+            "SELECT p.data_pedido, i.* FROM pedidos p JOIN itens_pedido i ON i.pedido_id = p.id "
+            "WHERE p.data_pedido >= ? AND p.data_pedido < ?", params)]
+    finally:
+        conn.close()
+    receita = defaultdict(float)
+    for pedido in pedidos:
+        atual = pedido["data_pedido"][:10] >= inicio.isoformat()
+        receita[atual] += pedido["total"]
+    unidades = defaultdict(int)
+    por_produto = defaultdict(int)
+    for item in itens:
+        if item["data_pedido"][:10] >= inicio.isoformat():
+            unidades[item["pedido_id"]] += item["quantidade"]
+            por_produto[item["produto_id"]] += item["quantidade"]
+    sorted(unidades.values())
+    sorted(por_produto.items(), key=lambda p: -p[1])[:20]
+    return receita[True]
+
+
+def medir(fn):
+    tempos = []
+    for _ in range(REPETICOES):
+        analytics._cache.invalidar()
+        inicio = time.perf_counter()
+        resultado = fn()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos) * 1000, resultado
+
+
+def main():
+    n_pedidos = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    dias = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+    preparar(n_pedidos, dias)
+    print(f"Relatório do marketplace, {dias} dias contra os {dias} anteriores:")
+
+    tempo, receita = medir(lambda: linha_a_linha(dias))
+    print(f"{'dict(row)':<14}{tempo:>9.0f}ms  receita {receita:,.2f}")
+
+    numpy = analytics.np
+    if numpy is not None:
+        tempo, relatorio = medir(lambda: analytics.relatorio_vendas(None, dias, FIM))
+        print(f"{'numpy':<14}{tempo:>9.0f}ms  receita {relatorio['receita']['atual']:,.2f}")
+    else:
+        print("numpy         não instalado")
+
+    analytics.np = None
+    tempo, relatorio = medir(lambda: analytics.relatorio_vendas(None, dias, FIM))
+    print(f"{'array':<14}{tempo:>9.0f}ms  receita {relatorio['receita']['atual']:,.2f}")
+    analytics.np = numpy
+
+    inicio = time.perf_counter()
+    analytics.relatorio_vendas(None, dias, FIM)
+    analytics.relatorio_vendas(None, dias, FIM)
+    print(f"{'em cache':<14}{(time.perf_counter() - inicio) * 1e6 / 2:>9.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# bench_busca.py
+"""
+Benchmark: busca de produtos pelo índice FTS5 (db.search_produtos) comparada
+com a varredura LIKE '%termo%' em nome/descrição.
+
+    python bench_busca.py [n_produtos]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["APP_DB_PATH"] = os.path.join(_tmp.name, "bench_busca.db")
+
+import db  # noqa: E402  (precisa do APP_DB_PATH definido antes)
+
+PALAVRAS = (
+    "camiseta calça tênis boné mochila caneca café chá chocolate bolo pão queijo "
+    "azul vermelho preto branco algodão couro orgânico artesanal premium infantil "
+    "feminino masculino kit presente promoção grande pequeno médio"
+).split()
+
+CONSULTAS = ["camiseta azul", "cafe", "choc", "kit presente artesanal", "tênis couro preto", "premium"]
+REPETICOES = 20
+
+
+def vocabulario(n=5000):
+    """Palavras do catálogo com frequência de Zipf: poucas muito comuns, muitas raras."""
+    random.seed(42)
+    silabas = ["ba", "ca", "da", "fe", "go", "la", "mi", "no", "pa", "ri", "sa", "to", "vu", "xe", "zo"]
+    palavras = list(PALAVRAS)
+    while len(palavras) < n:
+        palavras.append("".join(random.choices(silabas, k=random.randint(2, 4))))
+    pesos = [1 / (i + 1) for i in range(len(palavras))]
+    return palavras, pesos
+
+
+def preparar(n_produtos, n_lojas=200):
+    db.init_db()
+    random.seed(42)
+    palavras, pesos = vocabulario()
+    random.seed(43)
+
+    def _popular(conn):
+        conn.executemany(
+            "INSERT INTO vendedor (tipo_pessoa, name, email, cnpj, telefone, rua, numero, bairro, cidade, cidade_busca, estado, cep, password, ativo, slug) "
+            "VALUES ('Pessoa Jurídica', ?, ?, ?, '0', 'r', '1', 'b', ?, ?, 'SP', '0', 'x', 1, ?)",
+            [
+                (f"Loja {i}", f"loja{i}@x.com", str(i), f"São Paulo {i % 10}", db._generate_slug(f"São Paulo {i % 10}"), f"loja-{i}")
+                for i in range(n_lojas)
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO produto (vendedor_id, nome, descricao, preco, quantidade, ativo) VALUES (?, ?, ?, ?, 10, 1)",
+            [
+                (
+                    random.randint(1, n_lojas),
+                    " ".join(random.choices(palavras, pesos, k=3)),
+                    " ".join(random.choices(palavras, pesos, k=12)),
+                    random.uniform(5, 500),
+                )
+                for _ in range(n_produtos)
+            ],
+        )
+
+    inicio = time.perf_counter()
+    db.executar_escrita(_popular, agrupar=False)
+    print(f"{n_produtos} produtos inseridos (com os gatilhos do FTS) em {time.perf_counter() - inicio:.1f}s")
+
+
+def medir(fn):
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return tempos[len(tempos) // 2] * 1000, tempos[int(len(tempos) * 0.95) - 1] * 1000
+
+
+def like(termo):
+    conn = db.get_connection()
+    try:
+        padroes = [f"%{p}%" for p in termo.split()]
+        filtro = " AND ".join("(nome LIKE ? OR descricao LIKE ?)" for _ in padroes)
+        params = [p for padrao in padroes for p in (padrao, padrao)]
+        return conn.execute(f"SELECT id FROM produto WHERE ativo = 1 AND {filtro} LIMIT 20", params).fetchall()
+    finally:
+        conn.close()
+
+
+def conferir_cidade(termo):
+    """O filtro de cidade não diferencia maiúsculas nem acentos, nem fora do ASCII."""
+    esperado = [p["id"] for p in db.search_produtos(termo, cidade="São Paulo 3")]
+    assert esperado, termo
+    for grafia in ("SÃO PAULO 3", "são paulo 3", "Sao Paulo 3", "  sao  paulo 3 "):
+        assert [p["id"] for p in db.search_produtos(termo, cidade=grafia)] == esperado, grafia
+
+
+def main():
+    n_produtos = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    preparar(n_produtos)
+    # Palavra rara (cauda do vocabulário): o LIKE precisa varrer a tabela inteira
+    CONSULTAS.append(vocabulario()[0][-1])
+    conferir_cidade("cafe")
+    print(f"{'consulta':<26}{'FTS5 p50':>10}{'FTS5 p95':>10}{'cidade p50':>12}{'LIKE p50':>10}")
+    for termo in CONSULTAS:
+        fts50, fts95 = medir(lambda: db.search_produtos(termo))
+        cid50, _ = medir(lambda: db.search_produtos(termo, cidade="SÃO PAULO 3"))
+        like50, _ = medir(lambda: like(termo))
+        print(f"{termo:<26}{fts50:>8.1f}ms{fts95:>8.1f}ms{cid50:>10.1f}ms{like50:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# bench_login.py
+"""
+Benchmark: logins por segundo com senhas em hash (senhas.py).
+
+Para cada configuração de KDF, cria usuários com create_user e dispara logins
+de várias threads ao mesmo tempo (como os handlers de várias sessões). Mostra
+logins/s no total e por núcleo (threads do pool de senhas), a latência do
+login e a de uma leitura simples feita durante a carga, que não passa pelo
+pool de senhas e não deveria ficar mais lenta.
+
+    python bench_login.py [n_logins] [threads_clientes]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["APP_DB_PATH"] = os.path.join(_tmp.name, "bench_login.db")
+
+import db  # noqa: E402  (precisa do APP_DB_PATH definido antes)
+import senhas  # noqa: E402
+
+N_USUARIOS = 20
+CONFIGURACOES = [
+    ("scrypt n=2^14", {"algoritmo": "scrypt", "scrypt_n": 2 ** 14, "scrypt_r": 8, "scrypt_p": 1}),
+    ("scrypt n=2^15", {"algoritmo": "scrypt", "scrypt_n": 2 ** 15, "scrypt_r": 8, "scrypt_p": 1}),
+    ("pbkdf2 600k", {"algoritmo": "pbkdf2_sha256", "pbkdf2_iteracoes": 600_000}),
+    ("pbkdf2 100k", {"algoritmo": "pbkdf2_sha256", "pbkdf2_iteracoes": 100_000}),
+]
+
+
+def percentil(valores, q):
+    valores = sorted(valores)
+    return valores[min(int(len(valores) * q), len(valores) - 1)]
+
+
+def medir(nome, prefixo, n_logins, clientes):
+    usuario = db.User()
+    emails = [f"{prefixo}{i}@bench.com" for i in range(N_USUARIOS)]
+    for email in emails:
+        usuario.create_user("Cliente", email, "senha-do-cliente")
+
+    latencias_leitura = []
+    parar = threading.Event()
+
+    def leitor():
+        # Consulta sem KDF no meio da carga de logins
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            db.get_vendedor_by_slug("nao-existe")
+            latencias_leitura.append(time.perf_counter() - inicio)
+            time.sleep(0.005)
+
+    def logar(i):
+        inicio = time.perf_counter()
+        assert db.autenticar(emails[i % N_USUARIOS], "senha-do-cliente")
+        return time.perf_counter() - inicio
+
+    thread_leitor = threading.Thread(target=leitor)
+    thread_leitor.start()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as executor:
+        latencias = list(executor.map(logar, range(n_logins)))
+    total = time.perf_counter() - inicio
+    parar.set()
+    thread_leitor.join()
+
+    por_segundo = n_logins / total
+    print(
+        f"{nome:<16}{por_segundo:>9.1f}{por_segundo / senhas.CONFIG['threads']:>10.1f}"
+        f"{statistics.median(latencias) * 1000:>10.0f}{percentil(latencias, 0.95) * 1000:>10.0f}"
+        f"{statistics.median(latencias_leitura) * 1000:>12.2f}"
+    )
+
+
+def main():
+    n_logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    clientes = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    db.init_db()
+    print(f"{n_logins} logins de {clientes} threads; pool de senhas com {senhas.CONFIG['threads']} thread(s)")
+    print(f"{'KDF':<16}{'logins/s':>9}{'/núcleo':>10}{'p50 ms':>10}{'p95 ms':>10}{'leitura ms':>12}")
+    padrao = dict(senhas.CONFIG)
+    for indice, (nome, config) in enumerate(CONFIGURACOES):
+        senhas.CONFIG.update(config)
+        medir(nome, f"c{indice}_", n_logins, clientes)
+        senhas.CONFIG.update(padrao)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# bench_pedidos.py
+"""
+Benchmark: pedidos por segundo no checkout com carrinhos de muitos itens.
+
+Compara o caminho antigo (um INSERT e um UPDATE por item, sem conferir o
+estoque) com o db.create_pedido atual (baixa condicional de estoque e
+itens com executemany), com vários compradores ao mesmo tempo.
+No final confere que nenhum estoque ficou negativo.
+
+Também compara um carrinho com várias lojas finalizado loja por loja com o
+db.checkout_carrinho (todos os pedidos em um único job de escrita).
+
+    python bench_pedidos.py [segundos] [compradores] [itens_por_pedido]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["APP_DB_PATH"] = os.path.join(_tmp.name, "bench_pedidos.db")
+
+import db  # noqa: E402  (precisa do APP_DB_PATH definido antes)
+
+N_PRODUTOS = 2000
+N_LOJAS = 5
+ENDERECO = {"rua": "Rua A", "numero": "1", "bairro": "Centro", "cidade": "Campinas", "estado": "SP", "cep": "13000-000"}
+
+
+def preparar(estoque):
+    db.init_db()
+
+    def _popular(conn):
+        conn.execute("INSERT OR IGNORE INTO users (id, name, email, password, ativo) VALUES (1, 'Comprador', 'c@x.com', 'x', 1)")
+        conn.executemany(
+            "INSERT OR IGNORE INTO vendedor (id, tipo_pessoa, name, email, cnpj, telefone, rua, numero, bairro, cidade, estado, cep, password, ativo, slug) "
+            "VALUES (?, 'Pessoa Jurídica', ?, ?, ?, '0', 'r', '1', 'b', 'Campinas', 'SP', '0', 'x', 1, ?)",
+            [(v, f"Loja {v}", f"l{v}@x.com", str(v), f"loja-{v}") for v in range(1, N_LOJAS + 1)],
+        )
+        conn.execute("DELETE FROM itens_pedido")
+        conn.execute("DELETE FROM pedidos")
+        conn.execute("DELETE FROM produto")
+        conn.executemany(
+            "INSERT INTO produto (id, vendedor_id, nome, descricao, preco, quantidade, ativo) VALUES (?, ?, ?, '', 10.0, ?, 1)",
+            [(i, i % N_LOJAS + 1, f"Produto {i}", estoque) for i in range(1, N_PRODUTOS + 1)],
+        )
+
+    db.executar_escrita(_popular, agrupar=False)
+
+
+def pedido_por_item(comprador_id, vendedor_id, total, endereco, itens):
+    """Caminho antigo do create_pedido: laço em Python, sem conferir o estoque."""
+    def _inserir(conn):
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO pedidos (comprador_id, vendedor_id, total, status, rua, numero, bairro, cidade, estado, cep)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (comprador_id, vendedor_id, total, 'Pendente', endereco['rua'], endereco['numero'], endereco['bairro'], endereco['cidade'], endereco['estado'], endereco['cep']))
+        pedido_id = cursor.lastrowid
+        for item in itens:
+            cursor.execute(
+                "INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unitario) VALUES (?, ?, ?, ?)",
+                (pedido_id, item['id'], item['quantity'], item['price']),
+            )
+            cursor.execute('UPDATE produto SET quantidade = quantidade - ? WHERE id = ?', (item['quantity'], item['id']))
+        return pedido_id
+    return {"ok": True, "pedido_id": db.executar_escrita(_inserir)}
+
+
+def loja_por_loja(comprador_id, vendedor_id, total, endereco, itens):
+    """Carrinho com várias lojas finalizado como antes: um create_pedido por loja."""
+    por_loja = {}
+    for item in itens:
+        por_loja.setdefault(item["id"] % N_LOJAS + 1, []).append(item)
+    for loja, itens_loja in por_loja.items():
+        resultado = db.create_pedido(comprador_id, loja, sum(i["quantity"] * i["price"] for i in itens_loja), endereco, itens_loja)
+        if not resultado["ok"]:
+            return resultado
+    return {"ok": True}
+
+
+def checkout(comprador_id, vendedor_id, total, endereco, itens):
+    carrinho = {str(i["id"]): {"quantity": i["quantity"], "price": i["price"]} for i in itens}
+    return db.checkout_carrinho(comprador_id, carrinho, endereco)
+
+
+def rodar(nome, fn, segundos, n_compradores, n_itens, estoque):
+    preparar(estoque)
+    contagem = {"ok": 0, "sem_estoque": 0, "erro": 0}
+    lock = threading.Lock()
+    fim = time.monotonic() + segundos
+
+    def comprador(semente):
+        rnd = random.Random(semente)
+        while time.monotonic() < fim:
+            itens = [
+                {"id": produto_id, "quantity": rnd.randint(1, 3), "price": 10.0}
+                for produto_id in rnd.sample(range(1, N_PRODUTOS + 1), n_itens)
+            ]
+            resultado = fn(1, 1, sum(i["quantity"] * 10.0 for i in itens), ENDERECO, itens)
+            chave = "ok" if resultado["ok"] else ("sem_estoque" if resultado["erro"] == "estoque" else "erro")
+            with lock:
+                contagem[chave] += 1
+
+    threads = [threading.Thread(target=comprador, args=(i,)) for i in range(n_compradores)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    conn = db.get_connection()
+    try:
+        negativos = conn.execute("SELECT COUNT(*) FROM produto WHERE quantidade < 0").fetchone()[0]
+    finally:
+        conn.close()
+    tentativas = sum(contagem.values())
+    print(
+        f"{nome:<14}{contagem['ok'] / duracao:>8.0f} pedidos/s{tentativas / duracao:>8.0f} tentativas/s"
+        f"{contagem['sem_estoque']:>8} sem estoque{contagem['erro']:>4} erros{negativos:>6} estoques negativos"
+    )
+
+
+def main():
+    segundos = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    n_compradores = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    n_itens = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    print(f"{n_compradores} compradores, {n_itens} itens por pedido, {segundos:.0f}s por cenário")
+    print("Estoque folgado:")
+    rodar("por item", pedido_por_item, segundos, n_compradores, n_itens, estoque=1_000_000)
+    rodar("create_pedido", db.create_pedido, segundos, n_compradores, n_itens, estoque=1_000_000)
+    print("Estoque apertado (disputa pelos mesmos produtos):")
+    rodar("por item", pedido_por_item, segundos, n_compradores, n_itens, estoque=20)
+    rodar("create_pedido", db.create_pedido, segundos, n_compradores, n_itens, estoque=20)
+    print(f"Carrinho com produtos de {N_LOJAS} lojas:")
+    rodar("loja por loja", loja_por_loja, segundos, n_compradores, n_itens, estoque=1_000_000)
+    rodar("checkout", checkout, segundos, n_compradores, n_itens, estoque=1_000_000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# bench_startup.py
+"""
+Benchmark: partida a frio do app (home.py).
+
+Cada medida roda em um processo Python novo, como depois de um deploy:
+  - importação do home.py (com as views carregadas sob demanda pelo rotas.py);
+  - a mesma importação carregando todas as views de uma vez, como o home.py
+    fazia antes do registro de rotas (Rotas.precarregar);
+  - tempo até a primeira HomeView montada por main(page) e até a primeira
+    visita a uma loja (/lojas/{slug}), que importa só a view da loja.
+
+A página é um objeto simples com o que main() usa (session, client_storage,
+views, go, update): mede o código do app, não o servidor do Flet.
+
+    python bench_startup.py [repeticoes]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPETICOES = 7
+
+# Roda em cada processo filho; imprime os tempos em JSON
+SCRIPT = r"""
+import json, sys, time
+inicio = time.perf_counter()
+import home
+tempos = {"importacao": time.perf_counter() - inicio}
+if MODO == "todas":
+    home.rotas.precarregar()
+    tempos["importacao"] = time.perf_counter() - inicio
+
+
+class Sessao(dict):
+    def set(self, chave, valor):
+        self[chave] = valor
+
+
+class Armazenamento(Sessao):
+    def remove(self, chave):
+        self.pop(chave, None)
+
+
+class Pagina:
+    def __init__(self):
+        self.route = "/"
+        self.session = Sessao()
+        self.client_storage = Armazenamento()
+        self.views = []
+        self.on_route_change = None
+
+    def go(self, rota):
+        self.route = rota
+        if self.on_route_change:
+            self.on_route_change(None)
+
+    def update(self):
+        pass
+
+
+pagina = Pagina()
+inicio = time.perf_counter()
+home.main(pagina)
+tempos["primeira_home"] = time.perf_counter() - inicio
+assert pagina.views and pagina.views[-1].route == "/"
+inicio = time.perf_counter()
+pagina.go("/lojas/" + SLUG)
+tempos["primeira_loja"] = time.perf_counter() - inicio
+tempos["views_carregadas"] = len(home.rotas.carregadas())
+print(json.dumps(tempos))
+"""
+
+
+def rodar(modo, slug, ambiente):
+    codigo = f"MODO = {modo!r}\nSLUG = {slug!r}\n" + SCRIPT
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=ambiente, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else REPETICOES
+    with tempfile.TemporaryDirectory() as tmp:
+        ambiente = dict(os.environ, APP_DB_PATH=os.path.join(tmp, "bench_startup.db"))
+        # Cria o banco antes das medidas: só a primeira partida aplica as migrações
+        subprocess.run([sys.executable, "-c", "import db; db.init_db()"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                       env=ambiente, capture_output=True, check=True)
+
+        print(f"Mediana de {repeticoes} partidas (ms):")
+        print(f"{'views':<12}{'importação':>12}{'1ª home':>10}{'1ª loja':>10}{'carregadas':>12}")
+        for modo in ("sob_demanda", "todas"):
+            resultados = [rodar(modo, "loja-teste", ambiente) for _ in range(repeticoes)]
+            mediana = {
+                chave: statistics.median(r[chave] for r in resultados)
+                for chave in ("importacao", "primeira_home", "primeira_loja")
+            }
+            print(
+                f"{modo:<12}{mediana['importacao'] * 1000:>12.1f}{mediana['primeira_home'] * 1000:>10.1f}"
+                f"{mediana['primeira_loja'] * 1000:>10.1f}{resultados[-1]['views_carregadas']:>12}"
+            )
+
+
+if __name__ == "__main__":
+    main()
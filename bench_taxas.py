@@ -0,0 +1,95 @@
+# bench_taxas.py
+"""
+Benchmark: taxa de entrega de uma loja para um endereço (taxas.py).
+
+Cadastra lojas com taxas por bairro, por cidade e por estado e mede, em
+microssegundos por consulta:
+  - a busca no índice em memória quando o endereço cai no bairro, na cidade,
+    no estado ou em nenhum deles (loja não entrega);
+  - a montagem do índice de uma loja (primeira consulta depois de uma mudança);
+  - a consulta ao banco que cada cálculo faria sem o índice (get_taxas_by_vendedor
+    e a procura na lista), como referência.
+
+    python bench_taxas.py [lojas] [cidades_por_loja] [bairros_por_cidade]
+"""
+import os
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["APP_DB_PATH"] = os.path.join(_tmp.name, "bench_taxas.db")
+
+import db  # noqa: E402  (precisa do APP_DB_PATH definido antes)
+import taxas  # noqa: E402
+
+REPETICOES = 20000
+
+
+def popular(n_lojas, n_cidades, n_bairros):
+    for v in range(n_lojas):
+        db.create_vendedor(
+            "Pessoa Jurídica", f"Loja {v}", f"loja{v}@bench.com", f"{v:014d}", None,
+            "0", "Rua", "1", "Centro", "São Paulo", "SP", "00000000", "senha",
+        )
+
+    def _inserir(conn):
+        linhas = []
+        for vendedor_id in range(1, n_lojas + 1):
+            linhas.append((vendedor_id, "", "", "SP", 40.0))
+            for c in range(n_cidades):
+                linhas.append((vendedor_id, f"Cidade {c}", "", "SP", 20.0))
+                linhas.extend((vendedor_id, f"Cidade {c}", f"Bairro São {b}", "SP", 10.0) for b in range(n_bairros))
+        conn.executemany("INSERT INTO taxa_entrega (vendedor_id, cidade, bairro, estado, valor) VALUES (?, ?, ?, ?, ?)", linhas)
+        return len(linhas)
+
+    return db.executar_escrita(_inserir)
+
+
+def micros(fn, repeticoes=REPETICOES):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        fn()
+    return (time.perf_counter() - inicio) / repeticoes * 1e6
+
+
+def sem_indice(vendedor_id, estado, cidade, bairro):
+    # O que cada cálculo custaria lendo do banco, sem o índice
+    for taxa in db.get_taxas_by_vendedor(vendedor_id):
+        if (taxa["estado"], taxa["cidade"], taxa["bairro"]) == (estado, cidade, bairro):
+            return taxa["valor"]
+    return None
+
+
+def main():
+    n_lojas = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    n_cidades = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    n_bairros = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    db.init_db()
+    total = popular(n_lojas, n_cidades, n_bairros)
+    print(f"{n_lojas} lojas, {total} taxas ({total // n_lojas} por loja)")
+
+    vendedor_id = n_lojas // 2 or 1
+    # Uma cidade e um bairro do meio do cadastro, digitados com outra grafia
+    cidade, bairro = f"Cidade {n_cidades // 2}", f"Bairro São {n_bairros // 2}"
+    casos = [
+        ("bairro", ("sp", cidade.upper(), "bairro sao " + str(n_bairros // 2)), 10.0),
+        ("cidade", ("SP", cidade, "Outro Bairro"), 20.0),
+        ("estado", ("SP", "Outra Cidade", "Centro"), 40.0),
+        ("não entrega", ("RJ", "Rio de Janeiro", "Centro"), None),
+    ]
+    print(f"{'endereço cai em':<16}{'índice µs':>11}")
+    for nome, endereco, esperado in casos:
+        assert taxas.taxa_entrega(vendedor_id, *endereco) == esperado, nome
+        print(f"{nome:<16}{micros(lambda: taxas.taxa_entrega(vendedor_id, *endereco)):>11.2f}")
+
+    def montar():
+        taxas._indices.invalidar(vendedor_id)
+        taxas.taxa_entrega(vendedor_id, "SP", cidade, bairro)
+
+    print(f"{'montar índice':<16}{micros(montar, 200):>11.2f}")
+    print(f"{'sem índice (db)':<16}{micros(lambda: sem_indice(vendedor_id, 'SP', cidade, bairro), 200):>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
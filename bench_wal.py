@@ -0,0 +1,113 @@
+# bench_wal.py
+"""
+Benchmark: vazão de leitura da listagem de produtos enquanto um escritor grava pedidos.
+
+Compara o perfil "legado" (rollback journal) com os perfis WAL do db_config.
+
+    python bench_wal.py [segundos] [leitores]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from db_config import PERFIS_PRAGMA, aplicar_pragmas
+
+N_PRODUTOS = 2000
+
+
+def preparar_banco(path, pragmas):
+    conn = sqlite3.connect(path)
+    aplicar_pragmas(conn, pragmas)
+    conn.executescript('''
+        CREATE TABLE produto (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vendedor_id INTEGER NOT NULL,
+            nome TEXT NOT NULL,
+            preco REAL NOT NULL,
+            quantidade INTEGER NOT NULL,
+            ativo INTEGER NOT NULL
+        );
+        CREATE TABLE itens_pedido (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pedido_id INTEGER NOT NULL,
+            produto_id INTEGER NOT NULL,
+            quantidade INTEGER NOT NULL,
+            preco_unitario REAL NOT NULL
+        );
+    ''')
+    conn.executemany(
+        "INSERT INTO produto (vendedor_id, nome, preco, quantidade, ativo) VALUES (?, ?, ?, ?, 1)",
+        [(i % 20, f"Produto {i}", 10.0 + i, 1_000_000) for i in range(N_PRODUTOS)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def rodar(perfil, segundos, n_leitores):
+    pragmas = PERFIS_PRAGMA[perfil]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        preparar_banco(path, pragmas)
+
+        parar = threading.Event()
+        leituras = [0] * n_leitores
+        erros = [0]
+        escritas = [0]
+
+        def escritor():
+            conn = sqlite3.connect(path, timeout=30)
+            aplicar_pragmas(conn, pragmas)
+            pedido_id = 0
+            while not parar.is_set():
+                pedido_id += 1
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    for produto_id in range(1 + pedido_id % 50, 1 + pedido_id % 50 + 5):
+                        conn.execute(
+                            "INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unitario) VALUES (?, ?, 1, 1.0)",
+                            (pedido_id, produto_id),
+                        )
+                        conn.execute("UPDATE produto SET quantidade = quantidade - 1 WHERE id = ?", (produto_id,))
+                    conn.commit()
+                    escritas[0] += 1
+                except sqlite3.OperationalError:
+                    conn.rollback()
+                    erros[0] += 1
+            conn.close()
+
+        def leitor(i):
+            conn = sqlite3.connect(path, timeout=30)
+            aplicar_pragmas(conn, pragmas)
+            while not parar.is_set():
+                try:
+                    conn.execute(
+                        "SELECT id, nome, preco, quantidade FROM produto WHERE vendedor_id = ? AND ativo = 1 ORDER BY nome",
+                        (leituras[i] % 20,),
+                    ).fetchall()
+                    leituras[i] += 1
+                except sqlite3.OperationalError:
+                    erros[0] += 1
+            conn.close()
+
+        threads = [threading.Thread(target=escritor)]
+        threads += [threading.Thread(target=leitor, args=(i,)) for i in range(n_leitores)]
+        for t in threads:
+            t.start()
+        time.sleep(segundos)
+        parar.set()
+        for t in threads:
+            t.join()
+
+    total = sum(leituras)
+    print(f"{perfil:>8}: {total / segundos:10.1f} leituras/s  {escritas[0] / segundos:8.1f} pedidos/s  erros={erros[0]}")
+
+
+if __name__ == "__main__":
+    segundos = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    leitores = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print(f"{leitores} leitores + 1 escritor, {segundos:.0f}s por perfil")
+    for perfil in ("legado", "padrao", "seguro"):
+        rodar(perfil, segundos, leitores)
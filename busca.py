@@ -0,0 +1,101 @@
+import flet as ft
+from db import search_produtos, url_imagem_produto
+
+RESULTADOS_POR_PAGINA = 20
+
+
+def BuscaView(page: ft.Page):
+    """
+    Busca de produtos em todas as lojas (nome, descrição ou categoria).
+    """
+    busca_field = ft.TextField(
+        label="O que você procura?",
+        prefix_icon=ft.Icons.SEARCH,
+        expand=True,
+        autofocus=True,
+        on_submit=lambda e: buscar(),
+    )
+    cidade_field = ft.TextField(label="Cidade (opcional)", width=220, on_submit=lambda e: buscar())
+    resultado_text = ft.Text(size=14, color=ft.Colors.GREY_700)
+    grade_resultados = ft.ResponsiveRow(controls=[], spacing=20, run_spacing=20)
+    mais_button = ft.OutlinedButton(
+        "Mais resultados",
+        icon=ft.Icons.EXPAND_MORE,
+        on_click=lambda e: buscar(mais=True),
+        visible=False,
+    )
+    estado = {"offset": 0}
+
+    def criar_card(produto):
+        img_url = url_imagem_produto(produto['img_hash'], tamanho="card")
+        return ft.Card(
+            col={"xs": 12, "sm": 6, "md": 4, "lg": 3},
+            elevation=4,
+            content=ft.Column(
+                [
+                    ft.Image(
+                        src=img_url or "Icons/no-image.png",
+                        height=120,
+                        fit=ft.ImageFit.COVER,
+                        border_radius=ft.border_radius.only(top_left=10, top_right=10),
+                    ),
+                    ft.Container(
+                        padding=10,
+                        content=ft.Column(
+                            [
+                                ft.Text(produto['nome'], size=16, weight="bold"),
+                                ft.Text(f"R$ {produto['preco']:.2f}", size=20, color=ft.Colors.GREEN_700, weight="bold"),
+                                ft.Text(f"{produto['loja_nome']} - {produto['cidade']}, {produto['estado']}", size=12, color=ft.Colors.GREY_600),
+                                ft.Divider(height=5, color="transparent"),
+                                ft.FilledButton(
+                                    "Ver na Loja",
+                                    icon=ft.Icons.STOREFRONT,
+                                    on_click=lambda e: page.go(f"/lojas/{e.control.data}"),
+                                    data=produto['loja_slug'],
+                                ),
+                            ],
+                            spacing=5,
+                        )
+                    )
+                ],
+                spacing=0,
+            )
+        )
+
+    def buscar(mais=False):
+        termo = (busca_field.value or "").strip()
+        if not mais:
+            estado["offset"] = 0
+            grade_resultados.controls.clear()
+        if not termo:
+            resultado_text.value = ""
+            mais_button.visible = False
+            page.update()
+            return
+
+        # Pede um a mais para saber se existe próxima página
+        produtos = search_produtos(termo, cidade=cidade_field.value, limit=RESULTADOS_POR_PAGINA + 1, offset=estado["offset"])
+        mais_button.visible = len(produtos) > RESULTADOS_POR_PAGINA
+        produtos = produtos[:RESULTADOS_POR_PAGINA]
+        estado["offset"] += len(produtos)
+        grade_resultados.controls.extend(criar_card(produto) for produto in produtos)
+
+        if grade_resultados.controls:
+            resultado_text.value = f"Resultados para \"{termo}\""
+        else:
+            resultado_text.value = f"Nenhum produto encontrado para \"{termo}\"."
+        page.update()
+
+    return ft.View(
+        "/busca",
+        [
+            ft.Text("Buscar Produtos", size=32, weight="bold"),
+            ft.Row([busca_field, cidade_field, ft.FilledButton("Buscar", icon=ft.Icons.SEARCH, height=50, on_click=lambda e: buscar())]),
+            resultado_text,
+            ft.Divider(height=20),
+            grade_resultados,
+            ft.Row([mais_button], alignment=ft.MainAxisAlignment.CENTER),
+        ],
+        padding=30,
+        scroll=ft.ScrollMode.AUTO,
+    )
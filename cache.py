@@ -0,0 +1,67 @@
+# cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheTTL:
+    """
+    Cache em memória (por processo) com expiração por tempo (TTL) e descarte do
+    item usado há mais tempo (LRU) quando passa de 'max_itens'.
+
+    get() retorna (achou, valor) para que None também possa ficar em cache
+    (ex.: slug que não existe). Para não guardar um valor lido do banco antes de
+    uma invalidação, leia 'geracao' antes da consulta e passe-a para set().
+    """
+
+    def __init__(self, max_itens=1024, ttl=300.0):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()  # chave -> (expira_em, valor)
+        self.geracao = 0  # incrementada a cada invalidação
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expirados": 0, "descartados": 0, "invalidacoes": 0}
+
+    def get(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self._stats["misses"] += 1
+                return False, None
+            expira_em, valor = item
+            if expira_em <= time.monotonic():
+                del self._itens[chave]
+                self._stats["expirados"] += 1
+                self._stats["misses"] += 1
+                return False, None
+            self._itens.move_to_end(chave)
+            self._stats["hits"] += 1
+            return True, valor
+
+    def set(self, chave, valor, geracao=None):
+        with self._lock:
+            if geracao is not None and geracao != self.geracao:
+                return  # houve invalidação durante a consulta: o valor pode estar velho
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self._stats["descartados"] += 1
+
+    def invalidar(self, chave=None):
+        """Remove uma chave, ou tudo quando chave é None."""
+        with self._lock:
+            if chave is None:
+                self._itens.clear()
+            else:
+                self._itens.pop(chave, None)
+            self.geracao += 1
+            self._stats["invalidacoes"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["itens"] = len(self._itens)
+        consultas = stats["hits"] + stats["misses"]
+        stats["taxa_acerto"] = stats["hits"] / consultas if consultas else 0.0
+        return stats
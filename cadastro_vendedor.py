@@ -76,7 +76,7 @@ def CadastroVendedorView(page: ft.Page):
             cidade=cidade.value,
             estado=estado.value,
             cep=cep.value,
-            password=password.value  # Futuramente, usar hash para a senha
+            password=password.value  # O db.py grava só o hash (senhas.py)
         )
 
         if success:
@@ -1,6 +1,13 @@
+import asyncio
 import flet as ft
-import base64
-from db import create_pedido
+import sqlite3
+from db import checkout_carrinho, get_vendedor_by_id
+import db_async
+from catalogo import get_resumos
+from sessoes import registrar_memoria
+from taxas import fretes_do_carrinho
+
+ESPERA_FRETE = 0.4  # segundos sem digitar antes de recalcular a taxa de entrega
 
 def CarrinhoComprasView(page: ft.Page):
     """
@@ -36,6 +43,12 @@ def CarrinhoComprasView(page: ft.Page):
     cidade_entrega = ft.TextField(label="Cidade", expand=True)
     estado_entrega = ft.TextField(label="Estado (UF)", width=100)
     cep_entrega = ft.TextField(label="CEP", width=150, keyboard_type=ft.KeyboardType.NUMBER)
+    frete_text = ft.Text(size=16)
+
+    # A taxa de entrega acompanha o endereço enquanto ele é digitado
+    for campo in (bairro_entrega, cidade_entrega, estado_entrega):
+        campo.on_change = lambda e: page.run_task(atualizar_frete, ESPERA_FRETE)
+    estado_frete = {"versao": 0}
 
     form_endereco = ft.Container(
         visible=False,  # Começa invisível
@@ -46,8 +59,9 @@ def CarrinhoComprasView(page: ft.Page):
                 ft.Row([rua_entrega, numero_entrega]),
                 ft.Row([bairro_entrega, cidade_entrega, estado_entrega]),
                 cep_entrega,
+                frete_text,
                 ft.Divider(height=20, color="transparent"),
-                ft.FilledButton("Confirmar Pedido", icon=ft.Icons.CHECK_CIRCLE_OUTLINE, height=50, on_click=lambda e: confirmar_pedido_click(e), expand=True)
+                ft.FilledButton("Confirmar Pedido", icon=ft.Icons.CHECK_CIRCLE_OUTLINE, height=50, on_click=lambda e: page.run_task(confirmar_pedido_click, e), expand=True)
             ],
             spacing=15
         )
@@ -61,6 +75,7 @@ def CarrinhoComprasView(page: ft.Page):
             if carrinho_atual[str(produto_id)]["quantity"] <= 0:
                 del carrinho_atual[str(produto_id)]
         page.session.set("cart", carrinho_atual)
+        registrar_memoria(page)
         build_cart_view()
 
     def remove_cart_item(e, produto_id):
@@ -68,6 +83,7 @@ def CarrinhoComprasView(page: ft.Page):
         if str(produto_id) in carrinho_atual:
             del carrinho_atual[str(produto_id)]
         page.session.set("cart", carrinho_atual)
+        registrar_memoria(page)
         build_cart_view()
 
     def build_cart_view():
@@ -95,7 +111,10 @@ def CarrinhoComprasView(page: ft.Page):
                 )
             )
         else:
+            # Nome e imagem vêm do cache compartilhado, em uma única consulta para o que faltar
+            resumos = get_resumos(carrinho_atual.keys())
             for produto_id, detalhes in carrinho_atual.items():
+                resumo = resumos.get(int(produto_id), {"nome": "Produto indisponível", "img": None})
                 subtotal = detalhes["price"] * detalhes["quantity"]
                 total_carrinho += subtotal
 
@@ -108,14 +127,13 @@ def CarrinhoComprasView(page: ft.Page):
                             content=ft.Column(
                                 [
                                     ft.Image(
-                                        src_base64=detalhes["img"] if detalhes["img"] else None,
-                                        src="/icons/no-image.png" if not detalhes["img"] else None,
+                                        src=resumo["img"] or "/icons/no-image.png",
                                         width=200,
                                         height=130,
                                         fit=ft.ImageFit.COVER,
                                         border_radius=ft.border_radius.all(8),
                                     ),
-                                    ft.Text(detalhes["name"], weight="bold", size=14, text_align=ft.TextAlign.CENTER),
+                                    ft.Text(resumo["nome"], weight="bold", size=14, text_align=ft.TextAlign.CENTER),
                                     ft.Text(f"R$ {detalhes['price']:.2f}", color=ft.Colors.GREEN, size=12),
                                     ft.Row(
                                         [
@@ -144,19 +162,69 @@ def CarrinhoComprasView(page: ft.Page):
         checkout_button.disabled = not carrinho_atual
         progress_bar.visible = False
         page.update()
+        page.run_task(atualizar_frete)
+
+    def nomes_das_lojas(vendedor_ids):
+        return ", ".join((get_vendedor_by_id(v) or {}).get("name", "Loja indisponível") for v in vendedor_ids)
+
+    def calcular_frete(carrinho, endereco):
+        # Taxas das lojas e nomes das que não entregam no endereço, numa só ida ao pool do banco
+        fretes = fretes_do_carrinho(carrinho, endereco)
+        sem_entrega = [v for v, frete in fretes.items() if frete is None]
+        return fretes, nomes_das_lojas(sem_entrega) if sem_entrega else ""
+
+    async def atualizar_frete(espera=0):
+        # Taxa de cada loja do carrinho para o endereço (taxas.py). O índice de
+        # taxas e os nomes das lojas podem ir ao banco, então o cálculo roda no
+        # pool (db_async) e só depois de 'espera' segundos sem outra tecla; um
+        # resultado que chega depois de outra mudança no endereço é descartado.
+        estado_frete["versao"] += 1
+        versao = estado_frete["versao"]
+        carrinho_atual = page.session.get("cart") or {}
+        total_produtos = sum(d["price"] * d["quantity"] for d in carrinho_atual.values())
+        if not (form_endereco.visible and carrinho_atual and estado_entrega.value):
+            frete_text.value = ""
+            total_carrinho_text.value = f"Total: R$ {total_produtos:.2f}"
+            page.update()
+            return
+        if espera:
+            await asyncio.sleep(espera)
+            if versao != estado_frete["versao"]:
+                return
+        endereco = {"estado": estado_entrega.value, "cidade": cidade_entrega.value, "bairro": bairro_entrega.value}
+        try:
+            fretes, sem_entrega = await db_async.executar(calcular_frete, carrinho_atual, endereco)
+        except (sqlite3.Error, db_async.TempoEsgotado):
+            fretes = sem_entrega = None
+        if versao != estado_frete["versao"]:
+            return
+        total_carrinho_text.value = f"Total: R$ {total_produtos:.2f}"
+        if fretes is None:
+            frete_text.value = "Não foi possível calcular a taxa de entrega agora."
+            frete_text.color = ft.Colors.ORANGE
+        elif sem_entrega:
+            frete_text.value = f"Sem entrega neste endereço: {sem_entrega}"
+            frete_text.color = ft.Colors.ORANGE
+        else:
+            frete = sum(fretes.values())
+            frete_text.value = f"Taxa de entrega: R$ {frete:.2f}" + (f" ({len(fretes)} lojas)" if len(fretes) > 1 else "")
+            frete_text.color = None
+            total_carrinho_text.value = f"Total: R$ {total_produtos + frete:.2f} (com entrega)"
+        page.update()
 
     def go_to_checkout(e):
         # Mostra o formulário de endereço e esconde o botão de finalizar compra
         form_endereco.visible = True
         checkout_button.visible = False
         page.update()
+        page.run_task(atualizar_frete)
 
     def show_snackbar(message, color):
         page.snack_bar = ft.SnackBar(content=ft.Text(message), bgcolor=color)
         page.snack_bar.open = True
         page.update()
 
-    def confirmar_pedido_click(e):
+    async def confirmar_pedido_click(e):
         # Validação simples
         if not all([rua_entrega.value, numero_entrega.value, bairro_entrega.value, cidade_entrega.value, estado_entrega.value, cep_entrega.value]):
             page.snack_bar = ft.SnackBar(content=ft.Text("Por favor, preencha todos os campos do endereço."), bgcolor=ft.Colors.ORANGE)
@@ -169,33 +237,61 @@ def CarrinhoComprasView(page: ft.Page):
             show_snackbar("Seu carrinho está vazio.", ft.Colors.RED)
             return
 
-        # Assume que todos os produtos no carrinho são do mesmo vendedor
-        # Em um cenário real, o carrinho poderia ser agrupado por vendedor
-        primeiro_produto_id = next(iter(carrinho_atual))
-        vendedor_id = carrinho_atual[primeiro_produto_id].get("vendedor_id")
-
-        total_pedido = sum(item['price'] * item['quantity'] for item in carrinho_atual.values())
-        
         endereco = {
             "rua": rua_entrega.value, "numero": numero_entrega.value, "bairro": bairro_entrega.value,
             "cidade": cidade_entrega.value, "estado": estado_entrega.value, "cep": cep_entrega.value
         }
         
-        # Prepara a lista de itens para a função do DB
-        itens_pedido = [{"id": prod_id, **detalhes} for prod_id, detalhes in carrinho_atual.items()]
-
-        pedido_id = create_pedido(
-            comprador_id=page.session.get("user_id"),
-            vendedor_id=vendedor_id,
-            total=total_pedido,
-            endereco=endereco,
-            itens=itens_pedido
-        )
+        # Um pedido por loja do carrinho, todos gravados de uma vez (ou nenhum).
+        # Roda fora do loop da interface (db_async) e sem tempo limite: um checkout
+        # já começado não é abandonado. O botão fica desabilitado até a resposta.
+        e.control.disabled = True
+        page.update()
+        try:
+            # Taxas calculadas antes da escrita, fora da transação do escritor
+            try:
+                fretes = await db_async.executar(fretes_do_carrinho, carrinho_atual, endereco)
+            except (sqlite3.Error, db_async.TempoEsgotado):
+                e.control.disabled = False
+                show_snackbar("Não foi possível calcular a taxa de entrega. Tente novamente.", ft.Colors.RED)
+                return
+            resultado = await db_async.executar(
+                checkout_carrinho,
+                comprador_id=page.session.get("user_id"),
+                carrinho=carrinho_atual,
+                endereco=endereco,
+                fretes=fretes,
+                timeout=None,
+            )
+        finally:
+            e.control.disabled = False
 
-        if pedido_id:
+        if resultado["ok"]:
             page.session.set("cart", {}) # Limpa o carrinho
-            show_snackbar(f"Pedido #{pedido_id} realizado com sucesso!", ft.Colors.GREEN)
+            registrar_memoria(page)
+            numeros = ", ".join(f"#{pedido_id}" for pedido_id in resultado["pedidos"].values())
+            if len(resultado["pedidos"]) > 1:
+                show_snackbar(f"Pedidos {numeros} realizados com sucesso (um por loja)!", ft.Colors.GREEN)
+            else:
+                show_snackbar(f"Pedido {numeros} realizado com sucesso!", ft.Colors.GREEN)
             page.go("/lojas") # Redireciona para a lista de lojas
+        elif resultado["erro"] == "estoque":
+            # Nada foi gravado; o carrinho continua como está para o comprador ajustar
+            faltando = ", ".join(
+                f"{item['nome'] or 'Produto indisponível'} (disponível: {item['disponivel']})"
+                for item in resultado["sem_estoque"]
+            )
+            show_snackbar(f"Estoque insuficiente: {faltando}", ft.Colors.ORANGE)
+        elif resultado["erro"] == "entrega":
+            # Nada foi gravado; o comprador pode mudar o endereço ou tirar os itens dessas lojas
+            try:
+                nomes = await db_async.executar(nomes_das_lojas, resultado["vendedores"])
+            except (sqlite3.Error, db_async.TempoEsgotado):
+                nomes = None  # a recusa é o que importa: avisa mesmo sem os nomes
+            if nomes:
+                show_snackbar(f"Sem entrega neste endereço: {nomes}", ft.Colors.ORANGE)
+            else:
+                show_snackbar("Alguma loja do carrinho não entrega neste endereço.", ft.Colors.ORANGE)
         else:
             show_snackbar("Ocorreu um erro ao processar seu pedido. Tente novamente.", ft.Colors.RED)
 
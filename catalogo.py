@@ -0,0 +1,153 @@
+# catalogo.py
+"""
+Caches compartilhados (entre todas as sessões) do catálogo de produtos.
+
+- Resumo por produto: o carrinho da sessão guarda só id, quantidade e preço;
+  nome, loja e imagem são resolvidos aqui no momento de desenhar a tela.
+- Snapshot por loja: lista imutável dos produtos ativos de um vendedor, marcada
+  com um número de versão. Cada escrita que muda o catálogo da loja (evento
+  "catalogo" do db.py) incrementa a versão e o snapshot é refeito na próxima leitura.
+  Uma leitura que falha (ou é interrompida pelo db_async) levanta sqlite3.Error
+  e não deixa snapshot: a loja nunca fica "vazia" em cache por causa de um erro.
+"""
+import threading
+from bisect import bisect_right
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
+
+import db
+
+MAX_PRODUTOS = 10000
+MAX_LOJAS = 256  # snapshots mantidos em memória (LRU)
+
+_lock = threading.Lock()
+_resumos = OrderedDict()  # produto_id -> {"nome", "vendedor_id", "img"} (LRU)
+
+
+def _invalidar_produto(produto_id):
+    with _lock:
+        _resumos.pop(int(produto_id), None)
+
+
+db.ouvir("produto", _invalidar_produto)
+
+
+# --- SNAPSHOT POR LOJA ---
+# produtos: tupla de dicionários somente leitura, na ordem (nome, id)
+# chaves:   [(nome, id), ...] na mesma ordem, para a paginação com bisect
+# por_id:   produto_id -> produto
+Snapshot = namedtuple("Snapshot", ["vendedor_id", "versao", "produtos", "chaves", "por_id"])
+
+_versoes = {}                # vendedor_id -> versão atual do catálogo
+_snapshots = OrderedDict()   # vendedor_id -> Snapshot (LRU)
+_stats = {"hits": 0, "montagens": 0, "invalidacoes": 0}
+
+
+def _nova_versao(vendedor_id):
+    with _lock:
+        _versoes[vendedor_id] = _versoes.get(vendedor_id, 0) + 1
+        _snapshots.pop(vendedor_id, None)
+        _stats["invalidacoes"] += 1
+
+
+db.ouvir("catalogo", _nova_versao)
+
+
+def get_snapshot(vendedor_id):
+    """Retorna o snapshot atual do catálogo da loja, montando-o se a versão mudou."""
+    with _lock:
+        versao = _versoes.get(vendedor_id, 0)
+        snapshot = _snapshots.get(vendedor_id)
+        if snapshot is not None and snapshot.versao == versao:
+            _snapshots.move_to_end(vendedor_id)
+            _stats["hits"] += 1
+            return snapshot
+
+    # Monta fora do lock; se a versão mudar no meio, o snapshot nasce velho e
+    # a próxima leitura monta outro. Erros de banco sobem sem deixar snapshot.
+    produtos = tuple(MappingProxyType(p) for p in db.ler_produtos_vendedor(vendedor_id))
+    snapshot = Snapshot(
+        vendedor_id=vendedor_id,
+        versao=versao,
+        produtos=produtos,
+        chaves=[(p["nome"], p["id"]) for p in produtos],
+        por_id=MappingProxyType({p["id"]: p for p in produtos}),
+    )
+    with _lock:
+        _stats["montagens"] += 1
+        # Montado durante um cancelamento (db_async): quem pediu recebe TempoEsgotado
+        # e o snapshot não é guardado
+        if _versoes.get(vendedor_id, 0) == versao and not db.interrompida():
+            _snapshots[vendedor_id] = snapshot
+            _snapshots.move_to_end(vendedor_id)
+            while len(_snapshots) > MAX_LOJAS:
+                _snapshots.popitem(last=False)
+    return snapshot
+
+
+def get_produtos(vendedor_id):
+    """Produtos ativos da loja (somente leitura), ordenados por nome."""
+    return get_snapshot(vendedor_id).produtos
+
+
+def get_produto(vendedor_id, produto_id):
+    """Um produto ativo da loja, ou None."""
+    return get_snapshot(vendedor_id).por_id.get(int(produto_id))
+
+
+def get_pagina(vendedor_id, apos=None, limite=None):
+    """
+    Mesmo contrato de db.get_produtos_pagina, mas fatiando o snapshot: retorna
+    (produtos, proximo_cursor), com o cursor (nome, id) do último produto.
+    """
+    limite = limite or db.PRODUTOS_POR_PAGINA
+    snapshot = get_snapshot(vendedor_id)
+    inicio = bisect_right(snapshot.chaves, tuple(apos)) if apos is not None else 0
+    produtos = snapshot.produtos[inicio:inicio + limite]
+    proximo = snapshot.chaves[inicio + limite - 1] if inicio + limite < len(snapshot.produtos) else None
+    return list(produtos), proximo
+
+
+def get_resumos(produto_ids):
+    """
+    Retorna {produto_id: {"nome", "vendedor_id", "img"}} para os ids pedidos.
+    Os que não estão em cache são buscados no banco em uma única consulta.
+    Produtos que não existem mais ficam fora do resultado.
+    """
+    ids = [int(i) for i in produto_ids]
+    resultado = {}
+    faltando = []
+    with _lock:
+        for produto_id in ids:
+            resumo = _resumos.get(produto_id)
+            if resumo is None:
+                faltando.append(produto_id)
+            else:
+                _resumos.move_to_end(produto_id)
+                resultado[produto_id] = resumo
+
+    if faltando:
+        for produto_id, row in db.get_produtos_resumo(faltando).items():
+            resumo = {
+                "nome": row["nome"],
+                "vendedor_id": row["vendedor_id"],
+                "img": db.url_imagem_produto(row["img_hash"], tamanho="carrinho"),
+            }
+            resultado[produto_id] = resumo
+            with _lock:
+                _resumos[produto_id] = resumo
+                while len(_resumos) > MAX_PRODUTOS:
+                    _resumos.popitem(last=False)
+    return resultado
+
+
+def stats():
+    with _lock:
+        return {
+            "produtos_em_cache": len(_resumos),
+            "max_produtos": MAX_PRODUTOS,
+            "lojas_em_cache": len(_snapshots),
+            "snapshot_hits": _stats["hits"],
+            "snapshot_montagens": _stats["montagens"],
+            "snapshot_invalidacoes": _stats["invalidacoes"],
+        }
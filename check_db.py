@@ -1,6 +1,7 @@
 import sqlite3
+from db_config import CONFIG
 
-conn = sqlite3.connect('users.db')
+conn = sqlite3.connect(CONFIG["path"])
 cursor = conn.cursor()
 cursor.execute('SELECT name FROM sqlite_master WHERE type="table"')
 tables = cursor.fetchall()
@@ -0,0 +1,63 @@
+# check_indices.py
+"""
+Confere o plano de execução (EXPLAIN QUERY PLAN) de todas as consultas
+registradas em db.CONSULTAS em um banco temporário recém-criado.
+
+Falha (código de saída 1) se alguma consulta quente varrer uma tabela inteira
+(SCAN sem índice) ou precisar de ordenação temporária.
+
+    python check_indices.py
+"""
+import os
+import re
+import sys
+import tempfile
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["APP_DB_PATH"] = os.path.join(_tmp.name, "check_indices.db")
+
+import db  # noqa: E402  (precisa do APP_DB_PATH definido antes)
+
+# Consultas em que uma varredura completa é aceitável
+PERMITIDAS = set()
+
+PROBLEMAS = (
+    re.compile(r"^SCAN (\w+)$"),               # varredura completa sem índice
+    re.compile(r"^SCAN (\w+) \(~\d+ rows\)$"),
+    re.compile(r"USE TEMP B-TREE"),             # ordenação/agrupamento sem índice
+)
+
+
+def plano(conn, sql):
+    n_params = sql.count("?")
+    linhas = conn.execute(f"EXPLAIN QUERY PLAN {sql}", (None,) * n_params).fetchall()
+    return [linha[-1] for linha in linhas]
+
+
+def main():
+    db.init_db()
+    conn = db.get_connection()
+    falhas = 0
+    try:
+        for nome, sql in db.CONSULTAS.items():
+            detalhes = plano(conn, sql)
+            ruins = [d for d in detalhes if any(p.search(d) for p in PROBLEMAS)]
+            if ruins and nome not in PERMITIDAS:
+                falhas += 1
+                print(f"❌ {nome}")
+                for d in detalhes:
+                    print(f"     {d}")
+            else:
+                print(f"✅ {nome}: {' | '.join(detalhes)}")
+    finally:
+        conn.close()
+
+    if falhas:
+        print(f"\n{falhas} consulta(s) sem índice adequado.")
+        return 1
+    print("\nTodas as consultas usam índices.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,10 @@
 import sqlite3
 import time
+from db_config import CONFIG
 
 def check_db_lock():
     try:
-        conn = sqlite3.connect('users.db', timeout=10)
+        conn = sqlite3.connect(CONFIG["path"], timeout=10)
         cursor = conn.cursor()
         cursor.execute('SELECT COUNT(*) FROM produto')
         count = cursor.fetchone()[0]
@@ -1,47 +1,497 @@
 # db.py
 import sqlite3
-from datetime import datetime
+import hashlib
+import heapq
+import json
+import threading
+import time
+from concurrent.futures import wait as aguardar_futures
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
 
 import re
-DATABASE = "users.db"
+from db_pool import ConnectionPool
+from db_config import CONFIG, get_pragmas, aplicar_pragmas
+from db_writer import WriterThread
+from db_retry import RetryPolicy
+from cache import CacheTTL
+import imagens
+import senhas
+
+# Caminho do banco (APP_DB_PATH) e perfil de PRAGMAs (APP_DB_PERFIL) vêm do db_config
+DATABASE = CONFIG["path"]
+PRAGMAS = get_pragmas()
+
+# Pool de conexões compartilhado por todas as funções deste módulo.
+# Cada thread reaproveita sua conexão em vez de abrir o arquivo a cada chamada.
+_pool = ConnectionPool(
+    DATABASE,
+    max_size=CONFIG["pool_size"],
+    timeout=CONFIG["timeout"],
+    on_connect=lambda conn: _configurar_conexao(conn),
+)
 
 def get_connection():
-    # Adiciona um timeout para evitar erros de "database is locked" em ambientes com múltiplas threads
-    return sqlite3.connect(DATABASE, timeout=30) # Espera até 30 segundos
+    """
+    Retorna uma conexão do pool. Chamar conn.close() devolve a conexão ao pool
+    em vez de fechá-la de verdade.
+    """
+    return _pool.acquire()
+
+def get_pool_stats():
+    """Estatísticas do pool: tamanho, conexões livres/em uso e tempo de espera."""
+    return _pool.stats()
+
+# --- CANCELAMENTO ---
+# O db_async executa cada chamada dentro de cancelavel(evento). Quando o evento
+# é sinalizado (tempo esgotado ou handler cancelado), a consulta em andamento na
+# conexão daquela thread é interrompida pelo progress handler do SQLite, e uma
+# escrita que ainda está na fila do escritor é descartada.
+PASSOS_CANCELAMENTO = 10000  # instruções da VM do SQLite entre verificações
+_cancelamento = threading.local()
+
+def _cancelada():
+    atual = getattr(_cancelamento, "atual", None)
+    if atual is not None and atual[0].is_set():
+        atual[1]["interrompida"] = True
+        return True  # valor verdadeiro interrompe a consulta (sqlite3.OperationalError)
+    return False
+
+def _configurar_conexao(conn):
+    aplicar_pragmas(conn, PRAGMAS)  # WAL, cache, mmap etc.
+    conn.set_progress_handler(_cancelada, PASSOS_CANCELAMENTO)
+
+def interrompida():
+    """Indica se alguma consulta desta thread foi cancelada no bloco cancelavel atual."""
+    atual = getattr(_cancelamento, "atual", None)
+    return atual is not None and atual[1]["interrompida"]
+
+@contextmanager
+def cancelavel(evento):
+    """
+    Torna canceláveis por 'evento' as chamadas ao banco feitas por esta thread
+    dentro do bloco. Entrega um dict cujo "interrompida" indica se alguma
+    consulta ou escrita foi de fato cancelada: as funções deste módulo tratam
+    o erro e retornam None/False, então o resultado delas não diz isso.
+    """
+    estado = {"interrompida": False}
+    _cancelamento.atual = (evento, estado)
+    try:
+        yield estado
+    finally:
+        _cancelamento.atual = None
 
-class User:
-    def __init__(self):
-        self.conn = get_connection()
-        self.cursor = self.conn.cursor()
+def _conexao_escritor():
+    conn = get_connection()
+    # Escritas nunca são interrompidas no meio: o cancelamento só as tira da fila
+    conn.set_progress_handler(None, 0)
+    # O escritor espera pouco dentro do SQLite; quem controla as novas tentativas é a RetryPolicy
+    conn.execute(f"PRAGMA busy_timeout = {int(CONFIG['writer_busy_timeout'])}")
+    return conn
+
+# Política única de nova tentativa (backoff exponencial com jitter) para SQLITE_BUSY
+_retry = RetryPolicy(base=CONFIG["retry_base"], maximo=CONFIG["retry_max"], prazo=CONFIG["retry_prazo"])
+
+# Todas as escritas passam por uma única thread, que serializa e agrupa os commits.
+# Assim a disputa pelo lock de escrita do SQLite vira uma fila previsível.
+_writer = WriterThread(_conexao_escritor, max_fila=1000, max_lote=32, retry=_retry)
+
+def submit_escrita(fn, *args, agrupar=True, **kwargs):
+    """Envia fn(conn, *args, **kwargs) para a thread de escrita e retorna um Future."""
+    return _writer.submit(fn, *args, agrupar=agrupar, **kwargs)
+
+def executar_escrita(fn, *args, agrupar=True, **kwargs):
+    """Executa fn(conn, *args, **kwargs) na thread de escrita e aguarda o resultado."""
+    future = submit_escrita(fn, *args, agrupar=agrupar, **kwargs)
+    atual = getattr(_cancelamento, "atual", None)
+    if atual is None:
+        return future.result()
+    # Chamada cancelável (db_async): enquanto o job está na fila, o cancelamento o
+    # descarta; depois que o escritor o pegou, espera o commit normalmente
+    evento, estado = atual
+    while not aguardar_futures([future], timeout=0.05).done:
+        if evento.is_set() and future.cancel():
+            estado["interrompida"] = True
+            raise sqlite3.OperationalError("Escrita cancelada antes de começar")
+    return future.result()
+
+def get_writer_stats():
+    """Estatísticas da thread de escrita: profundidade da fila, latência dos commits e retries."""
+    return _writer.stats()
+
+# --- EVENTOS ---
+# Caches de outros módulos (catalogo etc.) se registram aqui para saber quando
+# os dados mudaram, sem que o db.py precise importá-los.
+#   "produto"  (produto_id)  -> dados de um produto mudaram
+#   "catalogo" (vendedor_id) -> produtos, estoque ou categorias de uma loja mudaram
+#   "pedido"   (vendedor_id) -> a loja recebeu um novo pedido
+#   "taxa"     (vendedor_id) -> taxas de entrega da loja mudaram
+#   "conta"    (tipo, conta_id, antes_de) -> senha em texto puro trocada pelo hash ou conta desativada;
+#              logins feitos antes de antes_de (time.monotonic) perdem a validade
+_ouvintes = {}
+
+def ouvir(evento, fn):
+    """Registra fn(*args) para ser chamada depois de cada escrita do tipo 'evento'."""
+    _ouvintes.setdefault(evento, []).append(fn)
+
+def _notificar(evento, *args):
+    for fn in _ouvintes.get(evento, ()):
+        try:
+            fn(*args)
+        except Exception as e:
+            print(f"Erro no ouvinte do evento '{evento}': {e}")
+
+# --- CACHE DE VENDEDORES ---
+# Os dados das lojas quase nunca mudam e são as leituras mais frequentes do app
+# (/lojas e /lojas/<slug>). As funções de escrita do vendedor chamam
+# _invalidar_cache_vendedores().
+_cache_vendedor = CacheTTL(CONFIG["cache_vendedor_max"], CONFIG["cache_vendedor_ttl"])  # ("id"|"slug", valor) -> dict
+_cache_vendedores_ativos = CacheTTL(1, CONFIG["cache_vendedor_ttl"])
+
+def _invalidar_cache_vendedores():
+    _cache_vendedor.invalidar()
+    _cache_vendedores_ativos.invalidar()
+
+def get_cache_stats():
+    """Acertos/erros dos caches de leitura."""
+    return {
+        "vendedor": _cache_vendedor.stats(),
+        "vendedores_ativos": _cache_vendedores_ativos.stats(),
+        "urls_imagem": _urls_imagem.stats(),
+    }
+
+# --- CONSULTAS ---
+# Consultas de leitura (e os filtros das escritas) usadas pelas funções abaixo.
+# Ficam registradas aqui para que o check_indices.py possa conferir o plano de
+# execução de cada uma com EXPLAIN QUERY PLAN.
+CONSULTAS = {
+    "user_por_email": "SELECT * FROM users WHERE email = ?",
+    "login_user": "SELECT id, name, email, password FROM users WHERE email = ? AND ativo = 1",
+    "login_vendedor": "SELECT id, name, email, password FROM vendedor WHERE email = ? AND ativo = 1",
+    # Login restaurado por token (sessoes.restaurar): a conta ainda está ativa?
+    "conta_ativa_vendedor": "SELECT 1 FROM vendedor WHERE id = ? AND ativo = 1",
+    "conta_ativa_comprador": "SELECT 1 FROM users WHERE id = ? AND ativo = 1",
+    # Vendedor antes de comprador quando o mesmo e-mail tem as duas contas (PK percorrida ao contrário)
+    "login_conta": """
+        SELECT c.tipo, c.conta_id, COALESCE(v.name, u.name), COALESCE(v.password, u.password)
+        FROM contas c
+        LEFT JOIN vendedor v ON c.tipo = 'vendedor' AND v.id = c.conta_id AND v.ativo = 1
+        LEFT JOIN users u ON c.tipo = 'comprador' AND u.id = c.conta_id AND u.ativo = 1
+        WHERE c.email = ? AND COALESCE(v.id, u.id) IS NOT NULL
+        ORDER BY c.tipo DESC
+    """,
+    "vendedores_ativos": "SELECT id, name, slug, cidade, estado FROM vendedor WHERE ativo = 1 ORDER BY name",
+    "vendedor_por_id": "SELECT id, name, slug, cidade, estado FROM vendedor WHERE id = ?",
+    "vendedor_por_slug": "SELECT id, name, slug, cidade, estado FROM vendedor WHERE slug = ?",
+    "produtos_por_vendedor": '''
+        SELECT p.id, p.nome, p.descricao, p.preco, p.quantidade, p.img_hash, c.nome as categoria_nome
+        FROM produto p
+        LEFT JOIN categorias c ON p.categoria_id = c.id
+        WHERE p.vendedor_id = ? AND p.ativo = 1
+        ORDER BY p.nome, p.id
+    ''',
+    # Paginação por chave (keyset) em (nome, id): cada página continua do último
+    # produto da anterior, sem OFFSET, e usa o mesmo índice do ORDER BY
+    "produtos_pagina_inicio": '''
+        SELECT p.id, p.nome, p.descricao, p.preco, p.quantidade, p.img_hash, c.nome as categoria_nome
+        FROM produto p
+        LEFT JOIN categorias c ON p.categoria_id = c.id
+        WHERE p.vendedor_id = ? AND p.ativo = 1
+        ORDER BY p.nome, p.id
+        LIMIT ?
+    ''',
+    "produtos_pagina_apos": '''
+        SELECT p.id, p.nome, p.descricao, p.preco, p.quantidade, p.img_hash, c.nome as categoria_nome
+        FROM produto p
+        LEFT JOIN categorias c ON p.categoria_id = c.id
+        WHERE p.vendedor_id = ? AND p.ativo = 1 AND (p.nome, p.id) > (?, ?)
+        ORDER BY p.nome, p.id
+        LIMIT ?
+    ''',
+    # Busca textual entre todas as lojas, ordenada por relevância. 'rank' é o bm25
+    # configurado em create_table_produto_fts; o próprio FTS5 já entrega as linhas
+    # nessa ordem, sem ordenação temporária.
+    "busca_produtos": '''
+        SELECT p.id, p.nome, p.descricao, p.preco, p.quantidade, p.img_hash, p.vendedor_id,
+               v.name AS loja_nome, v.slug AS loja_slug, v.cidade, v.estado
+        FROM produto_fts
+        JOIN produto p ON p.id = produto_fts.rowid
+        JOIN vendedor v ON v.id = p.vendedor_id
+        WHERE produto_fts MATCH ? AND produto_fts.rowid >= ? AND p.ativo = 1 AND v.ativo = 1
+          AND (? IS NULL OR v.cidade_busca = ?)
+        ORDER BY produto_fts.rank
+        LIMIT ? OFFSET ?
+    ''',
+    # Menor rowid entre os N resultados mais recentes (limita o custo do bm25, ver search_produtos).
+    # Mesmos filtros da busca: o corte conta só produtos que podem aparecer no resultado.
+    "busca_corte": '''
+        SELECT produto_fts.rowid
+        FROM produto_fts
+        JOIN produto p ON p.id = produto_fts.rowid
+        JOIN vendedor v ON v.id = p.vendedor_id
+        WHERE produto_fts MATCH ? AND p.ativo = 1 AND v.ativo = 1
+          AND (? IS NULL OR v.cidade_busca = ?)
+        ORDER BY produto_fts.rowid DESC
+        LIMIT 1 OFFSET ?
+    ''',
+    # Estoque e vendedor dos produtos de um pedido (create_pedido, checkout_carrinho)
+    "estoque_produtos": "SELECT id, nome, quantidade, ativo, vendedor_id FROM produto WHERE id IN (SELECT value FROM json_each(?))",
+    # Não inclui a coluna antiga 'img': a imagem é lida à parte por get_imagem_produto
+    "produtos_resumo": '''
+        SELECT id, nome, vendedor_id, img_hash FROM produto
+        WHERE id IN (SELECT value FROM json_each(?))
+    ''',
+    "produto_por_id": '''
+        SELECT id, vendedor_id, categoria_id, nome, descricao, preco, quantidade, ativo, img_hash, data_cadastro
+        FROM produto WHERE id = ?
+    ''',
+    "imagem_por_hash": "SELECT dados FROM produto_imagem WHERE hash = ?",
+    "variante_por_hash": "SELECT dados, formato FROM produto_imagem_variante WHERE hash = ? AND tamanho = ?",
+    "variantes_contagem": "SELECT COUNT(*) FROM produto_imagem_variante WHERE hash = ?",
+    "imagem_em_uso": "SELECT 1 FROM produto WHERE img_hash = ? LIMIT 1",
+    "categorias_por_vendedor": "SELECT id, nome FROM categorias WHERE vendedor_id = ? ORDER BY nome",
+    "desvincular_categoria": "UPDATE produto SET categoria_id = NULL WHERE categoria_id = ? AND vendedor_id = ?",
+    "taxas_por_vendedor": "SELECT id, cidade, bairro, estado, valor FROM taxa_entrega WHERE vendedor_id = ? ORDER BY cidade, bairro",
+    "pedidos_por_vendedor": '''
+        SELECT p.*, u.name as comprador_nome FROM pedidos p
+        JOIN users u ON p.comprador_id = u.id
+        WHERE p.vendedor_id = ? ORDER BY p.data_pedido DESC
+    ''',
+    "itens_por_pedido": '''
+        SELECT i.produto_id, i.quantidade, i.preco_unitario, pr.nome
+        FROM itens_pedido i
+        JOIN produto pr ON pr.id = i.produto_id
+        WHERE i.pedido_id = ?
+    ''',
+    # Painel de vendas: leem só o resumo do período (chave primária das tabelas de resumo)
+    "vendas_loja_periodo": '''
+        SELECT dia, pedidos, receita FROM vendas_diarias_loja
+        WHERE vendedor_id = ? AND dia >= ? ORDER BY dia
+    ''',
+    "vendas_produtos_periodo": '''
+        SELECT produto_id, quantidade, receita FROM vendas_diarias
+        WHERE vendedor_id = ? AND dia >= ?
+    ''',
+    # Relatórios (analytics.py): só as colunas numéricas; a primeira diz se o
+    # pedido é do período atual (data >= ?) ou do anterior
+    "analytics_pedidos": '''
+        SELECT data_pedido >= ?, total
+        FROM pedidos WHERE vendedor_id = ? AND data_pedido >= ? AND data_pedido < ?
+    ''',
+    "analytics_pedidos_todos": '''
+        SELECT data_pedido >= ?, total
+        FROM pedidos WHERE data_pedido >= ? AND data_pedido < ?
+    ''',
+    "analytics_itens": '''
+        SELECT p.data_pedido >= ?, i.pedido_id, i.produto_id, i.quantidade, i.preco_unitario
+        FROM pedidos p JOIN itens_pedido i ON i.pedido_id = p.id
+        WHERE p.vendedor_id = ? AND p.data_pedido >= ? AND p.data_pedido < ?
+    ''',
+    "analytics_itens_todos": '''
+        SELECT p.data_pedido >= ?, i.pedido_id, i.produto_id, i.quantidade, i.preco_unitario
+        FROM pedidos p JOIN itens_pedido i ON i.pedido_id = p.id
+        WHERE p.data_pedido >= ? AND p.data_pedido < ?
+    ''',
+    # Exportação: uma linha por item, na ordem dos pedidos (intervalo de datas [inicio, fim))
+    "pedidos_exportacao": '''
+        SELECT p.id AS pedido_id, p.data_pedido, p.status, p.total, p.taxa_entrega, u.name AS comprador_nome,
+               p.rua, p.numero, p.bairro, p.cidade, p.estado, p.cep,
+               i.produto_id, pr.nome AS produto_nome, i.quantidade, i.preco_unitario
+        FROM pedidos p
+        JOIN users u ON u.id = p.comprador_id
+        LEFT JOIN itens_pedido i ON i.pedido_id = p.id
+        LEFT JOIN produto pr ON pr.id = i.produto_id
+        WHERE p.vendedor_id = ? AND p.data_pedido >= ? AND p.data_pedido < ?
+        ORDER BY p.data_pedido, p.id
+    ''',
+}
+
+# --- ÍNDICES ---
+# Conjunto versionado de índices secundários. Para mudar um índice, crie uma nova
+# versão com nomes terminados em _v<versão> e uma migração que chame criar_indices(),
+# que remove os índices das versões antigas.
+INDICES_VERSAO = 3
+INDICES = {
+    1: [
+        # get_produtos_by_vendedor: filtro + ORDER BY nome sem ordenação temporária
+        ("idx_produto_vendedor_ativo_nome_v1", "produto(vendedor_id, ativo, nome)"),
+        # delete_categoria: desvincula produtos da categoria
+        ("idx_produto_categoria_v1", "produto(categoria_id, vendedor_id)"),
+        # get_all_vendedores: índice de cobertura (não precisa ler a tabela)
+        ("idx_vendedor_ativo_nome_v1", "vendedor(ativo, name, slug, cidade, estado)"),
+        # get_categorias_by_vendedor (bancos antigos não têm o UNIQUE(vendedor_id, nome))
+        ("idx_categorias_vendedor_nome_v1", "categorias(vendedor_id, nome)"),
+        # get_taxas_by_vendedor: índice de cobertura
+        ("idx_taxa_entrega_vendedor_v1", "taxa_entrega(vendedor_id, cidade, bairro, estado, valor)"),
+        # get_pedidos_by_vendedor: filtro + ORDER BY data_pedido
+        ("idx_pedidos_vendedor_data_v1", "pedidos(vendedor_id, data_pedido)"),
+        # Itens de um pedido: índice de cobertura
+        ("idx_itens_pedido_pedido_v1", "itens_pedido(pedido_id, produto_id, quantidade, preco_unitario)"),
+    ],
+}
+INDICES[2] = INDICES[1] + [
+    # Verifica se uma imagem ainda é usada antes de removê-la do produto_imagem
+    ("idx_produto_img_hash_v2", "produto(img_hash)"),
+]
+INDICES[3] = INDICES[2] + [
+    # Relatórios de todo o marketplace por período: índice de cobertura
+    ("idx_pedidos_data_total_v3", "pedidos(data_pedido, total)"),
+]
+
+# --- SENHAS ---
+# Só o hash da senha é gravado (senhas.py). Bancos antigos ainda podem ter senhas
+# em texto puro: elas continuam valendo e são trocadas pelo hash no login.
+def _conferir_senha(tabela, registro, password):
+    """
+    True se a senha confere com a linha (id, ..., password) lida do banco.
+    Sem linha (e-mail desconhecido ou conta inativa) o KDF roda do mesmo jeito,
+    contra um hash fictício: o tempo da resposta não revela se a conta existe.
+    """
+    if registro is None:
+        senhas.verificar(password, None)
+        return False
+    armazenado = registro[-1]
+    ok, precisa_atualizar = senhas.verificar(password, armazenado)
+    if ok and precisa_atualizar:
+        _regravar_senha(tabela, registro[0], armazenado, password)
+    return ok
+
+def _regravar_senha(tabela, registro_id, antigo, password):
+    """
+    Troca o valor gravado pelo hash com o custo atual, sem atrasar o login.
+    Se o valor antigo era a senha em texto puro, os logins lembrados
+    (sessoes.py) feitos antes deste são revogados depois da troca; o login
+    que pediu a troca continua valendo. Refazer um hash só porque o custo
+    configurado mudou não revoga nada: a senha é a mesma e estava protegida.
+    """
+    tipo = "vendedor" if tabela == "vendedor" else "comprador"
+    antes_de = time.monotonic()
+    revogar = senhas.texto_puro(antigo)
+
+    def _gravar(conn, novo):
+        # Só troca se ninguém mudou a senha nesse meio tempo
+        cursor = conn.execute(f"UPDATE {tabela} SET password = ? WHERE id = ? AND password = ?", (novo, registro_id, antigo))
+        return cursor.rowcount > 0
+
+    def _gravada(future):
+        if revogar and future.exception() is None and future.result():
+            _notificar("conta", tipo, registro_id, antes_de)
+
+    def _hash_pronto(future):
+        if future.exception() is None:
+            submit_escrita(_gravar, future.result()).add_done_callback(_gravada)
+
+    senhas.agendar_hash(password).add_done_callback(_hash_pronto)
+
+def conta_ativa(tipo, conta_id):
+    """True se a conta ('vendedor' ou 'comprador') existe e está ativa. Erros de banco sobem."""
+    conn = get_connection()
+    try:
+        return conn.execute(CONSULTAS[f"conta_ativa_{tipo}"], (conta_id,)).fetchone() is not None
+    finally:
+        conn.close()
+
+def desativar_conta(tipo, conta_id):
+    """Desativa a conta ('vendedor' ou 'comprador'): o login deixa de funcionar e os logins lembrados são revogados."""
+    tabela = "vendedor" if tipo == "vendedor" else "users"
+
+    def _desativar(conn):
+        return conn.execute(f"UPDATE {tabela} SET ativo = 0 WHERE id = ?", (conta_id,)).rowcount > 0
+
+    desativada = executar_escrita(_desativar)
+    if desativada:
+        if tipo == "vendedor":
+            _invalidar_cache_vendedores()
+        _notificar("conta", tipo, conta_id, time.monotonic())
+    return desativada
+
+# --- CONTAS ---
+# contas (email, tipo, conta_id) reúne os e-mails de vendedores e compradores,
+# mantida por gatilhos, para o login achar a conta em uma única consulta.
+GATILHOS_CONTAS = [
+    gatilho
+    for tabela, tipo in (("vendedor", "vendedor"), ("users", "comprador"))
+    for gatilho in (
+        f'''CREATE TRIGGER IF NOT EXISTS contas_{tabela}_ai AFTER INSERT ON {tabela} BEGIN
+            INSERT OR REPLACE INTO contas (email, tipo, conta_id) VALUES (new.email, '{tipo}', new.id);
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS contas_{tabela}_au AFTER UPDATE OF email ON {tabela} BEGIN
+            DELETE FROM contas WHERE email = old.email AND tipo = '{tipo}';
+            INSERT OR REPLACE INTO contas (email, tipo, conta_id) VALUES (new.email, '{tipo}', new.id);
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS contas_{tabela}_ad AFTER DELETE ON {tabela} BEGIN
+            DELETE FROM contas WHERE email = old.email AND tipo = '{tipo}';
+        END''',
+    )
+]
+
+def create_table_contas(conn):
+    """Cria o índice de contas, preenchido com os vendedores e compradores existentes."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS contas (
+            email TEXT NOT NULL,
+            tipo TEXT NOT NULL CHECK (tipo IN ('vendedor', 'comprador')),
+            conta_id INTEGER NOT NULL,
+            PRIMARY KEY (email, tipo)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("INSERT OR REPLACE INTO contas (email, tipo, conta_id) SELECT email, 'vendedor', id FROM vendedor")
+    conn.execute("INSERT OR REPLACE INTO contas (email, tipo, conta_id) SELECT email, 'comprador', id FROM users")
+    for gatilho in GATILHOS_CONTAS:
+        conn.execute(gatilho)
+
+def autenticar(email, password):
+    """
+    Login de vendedores e compradores com uma consulta (índice de contas).
+    Se o e-mail tiver as duas contas, o vendedor é tentado primeiro.
+    Retorna {"id", "name", "email", "type"} ou None.
+    """
+    conn = get_connection()
+    try:
+        contas = conn.execute(CONSULTAS["login_conta"], (email,)).fetchall()
+    except Exception as e:
+        print(f"Erro ao tentar fazer login: {e}")
+        return None
+    finally:
+        conn.close()
+
+    if not contas:
+        _conferir_senha(None, None, password)  # mesmo custo de uma senha errada
+    for tipo, conta_id, name, armazenado in contas:
+        if _conferir_senha("vendedor" if tipo == "vendedor" else "users", (conta_id, armazenado), password):
+            return {"id": conta_id, "name": name, "email": email, "type": tipo}
+    return None
 
+class User:
     def create_user(self, name, email, password):
-        try:
-            self.cursor.execute('''
+        senha_hash = senhas.gerar_hash(password)
+
+        def _inserir(conn):
+            conn.execute('''
                 INSERT INTO users (name, email, password, ativo)
                 VALUES (?, ?, ?, ?)
-            ''', (name, email, password, 1))
-            self.conn.commit()
+            ''', (name, email, senha_hash, 1))
             return True
+
+        try:
+            return executar_escrita(_inserir)
         except sqlite3.IntegrityError:
             return False
-        finally:
-            self.conn.close()
 
     def get_user_by_email(self, email):
-        self.cursor.execute('''
-            SELECT * FROM users WHERE email = ?
-        ''', (email,))
-        return self.cursor.fetchone()
+        conn = get_connection()
+        try:
+            return conn.execute(CONSULTAS["user_por_email"], (email,)).fetchone()
+        finally:
+            conn.close()
 
     def login_user(self, email, password):
         """Autentica um usuário 'comprador'."""
+        conn = get_connection()
         try:
-            self.cursor.execute('''
-                SELECT id, name, email FROM users WHERE email = ? AND password = ? AND ativo = 1
-            ''', (email, password))
-            user = self.cursor.fetchone()
+            user = conn.execute(CONSULTAS["login_user"], (email,)).fetchone()
             
-            if user:
+            if _conferir_senha("users", user, password):
                 # Retorna um dicionário com os dados do usuário se o login for bem-sucedido
                 return {"id": user[0], "name": user[1], "email": user[2], "type": "comprador"}
             return None
@@ -49,11 +499,10 @@ class User:
             print(f"Erro ao tentar fazer login de usuário: {e}")
             return None
         finally:
-            self.conn.close()
+            conn.close()
 
 
-def create_tables():
-    conn = get_connection()
+def create_tables(conn):
     cursor = conn.cursor()
 
     # Tabela de usuários
@@ -69,12 +518,8 @@ def create_tables():
         )
     ''')
 
-    conn.commit()
-    conn.close()
-
 # Criar a tabela para cadastrar vendedor CPF ou CNPJ
-def create_table_vendedor():
-    conn = get_connection()
+def create_table_vendedor(conn):
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -103,9 +548,6 @@ def create_table_vendedor():
         )
         ''')
 
-    conn.commit()
-    conn.close()
-
 def _generate_slug(text):
     """Gera um slug a partir de um texto: minúsculas, sem acentos, espaços por hífens."""
     # Normaliza para minúsculas e remove acentos
@@ -124,55 +566,57 @@ def _generate_slug(text):
 
 # Criar função para cadastro de vendedor
 def create_vendedor(tipo_pessoa, name, email, cnpj, cpf, telefone, rua, numero, bairro, cidade, estado, cep, password):
-    conn = get_connection()
-    cursor = conn.cursor()
     slug = _generate_slug(name)
-    
-    try:
-        cursor.execute('''
-            INSERT INTO vendedor (
+    cidade_busca = _generate_slug(cidade)  # filtro de cidade da busca (search_produtos)
+    # O KDF roda antes de entrar na fila de escrita: a transação não espera por ele
+    password = senhas.gerar_hash(password)
+
+    def _inserir(conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                INSERT INTO vendedor (
+                    tipo_pessoa, name, email, slug, cnpj, cpf, telefone, rua, numero,
+                    bairro, cidade, cidade_busca, estado, cep, password, ativo
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
                 tipo_pessoa, name, email, slug, cnpj, cpf, telefone, rua, numero,
-                bairro, cidade, estado, cep, password, ativo
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            tipo_pessoa, name, email, slug, cnpj, cpf, telefone, rua, numero,
-            bairro, cidade, estado, cep, password, 1  # Define o vendedor como ativo por padrão
-        ))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError as e:
-        # O erro pode ocorrer se o email, CPF ou CNPJ já existirem.
-        print(f"Erro de integridade ao cadastrar vendedor: {e}")
-        if 'slug' in str(e):
-            # Se o slug já existe, tenta adicionar um sufixo numérico
-            count = 1
-            while True:
-                new_slug = f"{slug}-{count}"
-                try:
-                    cursor.execute('INSERT INTO vendedor (tipo_pessoa, name, email, slug, cnpj, cpf, telefone, rua, numero, bairro, cidade, estado, cep, password, ativo) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', 
-                                   (tipo_pessoa, name, email, new_slug, cnpj, cpf, telefone, rua, numero, bairro, cidade, estado, cep, password, 1))
-                    conn.commit()
-                    return True
-                except sqlite3.IntegrityError:
-                    count += 1
-                if count > 100: # Limite para evitar loop infinito
-                     return False
+                bairro, cidade, cidade_busca, estado, cep, password, 1  # Define o vendedor como ativo por padrão
+            ))
+            return True
+        except sqlite3.IntegrityError as e:
+            # O erro pode ocorrer se o email, CPF ou CNPJ já existirem.
+            print(f"Erro de integridade ao cadastrar vendedor: {e}")
+            if 'slug' in str(e):
+                # Se o slug já existe, tenta adicionar um sufixo numérico
+                count = 1
+                while True:
+                    new_slug = f"{slug}-{count}"
+                    try:
+                        cursor.execute('INSERT INTO vendedor (tipo_pessoa, name, email, slug, cnpj, cpf, telefone, rua, numero, bairro, cidade, cidade_busca, estado, cep, password, ativo) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', 
+                                       (tipo_pessoa, name, email, new_slug, cnpj, cpf, telefone, rua, numero, bairro, cidade, cidade_busca, estado, cep, password, 1))
+                        return True
+                    except sqlite3.IntegrityError:
+                        count += 1
+                    if count > 100: # Limite para evitar loop infinito
+                         return False
 
-        return False
-    finally:
-        conn.close()
+            return False
+
+    criado = executar_escrita(_inserir)
+    if criado:
+        _invalidar_cache_vendedores()
+    return criado
 
 # Função para autenticar um vendedor
 def login_vendedor(email, password):
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute('''
-            SELECT id, name, email FROM vendedor WHERE email = ? AND password = ? AND ativo = 1
-        ''', (email, password))
+        cursor.execute(CONSULTAS["login_vendedor"], (email,))
         vendedor = cursor.fetchone()
         
-        if vendedor:
+        if _conferir_senha("vendedor", vendedor, password):
             # Retorna um dicionário com os dados do vendedor se o login for bem-sucedido
             return {"id": vendedor[0], "name": vendedor[1], "email": vendedor[2], "type": "vendedor"}
         return None
@@ -185,18 +629,23 @@ def login_vendedor(email, password):
 
 # Função para buscar todos os vendedores (lojas)
 def get_all_vendedores():
-    """Busca todos os vendedores ativos no banco de dados."""
+    """Busca todos os vendedores ativos no banco de dados (com cache)."""
+    achou, vendedores = _cache_vendedores_ativos.get("ativos")
+    if achou:
+        return [dict(v) for v in vendedores]  # cópias: quem chama pode alterar os dicionários
+
+    geracao = _cache_vendedores_ativos.geracao
     conn = get_connection()
     # Usar row_factory para retornar dicionários em vez de tuplas
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     try:
-        cursor.execute('''
-            SELECT id, name, slug, cidade, estado FROM vendedor WHERE ativo = 1 ORDER BY name
-        ''')
+        cursor.execute(CONSULTAS["vendedores_ativos"])
         vendedores = cursor.fetchall()
         # Converter os objetos Row para dicionários para facilitar o uso
-        return [dict(row) for row in vendedores]
+        vendedores = [dict(row) for row in vendedores]
+        _cache_vendedores_ativos.set("ativos", vendedores, geracao)
+        return [dict(v) for v in vendedores]
     except Exception as e:
         print(f"Erro ao buscar vendedores: {e}")
         return []
@@ -206,54 +655,83 @@ def get_all_vendedores():
 # Função para buscar um vendedor específico pelo ID
 def get_vendedor_by_id(vendedor_id):
     """Busca os dados de um vendedor específico pelo seu ID."""
+    return _get_vendedor("id", vendedor_id)
+
+# Função para buscar um vendedor específico pelo SLUG
+def get_vendedor_by_slug(slug):
+    """Busca os dados de um vendedor específico pelo seu slug."""
+    return _get_vendedor("slug", slug)
+
+def _get_vendedor(campo, valor):
+    """Leitura com cache de um vendedor por 'id' ou 'slug'. Vendedor inexistente (None) também fica em cache."""
+    achou, vendedor = _cache_vendedor.get((campo, valor))
+    if achou:
+        return dict(vendedor) if vendedor else None
+
+    geracao = _cache_vendedor.geracao
     conn = get_connection()
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     try:
-        cursor.execute('SELECT id, name, slug, cidade, estado FROM vendedor WHERE id = ?', (vendedor_id,))
+        cursor.execute(CONSULTAS[f"vendedor_por_{campo}"], (valor,))
         vendedor = cursor.fetchone()
+        vendedor = dict(vendedor) if vendedor else None
+        _cache_vendedor.set((campo, valor), vendedor, geracao)
         return dict(vendedor) if vendedor else None
     except Exception as e:
-        print(f"Erro ao buscar vendedor por ID: {e}")
+        print(f"Erro ao buscar vendedor por {campo}: {e}")
         return None
     finally:
         conn.close()
 
-# Função para buscar um vendedor específico pelo SLUG
-def get_vendedor_by_slug(slug):
-    """Busca os dados de um vendedor específico pelo seu slug."""
+# Função para buscar produtos de um vendedor específico
+def ler_produtos_vendedor(vendedor_id):
+    """
+    Como get_produtos_by_vendedor, mas um erro de banco (inclusive a consulta
+    interrompida por cancelavel) sobe em vez de virar []. Para quem guarda o
+    resultado em cache (catalogo.py): uma falha não pode passar por loja vazia.
+    """
     conn = get_connection()
     conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
     try:
-        cursor.execute('SELECT id, name, slug, cidade, estado FROM vendedor WHERE slug = ?', (slug,))
-        vendedor = cursor.fetchone()
-        return dict(vendedor) if vendedor else None
-    except Exception as e:
-        print(f"Erro ao buscar vendedor por slug: {e}")
-        return None
+        return [dict(row) for row in conn.execute(CONSULTAS["produtos_por_vendedor"], (vendedor_id,))]
     finally:
         conn.close()
 
-# Função para buscar produtos de um vendedor específico
 def get_produtos_by_vendedor(vendedor_id):
     """Busca todos os produtos ativos de um vendedor específico."""
-    conn = get_connection()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
     try:
-        cursor.execute('''
-            SELECT p.id, p.nome, p.descricao, p.preco, p.quantidade, p.img, c.nome as categoria_nome
-            FROM produto p
-            LEFT JOIN categorias c ON p.categoria_id = c.id
-            WHERE p.vendedor_id = ? AND p.ativo = 1
-            ORDER BY p.nome
-        ''', (vendedor_id,))
-        produtos = cursor.fetchall()
-        return [dict(row) for row in produtos]
+        return ler_produtos_vendedor(vendedor_id)
     except Exception as e:
         print(f"Erro ao buscar produtos por vendedor: {e}")
         return []
+
+PRODUTOS_POR_PAGINA = 24
+
+def get_produtos_pagina(vendedor_id, apos=None, limite=None):
+    """
+    Busca uma página dos produtos ativos de um vendedor, ordenados por nome.
+
+    'apos' é o cursor (nome, id) do último produto da página anterior (None para a
+    primeira página). Retorna (produtos, proximo_cursor); proximo_cursor é None
+    quando não há mais páginas.
+    """
+    limite = limite or PRODUTOS_POR_PAGINA
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
+    try:
+        # Busca um a mais para saber se existe próxima página
+        if apos is None:
+            rows = conn.execute(CONSULTAS["produtos_pagina_inicio"], (vendedor_id, limite + 1)).fetchall()
+        else:
+            nome, produto_id = apos
+            rows = conn.execute(CONSULTAS["produtos_pagina_apos"], (vendedor_id, nome, produto_id, limite + 1)).fetchall()
+        produtos = [dict(row) for row in rows[:limite]]
+        proximo = (produtos[-1]["nome"], produtos[-1]["id"]) if len(rows) > limite else None
+        return produtos, proximo
+    except Exception as e:
+        print(f"Erro ao buscar página de produtos: {e}")
+        return [], None
     finally:
         conn.close()
 
@@ -285,8 +763,7 @@ def alterar_table_produto():
     pass"""
 
 # Criar a tabela produto (com campo de imagem)
-def create_table_produto():
-    conn = get_connection()
+def create_table_produto(conn):
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -300,17 +777,14 @@ def create_table_produto():
             quantidade INTEGER NOT NULL,
             ativo INTEGER NOT NULL,
             img BLOB,
+            img_hash TEXT,
             data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (vendedor_id) REFERENCES vendedor(id)
         )
     ''')
 
-    conn.commit()
-    conn.close()
-
 # Criar a tabela de categorias
-def create_table_categorias():
-    conn = get_connection()
+def create_table_categorias(conn):
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS categorias (
@@ -321,74 +795,71 @@ def create_table_categorias():
             UNIQUE(vendedor_id, nome)
         )
     ''')
-    conn.commit()
-    conn.close()
 
 # Função para criar uma nova categoria
 def create_categoria(vendedor_id, nome):
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute('INSERT INTO categorias (vendedor_id, nome) VALUES (?, ?)', (vendedor_id, nome,))
-        conn.commit()
+    def _inserir(conn):
+        conn.execute('INSERT INTO categorias (vendedor_id, nome) VALUES (?, ?)', (vendedor_id, nome,))
         return True
+
+    try:
+        return executar_escrita(_inserir)
     except sqlite3.IntegrityError: # Ocorre se a categoria já existe (UNIQUE)
         return False
-    finally:
-        conn.close()
 
 # Função para buscar todas as categorias
 def get_categorias_by_vendedor(vendedor_id):
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('SELECT id, nome FROM categorias WHERE vendedor_id = ? ORDER BY nome', (vendedor_id,))
-    return cursor.fetchall()
+    try:
+        cursor.execute(CONSULTAS["categorias_por_vendedor"], (vendedor_id,))
+        return cursor.fetchall()
+    finally:
+        conn.close()
 
 # Função para atualizar uma categoria
 def update_categoria(categoria_id, vendedor_id, novo_nome):
     """Atualiza o nome de uma categoria, verificando a permissão do vendedor."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
+    def _atualizar(conn):
         # A verificação de vendedor_id previne que um vendedor altere a categoria de outro
-        cursor.execute('UPDATE categorias SET nome = ? WHERE id = ? AND vendedor_id = ?', (novo_nome, categoria_id, vendedor_id))
-        conn.commit()
+        cursor = conn.execute('UPDATE categorias SET nome = ? WHERE id = ? AND vendedor_id = ?', (novo_nome, categoria_id, vendedor_id))
         # Retorna True se alguma linha foi afetada (ou seja, a atualização foi bem-sucedida)
         return cursor.rowcount > 0
+
+    try:
+        atualizada = executar_escrita(_atualizar)
     except sqlite3.IntegrityError: # Ocorre se o novo nome já existe para este vendedor
         return False
-    finally:
-        conn.close()
+    if atualizada:
+        _notificar("catalogo", vendedor_id) # o nome da categoria aparece nos produtos
+    return atualizada
 
 # Função para deletar uma categoria
 def delete_categoria(categoria_id, vendedor_id):
     """Deleta uma categoria, verificando a permissão do vendedor."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        # Inicia uma transação para garantir a atomicidade das operações
-        cursor.execute("BEGIN TRANSACTION")
+    def _deletar(conn):
+        # As duas operações rodam na mesma transação (savepoint) da thread de escrita
         # 1. Desvincula os produtos que usam esta categoria (define categoria_id como NULL)
-        cursor.execute('UPDATE produto SET categoria_id = NULL WHERE categoria_id = ? AND vendedor_id = ?', (categoria_id, vendedor_id))
+        conn.execute(CONSULTAS["desvincular_categoria"], (categoria_id, vendedor_id))
         # 2. Deleta a categoria
-        cursor.execute('DELETE FROM categorias WHERE id = ? AND vendedor_id = ?', (categoria_id, vendedor_id))
-        conn.commit()
+        conn.execute('DELETE FROM categorias WHERE id = ? AND vendedor_id = ?', (categoria_id, vendedor_id))
         return True
+
+    try:
+        executar_escrita(_deletar)
     except Exception as e:
+        # Em caso de erro o savepoint é desfeito, nada é gravado
         print(f"Erro ao deletar categoria: {e}")
-        conn.rollback() # Desfaz a transação em caso de erro
         return False
-    finally:
-        conn.close()
+    _notificar("catalogo", vendedor_id)
+    return True
 
 # Função para cadastrar um novo produto
 def create_produto(vendedor_id, nome, descricao, categoria_id, preco, quantidade, img_path=None):
     """
     Insere um novo produto no banco de dados associado a um vendedor.
+    A imagem vai para o produto_imagem; o produto guarda só o hash.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     img_data = None
     if img_path:
         try:
@@ -397,28 +868,89 @@ def create_produto(vendedor_id, nome, descricao, categoria_id, preco, quantidade
         except Exception as e:
             print(f"Erro ao ler o arquivo de imagem: {e}")
             # Decide se quer continuar sem imagem ou retornar erro
+    img_hash = _hash_imagem(img_data) if img_data else None
 
-    try:
-        cursor.execute('''
-            INSERT INTO produto (vendedor_id, nome, descricao, categoria_id, preco, quantidade, ativo, img)
+    def _inserir(conn):
+        if img_hash:
+            _salvar_imagem(conn, img_hash, img_data)
+        conn.execute('''
+            INSERT INTO produto (vendedor_id, nome, descricao, categoria_id, preco, quantidade, ativo, img_hash)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (vendedor_id, nome, descricao, categoria_id, preco, quantidade, 1, img_data))
-        conn.commit()
+        ''', (vendedor_id, nome, descricao, categoria_id, preco, quantidade, 1, img_hash))
         return True
+
+    try:
+        executar_escrita(_inserir)
     except Exception as e:
         print(f"Erro ao cadastrar produto: {e}")
         return False
-    finally:
-        conn.close()
+    _notificar("catalogo", vendedor_id)
+    if img_hash:
+        _agendar_variantes(img_hash, img_data)
+    return True
+
+def create_produtos_lote(vendedor_id, produtos):
+    """
+    Insere vários produtos do vendedor em uma única transação (usado pela
+    importação em massa). 'produtos' é uma lista de tuplas
+    (nome, descricao, categoria_id, preco, quantidade, img_data).
+
+    Retorna (inseridos, erros), onde erros é uma lista de (indice, mensagem)
+    com as posições de 'produtos' que o banco recusou; as demais são gravadas.
+    """
+    imagens_lote = {}
+    linhas = []
+    for nome, descricao, categoria_id, preco, quantidade, img_data in produtos:
+        img_hash = _hash_imagem(img_data) if img_data else None
+        if img_hash:
+            imagens_lote[img_hash] = img_data
+        linhas.append((vendedor_id, nome, descricao, categoria_id, preco, quantidade, img_hash))
+
+    sql = '''
+        INSERT INTO produto (vendedor_id, nome, descricao, categoria_id, preco, quantidade, ativo, img_hash)
+        VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+    '''
+
+    def _inserir(conn):
+        conn.executemany(
+            "INSERT OR IGNORE INTO produto_imagem (hash, dados, tamanho) VALUES (?, ?, ?)",
+            [(img_hash, dados, len(dados)) for img_hash, dados in imagens_lote.items()],
+        )
+        conn.execute("SAVEPOINT importar_lote")
+        try:
+            conn.executemany(sql, linhas)
+            conn.execute("RELEASE importar_lote")
+            return len(linhas), [], []
+        except sqlite3.DatabaseError:
+            conn.execute("ROLLBACK TO importar_lote")
+            conn.execute("RELEASE importar_lote")
+        # Alguma linha foi recusada: grava uma a uma para saber qual
+        erros = []
+        for indice, linha in enumerate(linhas):
+            try:
+                conn.execute(sql, linha)
+            except sqlite3.DatabaseError as e:
+                erros.append((indice, str(e)))
+        orfas = [img_hash for img_hash in imagens_lote if _remover_imagem_se_orfa(conn, img_hash)]
+        return len(linhas) - len(erros), erros, orfas
+
+    # Roda sozinho na transação: um lote grande não deve atrasar o commit das escritas pequenas
+    inseridos, erros, orfas = executar_escrita(_inserir, agrupar=False)
+    if inseridos:
+        _notificar("catalogo", vendedor_id)
+    for img_hash in orfas:
+        _despublicar_imagem(img_hash)
+    for img_hash, dados in imagens_lote.items():
+        if img_hash not in orfas:
+            _agendar_variantes(img_hash, dados)
+    return inseridos, erros
+
 # Função para atualizar um produto existente
 def update_produto(produto_id, nome=None, descricao=None, categoria_id=None, preco=None, quantidade=None, img_path=None, remover_img=False):
     """
     Atualiza os detalhes de um produto existente.
     Apenas os campos fornecidos serão atualizados.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-
     fields_to_update = []
     values = []
 
@@ -438,16 +970,22 @@ def update_produto(produto_id, nome=None, descricao=None, categoria_id=None, pre
         fields_to_update.append("quantidade = ?")
         values.append(quantidade)
     
+    img_data = None
+    img_hash = None
+    troca_imagem = False
     if img_path:
         try:
             with open(img_path, 'rb') as f:
                 img_data = f.read()
-            fields_to_update.append("img = ?")
-            values.append(img_data)
+            img_hash = _hash_imagem(img_data)
+            troca_imagem = True
+            fields_to_update.append("img_hash = ?")
+            values.append(img_hash)
         except Exception as e:
             print(f"Erro ao ler o arquivo de imagem para atualização: {e}")
     elif remover_img:
-        fields_to_update.append("img = ?")
+        troca_imagem = True
+        fields_to_update.append("img_hash = ?")
         values.append(None)
 
     if not fields_to_update:
@@ -456,137 +994,285 @@ def update_produto(produto_id, nome=None, descricao=None, categoria_id=None, pre
     sql = f"UPDATE produto SET {', '.join(fields_to_update)} WHERE id = ?"
     values.append(produto_id)
 
+    def _atualizar(conn):
+        row = conn.execute("SELECT vendedor_id, img_hash FROM produto WHERE id = ?", (produto_id,)).fetchone()
+        if not row:
+            return None, None
+        vendedor_id, hash_antigo = row
+        if troca_imagem and img_hash:
+            _salvar_imagem(conn, img_hash, img_data)
+        conn.execute(sql, tuple(values))
+        if troca_imagem and hash_antigo and hash_antigo != img_hash and _remover_imagem_se_orfa(conn, hash_antigo):
+            return vendedor_id, hash_antigo
+        return vendedor_id, None
+
     try:
-        cursor.execute(sql, tuple(values))
-        conn.commit()
+        vendedor_id, orfa = executar_escrita(_atualizar)
+        if orfa:
+            _despublicar_imagem(orfa)  # depois do commit: um rollback não apaga arquivos em uso
+        if img_hash:
+            _agendar_variantes(img_hash, img_data)
+        _notificar("produto", produto_id)
+        if vendedor_id is not None:
+            _notificar("catalogo", vendedor_id)
         return True
     except sqlite3.OperationalError as e:
-        if "database is locked" in str(e):
-            print(f"Database is locked during update_produto for produto_id {produto_id}. Retrying...")
-            # Optionally, implement retry logic here
-            return False
+        if RetryPolicy.is_busy(e):
+            # A thread de escrita já tentou de novo até o prazo da RetryPolicy
+            print(f"Banco ocupado ao atualizar o produto {produto_id}; desistindo após novas tentativas.")
         else:
             print(f"Erro ao atualizar produto: {e}")
-            return False
+        return False
     except Exception as e:
         print(f"Erro ao atualizar produto: {e}")
         return False
+
+# --- IMAGENS DOS PRODUTOS ---
+# As imagens ficam na tabela produto_imagem, endereçadas pelo SHA-256 do conteúdo.
+# Uploads idênticos são gravados uma única vez e o produto guarda só o hash.
+def _hash_imagem(dados):
+    return hashlib.sha256(dados).hexdigest()
+
+def _salvar_imagem(conn, img_hash, dados):
+    """Grava a imagem se ainda não existir (deduplicação pelo hash). Roda dentro de um job de escrita."""
+    conn.execute(
+        "INSERT OR IGNORE INTO produto_imagem (hash, dados, tamanho) VALUES (?, ?, ?)",
+        (img_hash, dados, len(dados)),
+    )
+
+def _remover_imagem_se_orfa(conn, img_hash):
+    """
+    Apaga a imagem e as miniaturas se nenhum produto usa mais o hash. Retorna True se apagou:
+    quem chamou remove os arquivos publicados (_despublicar_imagem) depois do commit.
+    """
+    if conn.execute(CONSULTAS["imagem_em_uso"], (img_hash,)).fetchone():
+        return False
+    conn.execute("DELETE FROM produto_imagem WHERE hash = ?", (img_hash,))
+    conn.execute("DELETE FROM produto_imagem_variante WHERE hash = ?", (img_hash,))
+    return True
+
+def _despublicar_imagem(img_hash):
+    """Esquece as URLs da imagem órfã e apaga os arquivos dela em assets/img."""
+    for tamanho in (None, *imagens.TAMANHOS):
+        _urls_imagem.invalidar((img_hash, tamanho))
+    conn = get_connection()
+    try:
+        # O mesmo arquivo pode ter sido enviado de novo depois do commit
+        if conn.execute(CONSULTAS["imagem_por_hash"], (img_hash,)).fetchone():
+            return
     finally:
         conn.close()
+    imagens.despublicar(img_hash)
+
+def _salvar_variantes(img_hash, variantes):
+    """Grava as miniaturas geradas pelo módulo imagens (chamado do pool de imagens)."""
+    if not variantes:
+        return
+
+    def _inserir(conn):
+        # Se o produto foi apagado/alterado enquanto as miniaturas eram geradas, não grava
+        if not conn.execute("SELECT 1 FROM produto_imagem WHERE hash = ?", (img_hash,)).fetchone():
+            return
+        conn.executemany(
+            "INSERT OR IGNORE INTO produto_imagem_variante (hash, tamanho, formato, dados) VALUES (?, ?, ?, ?)",
+            [(img_hash, tamanho, formato, dados) for tamanho, (formato, dados) in variantes.items()],
+        )
 
-def get_produto_by_id(produto_id):
-    """Busca um produto específico pelo seu ID."""
+    executar_escrita(_inserir)
+
+def _variantes_prontas(img_hash):
+    """True se todas as miniaturas de imagens.TAMANHOS já estão gravadas."""
     conn = get_connection()
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
     try:
-        cursor.execute('SELECT * FROM produto WHERE id = ?', (produto_id,))
-        produto = cursor.fetchone()
-        return dict(produto) if produto else None
-    except Exception as e:
-        print(f"Erro ao buscar produto por ID: {e}")
-        return None
+        return conn.execute(CONSULTAS["variantes_contagem"], (img_hash,)).fetchone()[0] >= len(imagens.TAMANHOS)
     finally:
         conn.close()
 
-# Função genérica para inserir novos campos na tabela produto
-def alterar_table_produto(coluna_nome, tipo_coluna):
-    """
-    Adiciona uma nova coluna à tabela produto caso ela ainda não exista.
-    
-    Parâmetros:
-        coluna_nome (str): nome da nova coluna
-        tipo_coluna (str): tipo de dado SQL (ex: TEXT, INTEGER, REAL, BLOB)
-    """
+def _ler_original(img_hash):
     conn = get_connection()
-    cursor = conn.cursor()
-
-    # Verificar se a coluna já existe
-    cursor.execute("PRAGMA table_info(produto)")
-    colunas = [col[1] for col in cursor.fetchall()]
-
-    if coluna_nome not in colunas:
-        cursor.execute(f"ALTER TABLE produto ADD COLUMN {coluna_nome} {tipo_coluna}")
-        print(f"✅ Coluna '{coluna_nome}' adicionada com sucesso.")
-    else:
-        print(f"⚠️ A coluna '{coluna_nome}' já existe na tabela produto.")
+    try:
+        row = conn.execute(CONSULTAS["imagem_por_hash"], (img_hash,)).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
 
-    conn.commit()
-    conn.close()
+def _agendar_variantes(img_hash, dados=None):
+    """Gera as miniaturas que faltam. Sem 'dados', a original só é lida se houver o que gerar."""
+    carregar = (lambda: dados) if dados is not None else (lambda: _ler_original(img_hash))
+    imagens.agendar(img_hash, carregar, _salvar_variantes, pronto=_variantes_prontas)
 
-def alterar_table_categorias(coluna_nome, tipo_coluna):
+def get_imagem_produto(img_hash, tamanho=None):
     """
-    Adiciona uma nova coluna à tabela categorias caso ela ainda não exista.
-    
-    Parâmetros:
-        coluna_nome (str): nome da nova coluna
-        tipo_coluna (str): tipo de dado SQL (ex: TEXT, INTEGER, REAL, BLOB)
+    Retorna os bytes da imagem com o hash informado (ou None).
+    'tamanho' escolhe uma miniatura de imagens.TAMANHOS ('card', 'carrinho', 'detalhe');
+    enquanto ela não existir, devolve a original e agenda a geração.
     """
+    if not img_hash:
+        return None
     conn = get_connection()
-    cursor = conn.cursor()
-
-    # Verificar se a coluna já existe
-    cursor.execute("PRAGMA table_info(categorias)")
-    colunas = [col[1] for col in cursor.fetchall()]
-
-    if coluna_nome not in colunas:
-        cursor.execute(f"ALTER TABLE categorias ADD COLUMN {coluna_nome} {tipo_coluna}")
-        print(f"✅ Coluna '{coluna_nome}' adicionada com sucesso à tabela 'categorias'.")
+    try:
+        if tamanho:
+            row = conn.execute(CONSULTAS["variante_por_hash"], (img_hash, tamanho)).fetchone()
+            if row:
+                return row[0]
+        row = conn.execute(CONSULTAS["imagem_por_hash"], (img_hash,)).fetchone()
+        if row and tamanho:
+            _agendar_variantes(img_hash, row[0])  # imagens antigas, anteriores às miniaturas
+        return row[0] if row else None
+    except Exception as e:
+        print(f"Erro ao buscar imagem do produto: {e}")
+        return None
+    finally:
+        conn.close()
 
-    conn.commit()
-    conn.close()
+# (hash, tamanho) -> URL já publicada em assets/img. Limitado (LRU) e com TTL:
+# depois de expirar, a URL é conferida no banco e o arquivo republicado se sumiu.
+_urls_imagem = CacheTTL(CONFIG["cache_urls_max"], CONFIG["cache_urls_ttl"])
 
-def alterar_table_vendedor(coluna_nome, tipo_coluna, unique=False):
+def url_imagem_produto(img_hash, tamanho=None):
     """
-    Adiciona uma nova coluna à tabela vendedor caso ela ainda não exista.
-    Lida com a adição de colunas UNIQUE em tabelas existentes.
+    Retorna a URL estável (/img/<hash>-<tamanho>.<ext>) da imagem para usar em
+    ft.Image(src=...), publicando o arquivo na primeira vez. Evita mandar a imagem
+    em base64 pelo websocket a cada renderização e deixa o navegador usar o cache.
+    Enquanto a miniatura pedida não existir, devolve a URL da original.
     """
+    if not img_hash:
+        return None
+    chave = (img_hash, tamanho)
+    achou, url = _urls_imagem.get(chave)
+    if achou:
+        return url
+    geracao = _urls_imagem.geracao
+
     conn = get_connection()
+    try:
+        row = conn.execute(CONSULTAS["variante_por_hash"], (img_hash, tamanho)).fetchone() if tamanho else None
+        if row:
+            url = imagens.publicar(img_hash, tamanho, row[1], row[0])
+            _urls_imagem.set(chave, url, geracao)
+            return url
+
+        achou, url = _urls_imagem.get((img_hash, None))
+        dados = None
+        if not achou:
+            row = conn.execute(CONSULTAS["imagem_por_hash"], (img_hash,)).fetchone()
+            if not row:
+                return None
+            dados = row[0]
+            url = imagens.publicar(img_hash, None, imagens.formato_dos_bytes(dados), dados)
+            _urls_imagem.set((img_hash, None), url, geracao)
+        if tamanho:
+            _agendar_variantes(img_hash, dados)  # miniatura ainda não gerada ou apagada
+        if tamanho and not imagens.disponivel():
+            _urls_imagem.set(chave, url, geracao)  # sem Pillow a miniatura nunca vai existir
+        return url
+    except Exception as e:
+        print(f"Erro ao publicar imagem do produto: {e}")
+        return None
+    finally:
+        conn.close()
+
+def create_table_produto_imagem(conn):
     cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS produto_imagem (
+            hash TEXT PRIMARY KEY,
+            dados BLOB NOT NULL,
+            tamanho INTEGER NOT NULL,
+            data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS produto_imagem_variante (
+            hash TEXT NOT NULL,
+            tamanho TEXT NOT NULL,
+            formato TEXT NOT NULL,
+            dados BLOB NOT NULL,
+            PRIMARY KEY (hash, tamanho)
+        )
+    ''')
 
+def migrar_imagens_produto(conn, lote=100):
+    """
+    Move as imagens antigas (coluna produto.img) para o produto_imagem,
+    lendo lote imagens por vez para não carregar todas na memória.
+    """
+    total = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, img FROM produto WHERE img IS NOT NULL LIMIT ?", (lote,)
+        ).fetchall()
+        for produto_id, dados in rows:
+            img_hash = _hash_imagem(dados)
+            _salvar_imagem(conn, img_hash, dados)
+            conn.execute("UPDATE produto SET img_hash = ?, img = NULL WHERE id = ?", (img_hash, produto_id))
+        total += len(rows)
+        if len(rows) < lote:
+            break
+    if total:
+        print(f"✅ {total} imagem(ns) migrada(s) para a tabela produto_imagem.")
+    return total
+
+def get_produtos_resumo(produto_ids):
+    """
+    Busca nome, vendedor e hash da imagem de vários produtos em uma única consulta.
+    Retorna um dicionário {produto_id: {...}}.
+    """
+    if not produto_ids:
+        return {}
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
     try:
-        # Verificar se a coluna já existe
-        cursor.execute("PRAGMA table_info(vendedor)")
-        colunas = [col[1] for col in cursor.fetchall()]
-
-        if coluna_nome not in colunas:
-            # 1. Adiciona a coluna sem a restrição UNIQUE
-            cursor.execute(f"ALTER TABLE vendedor ADD COLUMN {coluna_nome} {tipo_coluna}")
-            print(f"✅ Coluna '{coluna_nome}' adicionada com sucesso à tabela 'vendedor'.")
-
-            # 2. Se a coluna deve ser única (como o slug), popula os dados existentes
-            if unique and coluna_nome == 'slug':
-                print("Populando slugs para vendedores existentes...")
-                cursor.execute("SELECT id, name FROM vendedor")
-                vendedores = cursor.fetchall()
-                
-                slugs_existentes = set()
-                for vendedor_id, nome in vendedores:
-                    slug_base = _generate_slug(nome)
-                    slug_final = slug_base
-                    count = 1
-                    while slug_final in slugs_existentes:
-                        slug_final = f"{slug_base}-{count}"
-                        count += 1
-                    
-                    slugs_existentes.add(slug_final)
-                    cursor.execute("UPDATE vendedor SET slug = ? WHERE id = ?", (slug_final, vendedor_id))
-                print("✅ Slugs populados.")
-
-        # 3. Cria o índice UNIQUE se a coluna deve ser única
-        if unique:
-            cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_vendedor_{coluna_nome} ON vendedor({coluna_nome})")
-            print(f"✅ Índice UNIQUE criado para a coluna '{coluna_nome}'.")
+        ids = json.dumps([int(i) for i in produto_ids])
+        return {row["id"]: dict(row) for row in conn.execute(CONSULTAS["produtos_resumo"], (ids,))}
+    except Exception as e:
+        print(f"Erro ao buscar resumo dos produtos: {e}")
+        return {}
+    finally:
+        conn.close()
 
+def get_produto_by_id(produto_id):
+    """Busca um produto específico pelo seu ID."""
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    try:
+        cursor.execute(CONSULTAS["produto_por_id"], (produto_id,))
+        produto = cursor.fetchone()
+        return dict(produto) if produto else None
     except Exception as e:
-        print(f"❌ Erro ao migrar a tabela 'vendedor': {e}")
+        print(f"Erro ao buscar produto por ID: {e}")
+        return None
     finally:
-        conn.commit()
         conn.close()
 
+# Colunas que entraram depois da criação das tabelas. Bancos antigos (sem
+# user_version) podem ou não já tê-las, por isso a migração confere antes.
+def _adicionar_coluna(conn, tabela, coluna, tipo):
+    """Adiciona a coluna se ela ainda não existir. Retorna True se adicionou."""
+    colunas = [col[1] for col in conn.execute(f"PRAGMA table_info({tabela})")]
+    if coluna in colunas:
+        return False
+    conn.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+    print(f"✅ Coluna '{coluna}' adicionada à tabela '{tabela}'.")
+    return True
+
+def _preencher_slugs(conn):
+    """Gera slugs únicos para os vendedores cadastrados antes da coluna slug existir."""
+    slugs_existentes = set()
+    for vendedor_id, nome in conn.execute("SELECT id, name FROM vendedor").fetchall():
+        slug_base = _generate_slug(nome)
+        slug_final = slug_base
+        count = 1
+        while slug_final in slugs_existentes:
+            slug_final = f"{slug_base}-{count}"
+            count += 1
+        slugs_existentes.add(slug_final)
+        conn.execute("UPDATE vendedor SET slug = ? WHERE id = ?", (slug_final, vendedor_id))
+    print("✅ Slugs populados.")
+
 # Tabela para salvar os pedidos dos compradores
-def create_table_pedidos():
-    conn = get_connection()
+def create_table_pedidos(conn):
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -620,11 +1306,7 @@ def create_table_pedidos():
         )
     ''')
 
-    conn.commit()
-    conn.close()
-
-def table_taxa_entrega():
-    conn = get_connection()
+def table_taxa_entrega(conn):
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -639,86 +1321,230 @@ def table_taxa_entrega():
         )
     ''')
 
-    conn.commit()
-    conn.close()
     
 def cadastrar_taxa_entrega(vendedor_id, cidade, bairro, estado, valor):
-    conn = get_connection()
-    cursor = conn.cursor()
+    """Bairro vazio vale para a cidade inteira; cidade e bairro vazios, para o estado (taxas.py)."""
+    def _inserir(conn):
+        conn.execute("INSERT INTO taxa_entrega (vendedor_id, cidade, bairro, estado, valor) VALUES (?, ?, ?, ?, ?)", (vendedor_id, cidade, bairro, estado, valor))
 
-    cursor.execute("INSERT INTO taxa_entrega (vendedor_id, cidade, bairro, estado, valor) VALUES (?, ?, ?, ?, ?)", (vendedor_id, cidade, bairro, estado, valor))
-    conn.commit()
-    conn.close()
+    executar_escrita(_inserir)
+    _notificar("taxa", vendedor_id)
 
-def get_taxas_by_vendedor(vendedor_id):
-    """Busca todas as taxas de entrega de um vendedor específico."""
+def ler_taxas_vendedor(vendedor_id):
+    """
+    Como get_taxas_by_vendedor, mas um erro de banco sobe em vez de virar [].
+    Para quem guarda o resultado em cache (taxas.py): uma falha não pode
+    passar por "loja sem taxas".
+    """
     conn = get_connection()
     conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
     try:
-        cursor.execute('SELECT id, cidade, bairro, estado, valor FROM taxa_entrega WHERE vendedor_id = ? ORDER BY cidade, bairro', (vendedor_id,))
-        taxas = cursor.fetchall()
-        return [dict(row) for row in taxas]
+        return [dict(row) for row in conn.execute(CONSULTAS["taxas_por_vendedor"], (vendedor_id,))]
+    finally:
+        conn.close()
+
+def get_taxas_by_vendedor(vendedor_id):
+    """Busca todas as taxas de entrega de um vendedor específico."""
+    try:
+        return ler_taxas_vendedor(vendedor_id)
     except Exception as e:
         print(f"Erro ao buscar taxas de entrega: {e}")
         return []
-    finally:
-        conn.close()
 
 def delete_taxa_entrega(taxa_id, vendedor_id):
     """Deleta uma taxa de entrega, verificando a permissão do vendedor."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute('DELETE FROM taxa_entrega WHERE id = ? AND vendedor_id = ?', (taxa_id, vendedor_id))
-        conn.commit()
+    def _deletar(conn):
+        cursor = conn.execute('DELETE FROM taxa_entrega WHERE id = ? AND vendedor_id = ?', (taxa_id, vendedor_id))
         return cursor.rowcount > 0
-    finally:
-        conn.close()
+
+    deletada = executar_escrita(_deletar)
+    if deletada:
+        _notificar("taxa", vendedor_id)
+    return deletada
     
+class EstoqueInsuficiente(Exception):
+    """Levantada dentro do job de escrita do pedido para desfazer tudo o que foi gravado."""
+
+    def __init__(self, itens):
+        super().__init__(f"{len(itens)} item(ns) sem estoque suficiente")
+        self.itens = itens
+
+class SemEntrega(Exception):
+    """Levantada no checkout quando alguma loja não entrega no endereço."""
+
+    def __init__(self, vendedores):
+        super().__init__(f"{len(vendedores)} loja(s) não entregam no endereço")
+        self.vendedores = vendedores
+
+def _somar_itens(itens):
+    """
+    Soma itens repetidos do mesmo produto: a baixa de estoque é uma por produto.
+    Retorna (quantidades, precos), ambos {produto_id: valor}, ou (None, None) se inválido.
+    """
+    quantidades = {}
+    precos = {}
+    for item in itens:
+        produto_id = int(item['id'])
+        quantidades[produto_id] = quantidades.get(produto_id, 0) + int(item['quantity'])
+        precos[produto_id] = item['price']
+    if not quantidades or any(q <= 0 for q in quantidades.values()):
+        return None, None
+    return quantidades, precos
+
+def _estoque_produtos(conn, quantidades):
+    """{produto_id: (id, nome, quantidade, ativo, vendedor_id)} em uma única consulta."""
+    return {
+        row[0]: row for row in conn.execute(CONSULTAS["estoque_produtos"], (json.dumps(list(quantidades)),))
+    }
+
+def _baixar_estoque(conn, quantidades):
+    """
+    Baixa o estoque de todos os produtos com um único executemany. A condição
+    'quantidade >= ?' nunca deixa o estoque negativo; se algum produto não tiver
+    o suficiente, desfaz as baixas e levanta EstoqueInsuficiente com os itens em falta.
+    Roda dentro de um job de escrita.
+    """
+    conn.execute("SAVEPOINT baixa_estoque")
+    baixa = conn.executemany(
+        "UPDATE produto SET quantidade = quantidade - ? WHERE id = ? AND quantidade >= ? AND ativo = 1",
+        [(quantidade, produto_id, quantidade) for produto_id, quantidade in quantidades.items()],
+    )
+    if baixa.rowcount == len(quantidades):
+        conn.execute("RELEASE baixa_estoque")
+        return
+
+    # Desfaz as baixas que deram certo para ler o estoque original
+    conn.execute("ROLLBACK TO baixa_estoque")
+    conn.execute("RELEASE baixa_estoque")
+    estoque = _estoque_produtos(conn, quantidades)
+    sem_estoque = []
+    for produto_id, quantidade in quantidades.items():
+        row = estoque.get(produto_id)
+        disponivel = row[2] if row and row[3] else 0  # produto apagado ou inativo conta como sem estoque
+        if disponivel < quantidade:
+            sem_estoque.append({
+                "id": produto_id,
+                "nome": row[1] if row else None,
+                "pedido": quantidade,
+                "disponivel": disponivel,
+            })
+    raise EstoqueInsuficiente(sem_estoque)
+
+def _inserir_pedido(conn, comprador_id, vendedor_id, total, endereco, taxa_entrega=0.0):
+    """'total' já inclui a taxa de entrega, que também fica gravada à parte."""
+    cursor = conn.execute('''
+        INSERT INTO pedidos (comprador_id, vendedor_id, total, taxa_entrega, status, rua, numero, bairro, cidade, estado, cep)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (comprador_id, vendedor_id, total, taxa_entrega, 'Pendente', endereco['rua'], endereco['numero'], endereco['bairro'], endereco['cidade'], endereco['estado'], endereco['cep']))
+    return cursor.lastrowid
+
+def _inserir_itens(conn, linhas):
+    """linhas: [(pedido_id, produto_id, quantidade, preco_unitario), ...]"""
+    conn.executemany(
+        "INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unitario) VALUES (?, ?, ?, ?)",
+        linhas,
+    )
+
 def create_pedido(comprador_id, vendedor_id, total, endereco, itens):
     """
     Cria um novo pedido no banco de dados, incluindo os itens e atualizando o estoque.
     'endereco' é um dicionário com rua, numero, bairro, cidade, estado, cep.
     'itens' é uma lista de dicionários, cada um com 'id', 'quantity', 'price'.
+
+    Retorna um dicionário:
+      {"ok": True, "pedido_id": 123}
+      {"ok": False, "erro": "estoque", "sem_estoque": [{"id", "nome", "pedido", "disponivel"}, ...]}
+      {"ok": False, "erro": "<mensagem>"}
+    Se algum item não tiver estoque, nada é gravado.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    quantidades, precos = _somar_itens(itens)
+    if not quantidades:
+        return {"ok": False, "erro": "Pedido sem itens ou com quantidade inválida."}
+
+    def _inserir(conn):
+        # A thread de escrita já abriu a transação (e um savepoint para este job);
+        # qualquer exceção desfaz tudo o que foi feito aqui. Se o banco estiver
+        # ocupado a transação é reiniciada e esta função roda de novo do zero.
+        _baixar_estoque(conn, quantidades)
+        pedido_id = _inserir_pedido(conn, comprador_id, vendedor_id, total, endereco)
+        _inserir_itens(conn, [(pedido_id, produto_id, quantidade, precos[produto_id]) for produto_id, quantidade in quantidades.items()])
+        return pedido_id
+
     try:
-        # Inicia a transação
-        cursor.execute("BEGIN TRANSACTION")
+        pedido_id = executar_escrita(_inserir)
+    except EstoqueInsuficiente as e:
+        return {"ok": False, "erro": "estoque", "sem_estoque": e.itens}
+    except Exception as e:
+        print(f"Erro ao criar pedido: {e}")
+        return {"ok": False, "erro": "Erro ao gravar o pedido."}
+    _notificar("catalogo", vendedor_id) # estoque mudou
+    _notificar("pedido", vendedor_id)
+    return {"ok": True, "pedido_id": pedido_id}
 
-        # 1. Inserir na tabela 'pedidos'
-        cursor.execute('''
-            INSERT INTO pedidos (comprador_id, vendedor_id, total, status, rua, numero, bairro, cidade, estado, cep)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (comprador_id, vendedor_id, total, 'Pendente', endereco['rua'], endereco['numero'], endereco['bairro'], endereco['cidade'], endereco['estado'], endereco['cep']))
-        
-        pedido_id = cursor.lastrowid
+def checkout_carrinho(comprador_id, carrinho, endereco, fretes=None):
+    """
+    Finaliza um carrinho que pode ter produtos de várias lojas.
+    'carrinho' é o carrinho da sessão: {produto_id: {"quantity", "price"}}.
 
-        # 2. Inserir na tabela 'itens_pedido' e atualizar o estoque
-        for item in itens:
-            produto_id = item['id']
-            quantidade_comprada = item['quantity']
-            
-            # Inserir item no pedido
-            cursor.execute('''
-                INSERT INTO itens_pedido (pedido_id, produto_id, quantidade, preco_unitario)
-                VALUES (?, ?, ?, ?)
-            ''', (pedido_id, produto_id, quantidade_comprada, item['price']))
+    Cria um pedido por vendedor, todos na mesma transação (um único job de
+    escrita): ou todos os pedidos são gravados, ou nenhum. O vendedor de cada
+    produto vem do banco, não da sessão.
 
-            # Atualizar estoque do produto
-            cursor.execute('UPDATE produto SET quantidade = quantidade - ? WHERE id = ?', (quantidade_comprada, produto_id))
+    'fretes' ({vendedor_id: taxa}, ver taxas.fretes_do_carrinho) traz a taxa de
+    entrega de cada loja para o endereço, já calculada antes da escrita: o job
+    só confere que cada loja tem a sua e a soma ao total do pedido. Taxa None
+    indica que a loja não entrega lá e nada é gravado. Sem 'fretes', a entrega
+    não é cobrada.
 
-        # Confirma a transação
-        conn.commit()
-        return pedido_id
+    Retorna {"ok": True, "pedidos": {vendedor_id: pedido_id}}, os mesmos
+    erros de create_pedido ou {"ok": False, "erro": "entrega", "vendedores": [...]}.
+    """
+    quantidades, precos = _somar_itens({"id": produto_id, **item} for produto_id, item in carrinho.items())
+    if not quantidades:
+        return {"ok": False, "erro": "Pedido sem itens ou com quantidade inválida."}
+
+    def _inserir(conn):
+        _baixar_estoque(conn, quantidades)
+
+        # Agrupa os itens por vendedor (depois da baixa, todos os produtos existem e estão ativos)
+        por_vendedor = {}
+        for produto_id, row in _estoque_produtos(conn, quantidades).items():
+            por_vendedor.setdefault(row[4], []).append(produto_id)
+
+        if fretes is None:
+            taxas = dict.fromkeys(por_vendedor, 0.0)
+        else:
+            sem_calculo = [vendedor_id for vendedor_id in por_vendedor if vendedor_id not in fretes]
+            if sem_calculo:
+                raise ValueError(f"Taxa de entrega não calculada para a(s) loja(s) {sem_calculo}")
+            taxas = {vendedor_id: fretes[vendedor_id] for vendedor_id in por_vendedor}
+        sem_entrega = [vendedor_id for vendedor_id, taxa in taxas.items() if taxa is None]
+        if sem_entrega:
+            raise SemEntrega(sem_entrega)  # desfaz a baixa de estoque
+
+        pedidos = {}
+        linhas = []
+        for vendedor_id, produto_ids in por_vendedor.items():
+            total = sum(precos[p] * quantidades[p] for p in produto_ids) + taxas[vendedor_id]
+            pedido_id = _inserir_pedido(conn, comprador_id, vendedor_id, total, endereco, taxas[vendedor_id])
+            pedidos[vendedor_id] = pedido_id
+            linhas.extend((pedido_id, p, quantidades[p], precos[p]) for p in produto_ids)
+        _inserir_itens(conn, linhas)  # itens de todos os pedidos em um único lote
+        return pedidos
+
+    try:
+        pedidos = executar_escrita(_inserir)
+    except EstoqueInsuficiente as e:
+        return {"ok": False, "erro": "estoque", "sem_estoque": e.itens}
+    except SemEntrega as e:
+        return {"ok": False, "erro": "entrega", "vendedores": e.vendedores}
     except Exception as e:
-        print(f"Erro ao criar pedido: {e}")
-        conn.rollback() # Desfaz todas as operações em caso de erro
-        return None
-    finally:
-        conn.close()
+        print(f"Erro ao finalizar o carrinho: {e}")
+        return {"ok": False, "erro": "Erro ao gravar o pedido."}
+    for vendedor_id in pedidos:
+        _notificar("catalogo", vendedor_id) # estoque mudou
+        _notificar("pedido", vendedor_id)
+    return {"ok": True, "pedidos": pedidos}
 
 def get_pedidos_by_vendedor(vendedor_id):
     """Busca todos os pedidos de um vendedor, incluindo o nome do comprador."""
@@ -726,11 +1552,7 @@ def get_pedidos_by_vendedor(vendedor_id):
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     try:
-        cursor.execute('''
-            SELECT p.*, u.name as comprador_nome FROM pedidos p
-            JOIN users u ON p.comprador_id = u.id
-            WHERE p.vendedor_id = ? ORDER BY p.data_pedido DESC
-        ''', (vendedor_id,))
+        cursor.execute(CONSULTAS["pedidos_por_vendedor"], (vendedor_id,))
         pedidos = cursor.fetchall()
         return [dict(row) for row in pedidos]
     except Exception as e:
@@ -739,22 +1561,430 @@ def get_pedidos_by_vendedor(vendedor_id):
     finally:
         conn.close()
 
+LOTE_EXPORTACAO = 500
+
+def iter_pedidos_exportacao(vendedor_id, inicio=None, fim=None, tamanho_lote=LOTE_EXPORTACAO):
+    """
+    Gera os itens dos pedidos do vendedor (um dict por item, com os dados do
+    pedido repetidos), do mais antigo para o mais novo, lendo tamanho_lote
+    linhas por vez com fetchmany: a memória usada não depende do histórico.
+
+    'inicio' e 'fim' são datas 'AAAA-MM-DD' (inclusive); None não limita.
+    """
+    inicio = inicio or ""
+    # data_pedido é texto 'AAAA-MM-DD HH:MM:SS': o fim inclusivo vira "< dia seguinte"
+    fim = (date.fromisoformat(fim) + timedelta(days=1)).isoformat() if fim else "9999-12-31"
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
+    try:
+        cursor = conn.execute(CONSULTAS["pedidos_exportacao"], (vendedor_id, inicio, fim))
+        while True:
+            linhas = cursor.fetchmany(tamanho_lote)
+            if not linhas:
+                break
+            for linha in linhas:
+                yield dict(linha)
+    finally:
+        conn.close()
+
+def get_itens_by_pedido(pedido_id):
+    """Busca os itens de um pedido com o nome de cada produto."""
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute(CONSULTAS["itens_por_pedido"], (pedido_id,))]
+    except Exception as e:
+        print(f"Erro ao buscar itens do pedido: {e}")
+        return []
+    finally:
+        conn.close()
+
+# --- RESUMO DE VENDAS ---
+# vendas_diarias (vendedor, dia, produto) e vendas_diarias_loja (vendedor, dia)
+# são mantidas por gatilhos a cada pedido gravado, então o painel lê só as
+# linhas do período pedido, não importa quantos pedidos a loja já tenha.
+# 'dia' é date(data_pedido), em UTC como o CURRENT_TIMESTAMP do pedido.
+GATILHOS_VENDAS = [
+    '''CREATE TRIGGER IF NOT EXISTS vendas_pedidos_ai AFTER INSERT ON pedidos BEGIN
+        INSERT INTO vendas_diarias_loja (vendedor_id, dia, pedidos, receita)
+        VALUES (new.vendedor_id, date(new.data_pedido), 1, new.total)
+        ON CONFLICT (vendedor_id, dia) DO UPDATE SET pedidos = pedidos + 1, receita = receita + excluded.receita;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS vendas_pedidos_ad AFTER DELETE ON pedidos BEGIN
+        UPDATE vendas_diarias_loja SET pedidos = pedidos - 1, receita = receita - old.total
+        WHERE vendedor_id = old.vendedor_id AND dia = date(old.data_pedido);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS vendas_itens_ai AFTER INSERT ON itens_pedido BEGIN
+        INSERT INTO vendas_diarias (vendedor_id, dia, produto_id, quantidade, receita, pedidos)
+        SELECT vendedor_id, date(data_pedido), new.produto_id, new.quantidade, new.quantidade * new.preco_unitario, 1
+        FROM pedidos WHERE id = new.pedido_id
+        ON CONFLICT (vendedor_id, dia, produto_id) DO UPDATE SET
+            quantidade = quantidade + excluded.quantidade,
+            receita = receita + excluded.receita,
+            pedidos = pedidos + 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS vendas_itens_ad AFTER DELETE ON itens_pedido BEGIN
+        UPDATE vendas_diarias SET
+            quantidade = quantidade - old.quantidade,
+            receita = receita - old.quantidade * old.preco_unitario,
+            pedidos = pedidos - 1
+        WHERE (vendedor_id, dia) = (SELECT vendedor_id, date(data_pedido) FROM pedidos WHERE id = old.pedido_id)
+          AND produto_id = old.produto_id;
+    END''',
+]
+
+def _preencher_vendas(conn, vendedor_id=None):
+    """Recalcula o resumo a partir de pedidos/itens_pedido (todos os vendedores quando vendedor_id é None)."""
+    filtro = "" if vendedor_id is None else "WHERE p.vendedor_id = ?"
+    params = () if vendedor_id is None else (vendedor_id,)
+    conn.execute(f"DELETE FROM vendas_diarias {filtro.replace('p.', '')}", params)
+    conn.execute(f"DELETE FROM vendas_diarias_loja {filtro.replace('p.', '')}", params)
+    conn.execute(f'''
+        INSERT INTO vendas_diarias_loja (vendedor_id, dia, pedidos, receita)
+        SELECT p.vendedor_id, date(p.data_pedido), COUNT(*), SUM(p.total)
+        FROM pedidos p {filtro}
+        GROUP BY p.vendedor_id, date(p.data_pedido)
+    ''', params)
+    conn.execute(f'''
+        INSERT INTO vendas_diarias (vendedor_id, dia, produto_id, quantidade, receita, pedidos)
+        SELECT p.vendedor_id, date(p.data_pedido), i.produto_id, SUM(i.quantidade), SUM(i.quantidade * i.preco_unitario), COUNT(*)
+        FROM pedidos p JOIN itens_pedido i ON i.pedido_id = p.id {filtro}
+        GROUP BY p.vendedor_id, date(p.data_pedido), i.produto_id
+    ''', params)
+
+def create_table_vendas_diarias(conn):
+    """Cria as tabelas de resumo de vendas (e as preenche com os pedidos existentes na primeira vez)."""
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'vendas_diarias'"
+    ).fetchone()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS vendas_diarias (
+            vendedor_id INTEGER NOT NULL,
+            dia TEXT NOT NULL,
+            produto_id INTEGER NOT NULL,
+            quantidade INTEGER NOT NULL,
+            receita REAL NOT NULL,
+            pedidos INTEGER NOT NULL,
+            PRIMARY KEY (vendedor_id, dia, produto_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS vendas_diarias_loja (
+            vendedor_id INTEGER NOT NULL,
+            dia TEXT NOT NULL,
+            pedidos INTEGER NOT NULL,
+            receita REAL NOT NULL,
+            PRIMARY KEY (vendedor_id, dia)
+        ) WITHOUT ROWID
+    ''')
+    if not existe:
+        _preencher_vendas(conn)
+        print("✅ Resumo de vendas (vendas_diarias) criado.")
+    for gatilho in GATILHOS_VENDAS:
+        conn.execute(gatilho)
+
+def reconstruir_vendas_diarias(vendedor_id=None):
+    """Refaz o resumo de vendas do zero (backfill ou correção), de um vendedor ou de todos."""
+    try:
+        executar_escrita(_preencher_vendas, vendedor_id, agrupar=False)
+        return True
+    except Exception as e:
+        print(f"Erro ao reconstruir o resumo de vendas: {e}")
+        return False
+
+def get_resumo_vendas(vendedor_id, dias=30, top=10):
+    """
+    Métricas do painel do vendedor nos últimos 'dias' (incluindo hoje):
+    {"receita", "receita_produtos", "taxas_entrega", "pedidos", "ticket_medio",
+     "por_dia": [{"dia", "pedidos", "receita"}],
+     "top_produtos": [{"produto_id", "nome", "quantidade", "receita"}]}.
+    "receita" (e a de cada dia) é o total dos pedidos, o que os compradores
+    pagaram: produtos mais taxas de entrega. A receita de cada produto é só
+    quantidade * preço, então a soma dos produtos é "receita_produtos", e a
+    diferença para "receita" é "taxas_entrega".
+    Lê só o resumo do período, nunca os pedidos.
+    """
+    # 'dia' do resumo está em UTC (CURRENT_TIMESTAMP do pedido)
+    desde = (datetime.now(timezone.utc).date() - timedelta(days=dias - 1)).isoformat()
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
+    try:
+        por_dia = [dict(row) for row in conn.execute(CONSULTAS["vendas_loja_periodo"], (vendedor_id, desde))]
+        # Agrega por produto aqui: o período tem poucas linhas e evita ordenação temporária no SQLite
+        por_produto = {}
+        for row in conn.execute(CONSULTAS["vendas_produtos_periodo"], (vendedor_id, desde)):
+            soma = por_produto.setdefault(row["produto_id"], {"produto_id": row["produto_id"], "quantidade": 0, "receita": 0.0})
+            soma["quantidade"] += row["quantidade"]
+            soma["receita"] += row["receita"]
+    except Exception as e:
+        print(f"Erro ao buscar o resumo de vendas: {e}")
+        por_dia, por_produto = [], {}
+    finally:
+        conn.close()
+
+    top_produtos = heapq.nlargest(top, por_produto.values(), key=lambda p: p["receita"])
+    nomes = get_produtos_resumo([p["produto_id"] for p in top_produtos])
+    for produto in top_produtos:
+        resumo = nomes.get(produto["produto_id"])
+        produto["nome"] = resumo["nome"] if resumo else f"Produto #{produto['produto_id']} (removido)"
+
+    receita = sum(d["receita"] for d in por_dia)
+    receita_produtos = sum(p["receita"] for p in por_produto.values())
+    pedidos = sum(d["pedidos"] for d in por_dia)
+    return {
+        "receita": receita,
+        "receita_produtos": receita_produtos,
+        "taxas_entrega": max(round(receita - receita_produtos, 2), 0.0),
+        "pedidos": pedidos,
+        "ticket_medio": receita / pedidos if pedidos else 0.0,
+        "por_dia": por_dia,
+        "top_produtos": top_produtos,
+    }
+
+def criar_indices(conn):
+    """
+    Cria os índices da versão atual (INDICES_VERSAO) e remove os de versões anteriores.
+    """
+    cursor = conn.cursor()
+    atuais = {nome for nome, _ in INDICES[INDICES_VERSAO]}
+    for nome, alvo in INDICES[INDICES_VERSAO]:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {nome} ON {alvo}")
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")
+    for (nome,) in cursor.fetchall():
+        versao = re.search(r'_v(\d+)$', nome)
+        if versao and int(versao.group(1)) < INDICES_VERSAO and nome not in atuais:
+            cursor.execute(f"DROP INDEX IF EXISTS {nome}")
+            print(f"🗑️ Índice antigo '{nome}' removido.")
+    cursor.execute("PRAGMA optimize")  # atualiza as estatísticas do planejador só quando necessário
+
+# --- BUSCA (FTS5) ---
+# produto_fts guarda nome, descrição e nome da categoria de cada produto, com
+# rowid = produto.id. Os gatilhos abaixo mantêm o índice em dia a cada INSERT,
+# UPDATE e DELETE em produto e categorias.
+GATILHOS_BUSCA = [
+    '''CREATE TRIGGER IF NOT EXISTS produto_fts_ai AFTER INSERT ON produto BEGIN
+        INSERT INTO produto_fts (rowid, nome, descricao, categoria)
+        VALUES (new.id, new.nome, new.descricao, (SELECT nome FROM categorias WHERE id = new.categoria_id));
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS produto_fts_au AFTER UPDATE OF nome, descricao, categoria_id ON produto BEGIN
+        DELETE FROM produto_fts WHERE rowid = old.id;
+        INSERT INTO produto_fts (rowid, nome, descricao, categoria)
+        VALUES (new.id, new.nome, new.descricao, (SELECT nome FROM categorias WHERE id = new.categoria_id));
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS produto_fts_ad AFTER DELETE ON produto BEGIN
+        DELETE FROM produto_fts WHERE rowid = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS categorias_fts_au AFTER UPDATE OF nome ON categorias BEGIN
+        UPDATE produto_fts SET categoria = new.nome
+        WHERE rowid IN (SELECT id FROM produto WHERE categoria_id = new.id);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS categorias_fts_ad AFTER DELETE ON categorias BEGIN
+        UPDATE produto_fts SET categoria = NULL
+        WHERE rowid IN (SELECT id FROM produto WHERE categoria_id = old.id);
+    END''',
+]
+
+def create_table_produto_fts(conn):
+    """Cria o índice de busca (e o preenche com os produtos existentes na primeira vez)."""
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'produto_fts'"
+    ).fetchone()
+    if not existe:
+        # remove_diacritics: 'cafe' encontra 'café'
+        conn.execute('''
+            CREATE VIRTUAL TABLE produto_fts USING fts5(
+                nome, descricao, categoria,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        ''')
+        conn.execute('''
+            INSERT INTO produto_fts (rowid, nome, descricao, categoria)
+            SELECT p.id, p.nome, p.descricao, c.nome
+            FROM produto p LEFT JOIN categorias c ON c.id = p.categoria_id
+        ''')
+        print("✅ Índice de busca (produto_fts) criado.")
+    # Relevância: nome pesa mais que categoria, que pesa mais que descrição
+    conn.execute("INSERT INTO produto_fts (produto_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0, 4.0)')")
+    for gatilho in GATILHOS_BUSCA:
+        conn.execute(gatilho)
+
+def _consulta_fts(texto):
+    """
+    Converte o texto digitado em uma consulta FTS5 segura: cada palavra vai entre
+    aspas e todas são obrigatórias. Só a última é prefixo, pois pode estar sendo
+    digitada ('camiseta az' -> '"camiseta" "az"*'); prefixos custam mais caro.
+    """
+    palavras = [f'"{p}"' for p in re.findall(r"\w+", texto or "")]
+    if palavras:
+        palavras[-1] += "*"
+    return " ".join(palavras)
+
+# O bm25 é calculado para cada produto encontrado. Termos muito comuns ("kit",
+# "azul") podem casar com boa parte do catálogo, então a relevância é calculada
+# só entre os CANDIDATOS_BUSCA produtos mais recentes que casam com a busca
+# (e com os filtros: ativos, de lojas ativas e da cidade pedida).
+CANDIDATOS_BUSCA = 5000
+
+def search_produtos(query, cidade=None, limit=20, offset=0):
+    """
+    Busca produtos ativos de todas as lojas ativas pelo nome, descrição ou
+    categoria, do mais relevante para o menos relevante.
+    'cidade' (opcional) restringe às lojas daquela cidade, sem diferenciar
+    maiúsculas nem acentos ("SÃO PAULO" = "são paulo" = "Sao Paulo").
+    """
+    consulta = _consulta_fts(query)
+    if not consulta:
+        return []
+    # Comparada com vendedor.cidade_busca, normalizada do mesmo jeito (o NOCASE
+    # do SQLite só ignora a caixa das letras ASCII: "SÃO" != "são")
+    cidade = _generate_slug(cidade or "") or None
+    conn = get_connection()
+    conn.row_factory = sqlite3.Row
+    try:
+        corte = conn.execute(CONSULTAS["busca_corte"], (consulta, cidade, cidade, CANDIDATOS_BUSCA)).fetchone()
+        corte = corte[0] if corte else 0  # menos resultados que o limite: ordena todos
+        rows = conn.execute(CONSULTAS["busca_produtos"], (consulta, corte, cidade, cidade, limit, offset)).fetchall()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        print(f"Erro ao buscar produtos: {e}")
+        return []
+    finally:
+        conn.close()
+
+# --- MIGRAÇÕES ---
+# O schema é versionado pelo PRAGMA user_version. Cada migração roda uma única
+# vez, na sua própria transação junto com a atualização do user_version: ou
+# ela é aplicada inteira, ou o banco continua na versão anterior. Para mudar o
+# schema, acrescente uma migração no fim da lista (nunca altere as antigas).
+# Bancos criados antes deste controle estão na versão 0; por isso as primeiras
+# migrações conferem o que já existe (IF NOT EXISTS, _adicionar_coluna).
+def _migracao_tabelas(conn):
+    create_tables(conn)
+    create_table_vendedor(conn)
+    create_table_produto(conn)
+    create_table_categorias(conn)
+    create_table_pedidos(conn)
+    table_taxa_entrega(conn)
+
+def _migracao_colunas(conn):
+    _adicionar_coluna(conn, "users", "ativo", "INTEGER NOT NULL DEFAULT 1")  # antigo migrar_db.py
+    if _adicionar_coluna(conn, "vendedor", "slug", "TEXT"):
+        _preencher_slugs(conn)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_vendedor_slug ON vendedor(slug)")
+    _adicionar_coluna(conn, "categorias", "vendedor_id", "INTEGER")
+    _adicionar_coluna(conn, "produto", "categoria_id", "INTEGER")
+    _adicionar_coluna(conn, "produto", "img", "BLOB")  # coluna antiga de imagem, mantida só para a migração 3
+    _adicionar_coluna(conn, "produto", "img_hash", "TEXT")  # referência para o produto_imagem
+
+def _migracao_imagens(conn):
+    global _vacuum_pendente
+    create_table_produto_imagem(conn)
+    if migrar_imagens_produto(conn):
+        # As imagens saíram de produto.img (agora NULL): as páginas livres são
+        # devolvidas pelo VACUUM no fim de migrar(), fora desta transação
+        _vacuum_pendente = True
+
+def _migracao_taxa_pedido(conn):
+    # Parte do total do pedido que é taxa de entrega (pedidos antigos: 0)
+    _adicionar_coluna(conn, "pedidos", "taxa_entrega", "REAL NOT NULL DEFAULT 0")
+
+def _migracao_cidade_busca(conn):
+    # Cidade da loja normalizada como os slugs, para o filtro da busca (search_produtos)
+    _adicionar_coluna(conn, "vendedor", "cidade_busca", "TEXT")
+    for vendedor_id, cidade in conn.execute("SELECT id, cidade FROM vendedor").fetchall():
+        conn.execute("UPDATE vendedor SET cidade_busca = ? WHERE id = ?", (_generate_slug(cidade), vendedor_id))
+
+MIGRACOES = [
+    (1, "tabelas iniciais", _migracao_tabelas),
+    (2, "colunas ativo, slug, categoria e imagem", _migracao_colunas),
+    (3, "imagens por hash (produto_imagem)", _migracao_imagens),
+    (4, "busca textual (produto_fts)", create_table_produto_fts),  # depois das colunas de categoria
+    (5, "resumo de vendas (vendas_diarias)", create_table_vendas_diarias),
+    (6, "índices v3", criar_indices),
+    (7, "índice de contas para o login (contas)", create_table_contas),
+    (8, "taxa de entrega no pedido", _migracao_taxa_pedido),
+    (9, "cidade normalizada para a busca (vendedor.cidade_busca)", _migracao_cidade_busca),
+]
+VERSAO_SCHEMA = MIGRACOES[-1][0]
+
+def versao_schema():
+    """Versão do schema gravada no banco (PRAGMA user_version)."""
+    conn = get_connection()
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+def _aplicar_migracao(conn, versao, migracao):
+    # Confere de novo dentro da transação (BEGIN IMMEDIATE): outro processo pode ter migrado antes
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= versao:
+        return False
+    migracao(conn)
+    conn.execute(f"PRAGMA user_version = {versao}")
+    return True
+
+_vacuum_pendente = False
+
+def _vacuum():
+    """Devolve ao sistema as páginas livres do arquivo. Não roda dentro de transação (nem no escritor)."""
+    global _vacuum_pendente
+    conn = get_connection()
+    try:
+        conn.execute("VACUUM")
+        _vacuum_pendente = False
+        print("✅ Espaço das imagens antigas liberado (VACUUM).")
+    except Exception as e:
+        # Banco em uso: o espaço continua reaproveitável pelo SQLite, só o arquivo não diminui
+        print(f"⚠️ VACUUM não executado: {e}")
+    finally:
+        conn.close()
+
+def migrar():
+    """Aplica, em ordem, as migrações que o banco ainda não tem. Retorna a versão final."""
+    versao_atual = versao_schema()
+    if versao_atual >= VERSAO_SCHEMA:
+        return versao_atual
+    for versao, descricao, migracao in MIGRACOES:
+        if versao <= versao_atual:
+            continue
+        try:
+            if executar_escrita(_aplicar_migracao, versao, migracao, agrupar=False):
+                print(f"✅ Migração {versao} aplicada: {descricao}.")
+        except Exception as e:
+            print(f"❌ Erro na migração {versao} ({descricao}): {e}")
+            raise
+        versao_atual = versao
+    if _vacuum_pendente:
+        _vacuum()
+    _invalidar_cache_vendedores()  # colunas/slugs podem ter mudado
+    return versao_atual
+
+_schema_pronto = False
+_schema_lock = threading.Lock()
+
 def init_db():
-    """Garante que todas as tabelas sejam criadas."""
-    create_tables()
-    create_table_vendedor()
-    create_table_produto()
-    create_table_categorias()
-    create_table_pedidos()
-    table_taxa_entrega()
-    # A função alterar_table_produto já verifica se a coluna existe, então é seguro chamar.
-    alterar_table_vendedor('slug', 'TEXT', unique=True) # Garante a existência da coluna de slug
-    alterar_table_categorias('vendedor_id', 'INTEGER') # Garante a existência da coluna de vendedor na tabela de categorias
-    alterar_table_produto('categoria_id', 'INTEGER') # Garante a existência da coluna de categoria
-    alterar_table_produto('img', 'BLOB') # Garante a existência da coluna de imagem
-    
+    """
+    Garante que o banco esteja na versão atual do schema. Só a primeira chamada
+    do processo consulta o banco (um único PRAGMA quando ele já está em dia);
+    as seguintes, uma por sessão do Flet, não fazem nada.
+    """
+    global _schema_pronto
+    if _schema_pronto:
+        return
+    with _schema_lock:
+        if not _schema_pronto:
+            migrar()
+            _schema_pronto = True
+
 
 # Executa quando rodar python db.py
+# python db.py reconstruir_vendas [vendedor_id] refaz o resumo de vendas
 if __name__ == "__main__":
+    import sys
     init_db()
-    print("Tabelas criadas com sucesso.")
+    print(f"Banco na versão {versao_schema()} do schema.")
+    if len(sys.argv) > 1 and sys.argv[1] == "reconstruir_vendas":
+        vendedor = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        if reconstruir_vendas_diarias(vendedor):
+            print("Resumo de vendas reconstruído.")
@@ -0,0 +1,111 @@
+# db_async.py
+"""
+Acesso ao banco a partir de handlers assíncronos do Flet.
+
+As funções do db.py (e dos módulos que as usam, como catalogo) são síncronas:
+chamadas direto de um handler, uma consulta lenta ou a espera por um lock
+travam a interface daquela sessão e prendem uma thread do servidor. Aqui elas
+rodam em um pool de threads limitado e são aguardadas com await:
+
+    pedidos = await db_async.executar(get_pedidos_by_vendedor, vendedor_id)
+    resultado = await db_async.executar(checkout_carrinho, comprador_id, carrinho, endereco, timeout=None)
+
+Cada chamada tem um tempo limite (CONFIG["async_timeout"] por padrão). Se ele
+estourar ou o handler for cancelado, a consulta em andamento é interrompida
+(db.cancelavel) e uma escrita que ainda não começou é descartada. Uma escrita
+que o escritor já começou não é desfeita: a chamada aguarda o commit e retorna
+o resultado normalmente. TempoEsgotado, portanto, significa que nada foi feito.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+from db_config import CONFIG
+
+TIMEOUT_PADRAO = CONFIG["async_timeout"]
+
+_executor = ThreadPoolExecutor(max_workers=CONFIG["async_workers"], thread_name_prefix="db-async")
+_stats_lock = threading.Lock()
+_stats = {
+    "chamadas": 0,
+    "em_andamento": 0,
+    "tempo_esgotado": 0,
+    "canceladas": 0,
+    "tempo_fila_total": 0.0,
+    "tempo_fila_max": 0.0,
+}
+
+
+class TempoEsgotado(TimeoutError):
+    """A chamada ao banco passou do tempo limite e foi interrompida sem efeito."""
+
+
+def _contar(chave, valor=1):
+    with _stats_lock:
+        _stats[chave] += valor
+
+
+def _rodar(evento, enviado_em, fn, args, kwargs):
+    """Executa fn na thread do pool. Retorna (interrompida, resultado)."""
+    espera = time.perf_counter() - enviado_em
+    with _stats_lock:
+        _stats["em_andamento"] += 1
+        _stats["tempo_fila_total"] += espera
+        _stats["tempo_fila_max"] = max(_stats["tempo_fila_max"], espera)
+    try:
+        with db.cancelavel(evento) as estado:
+            try:
+                resultado = fn(*args, **kwargs)
+            except Exception:
+                if estado["interrompida"]:
+                    return True, None
+                raise
+        return estado["interrompida"], resultado
+    finally:
+        _contar("em_andamento", -1)
+
+
+async def executar(fn, *args, timeout=TIMEOUT_PADRAO, **kwargs):
+    """
+    Executa fn(*args, **kwargs) no pool de threads do banco e retorna o resultado.
+    timeout=None espera sem limite (ex.: checkout, que não deve ser abandonado
+    na metade), mas a chamada continua cancelável junto com o handler.
+    Levanta TempoEsgotado se o tempo acabar antes de a chamada terminar.
+    """
+    _contar("chamadas")
+    evento = threading.Event()
+    futuro = _executor.submit(_rodar, evento, time.perf_counter(), fn, args, kwargs)
+    aguardando = asyncio.wrap_future(futuro)
+    try:
+        interrompida, resultado = await asyncio.wait_for(asyncio.shield(aguardando), timeout)
+    except asyncio.TimeoutError:
+        # Ainda na fila do pool: nem começa. Rodando: interrompe e espera a thread
+        # soltar a conexão, para saber se a chamada terminou mesmo assim.
+        evento.set()
+        if futuro.cancel():
+            interrompida, resultado = True, None
+        else:
+            interrompida, resultado = await aguardando
+        if interrompida:
+            _contar("tempo_esgotado")
+            raise TempoEsgotado(f"{getattr(fn, '__name__', fn)} passou de {timeout}s")
+    except asyncio.CancelledError:
+        # Handler cancelado (sessão fechada etc.): não espera a thread terminar
+        evento.set()
+        if not futuro.cancel():
+            # Consome o resultado quando a thread terminar, sem aviso de exceção não lida
+            aguardando.add_done_callback(lambda f: f.cancelled() or f.exception())
+        _contar("canceladas")
+        raise
+    return resultado
+
+
+def get_stats():
+    """Chamadas feitas, em andamento, interrompidas por tempo/cancelamento e espera na fila do pool."""
+    with _stats_lock:
+        stats = dict(_stats)
+    chamadas = stats["chamadas"]
+    stats["tempo_fila_medio"] = stats["tempo_fila_total"] / chamadas if chamadas else 0.0
+    return stats
@@ -0,0 +1,104 @@
+# db_config.py
+"""
+Configuração do banco de dados.
+
+Todos os valores podem ser sobrescritos por variáveis de ambiente, por exemplo:
+
+    APP_DB_PATH=/var/lib/mercado/users.db APP_DB_PERFIL=seguro python home.py
+
+ou alterando o dicionário CONFIG antes da primeira conexão.
+"""
+import os
+
+# Perfis de PRAGMAs aplicados em toda conexão aberta pelo pool.
+PERFIS_PRAGMA = {
+    # WAL permite leitores concorrentes com um escritor; NORMAL é seguro em WAL
+    # (só perde a última transação em queda de energia, nunca corrompe).
+    "padrao": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,         # ~64 MB por conexão (valor negativo = KiB)
+        "mmap_size": 268435456,       # 256 MB de I/O mapeado em memória
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,        # ms
+    },
+    # Mesmo que o padrão, mas com fsync a cada commit.
+    "seguro": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+    # Comportamento antigo (rollback journal), útil para comparação em benchmarks.
+    "legado": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 30000,
+    },
+}
+
+# Ordem de aplicação: journal_mode primeiro, pois synchronous=NORMAL só é seguro em WAL.
+ORDEM_PRAGMAS = ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout")
+
+CONFIG = {
+    "path": os.environ.get("APP_DB_PATH", "users.db"),
+    "perfil": os.environ.get("APP_DB_PERFIL", "padrao"),
+    "pool_size": int(os.environ.get("APP_DB_POOL_SIZE", "16")),
+    "timeout": float(os.environ.get("APP_DB_TIMEOUT", "30")),
+    # Escritas: busy_timeout curto na conexão do escritor e backoff próprio (db_retry)
+    "writer_busy_timeout": int(os.environ.get("APP_DB_WRITER_BUSY_TIMEOUT", "250")),  # ms
+    "retry_base": float(os.environ.get("APP_DB_RETRY_BASE", "0.005")),
+    "retry_max": float(os.environ.get("APP_DB_RETRY_MAX", "0.5")),
+    "retry_prazo": float(os.environ.get("APP_DB_RETRY_PRAZO", "30")),
+    # Cache de leitura dos vendedores (db.py); invalidado nas escritas
+    "cache_vendedor_ttl": float(os.environ.get("APP_CACHE_VENDEDOR_TTL", "300")),  # s
+    "cache_vendedor_max": int(os.environ.get("APP_CACHE_VENDEDOR_MAX", "1024")),
+    # URLs já publicadas das imagens (db.url_imagem_produto)
+    "cache_urls_ttl": float(os.environ.get("APP_CACHE_URLS_TTL", "3600")),  # s
+    "cache_urls_max": int(os.environ.get("APP_CACHE_URLS_MAX", "8192")),
+    # Chamadas assíncronas (db_async): threads dedicadas e tempo limite padrão por chamada.
+    # Menos threads que o pool, para sobrar conexão para o escritor e para o código síncrono.
+    "async_workers": int(os.environ.get("APP_DB_ASYNC_WORKERS", "8")),
+    "async_timeout": float(os.environ.get("APP_DB_ASYNC_TIMEOUT", "10")),  # s
+}
+
+
+def _override_ambiente(nome):
+    """Lê APP_DB_<NOME> (ex.: APP_DB_MMAP_SIZE) se estiver definida."""
+    valor = os.environ.get(f"APP_DB_{nome.upper()}")
+    if valor is None:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        return valor
+
+
+def get_pragmas(perfil=None):
+    """Retorna os PRAGMAs do perfil escolhido já com os overrides de ambiente aplicados."""
+    perfil = perfil or CONFIG["perfil"]
+    if perfil not in PERFIS_PRAGMA:
+        raise ValueError(f"Perfil de PRAGMA desconhecido: {perfil}")
+    pragmas = dict(PERFIS_PRAGMA[perfil])
+    for nome in ORDEM_PRAGMAS:
+        valor = _override_ambiente(nome)
+        if valor is not None:
+            pragmas[nome] = valor
+    return pragmas
+
+
+def aplicar_pragmas(conn, pragmas=None):
+    """Aplica os PRAGMAs em uma conexão recém-aberta."""
+    pragmas = pragmas or get_pragmas()
+    for nome in ORDEM_PRAGMAS:
+        if nome in pragmas:
+            valor = pragmas[nome]
+            # PRAGMA não aceita parâmetros (?), por isso validamos o valor antes
+            if not isinstance(valor, int) and not str(valor).isalnum():
+                raise ValueError(f"Valor inválido para PRAGMA {nome}: {valor!r}")
+            conn.execute(f"PRAGMA {nome} = {valor}").fetchall()
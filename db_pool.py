@@ -0,0 +1,185 @@
+# db_pool.py
+import sqlite3
+import threading
+import time
+import weakref
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    Conexão SQLite que volta para o pool ao ser fechada.
+    O código existente continua chamando conn.close() normalmente.
+    """
+
+    _pool = None
+    _em_uso = False
+
+    def close(self):
+        pool = self._pool
+        if pool is None:
+            super().close()
+        else:
+            pool.release(self)
+
+    def _close_real(self):
+        self._pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Pool de conexões SQLite com afinidade por thread.
+
+    Cada thread reaproveita, sempre que possível, a mesma conexão que usou da
+    última vez (cache de páginas e de statements continua "quente"). As conexões
+    são verificadas ao sair do pool e o tempo de espera por uma conexão livre
+    é contabilizado nas estatísticas.
+    """
+
+    def __init__(self, database, max_size=16, timeout=30, cached_statements=256, on_connect=None):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.on_connect = on_connect
+
+        self._cond = threading.Condition(threading.RLock())  # RLock: o finalizador pode rodar com o lock já adquirido
+        self._idle = []           # conexões livres
+        self._owner = {}          # id(conn) -> ident da última thread que a usou
+        self._size = 0            # conexões abertas (livres + em uso)
+
+        self._stats = {
+            "criadas": 0,
+            "reutilizadas": 0,
+            "mesma_thread": 0,
+            "descartadas": 0,
+            "esperas": 0,
+            "tempo_espera_total": 0.0,
+            "tempo_espera_max": 0.0,
+        }
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.timeout,
+            factory=PooledConnection,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,  # a conexão pode mudar de thread, mas só uma a usa por vez
+        )
+        if self.on_connect:
+            self.on_connect(conn)
+        conn._pool = self
+        # Se a conexão for esquecida sem close(), libera a vaga quando for coletada
+        weakref.finalize(conn, self._forget)
+        return conn
+
+    def _forget(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _take_idle(self, ident):
+        """Retorna uma conexão livre, preferindo a última usada por esta thread."""
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._owner.get(id(self._idle[i])) == ident:
+                self._stats["mesma_thread"] += 1
+                return self._idle.pop(i)
+        return self._idle.pop()
+
+    def acquire(self):
+        ident = threading.get_ident()
+        waited = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn = self._take_idle(ident)
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                if waited is None:
+                    waited = time.perf_counter()
+                if not self._cond.wait(self.timeout):
+                    raise sqlite3.OperationalError("Tempo esgotado aguardando uma conexão livre no pool")
+
+            if waited is not None:
+                elapsed = time.perf_counter() - waited
+                self._stats["esperas"] += 1
+                self._stats["tempo_espera_total"] += elapsed
+                self._stats["tempo_espera_max"] = max(self._stats["tempo_espera_max"], elapsed)
+
+        if conn is not None and not self._healthy(conn):
+            self._discard(conn)
+            conn = None
+            with self._cond:
+                self._size += 1
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats["criadas"] += 1
+        else:
+            with self._cond:
+                self._stats["reutilizadas"] += 1
+
+        with self._cond:
+            self._owner[id(conn)] = ident
+        conn._em_uso = True
+        return conn
+
+    def release(self, conn):
+        if not conn._em_uso:
+            return  # close() chamado duas vezes
+        conn._em_uso = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            conn.text_factory = str
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn):
+        with self._cond:
+            self._owner.pop(id(conn), None)
+            self._stats["descartadas"] += 1
+        try:
+            conn._close_real()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        """Fecha todas as conexões livres (as que estão em uso voltam ao pool normalmente)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["tamanho"] = self._size
+            stats["livres"] = len(self._idle)
+            stats["em_uso"] = self._size - len(self._idle)
+            stats["max_size"] = self.max_size
+        esperas = stats["esperas"]
+        stats["tempo_espera_medio"] = stats["tempo_espera_total"] / esperas if esperas else 0.0
+        return stats
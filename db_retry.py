@@ -0,0 +1,77 @@
+# db_retry.py
+import random
+import sqlite3
+import threading
+import time
+
+
+class RetryPolicy:
+    """
+    Política única de nova tentativa para SQLITE_BUSY / "database is locked".
+
+    Usa backoff exponencial com jitter completo (espera aleatória entre 0 e o
+    teto da tentativa) e um prazo máximo por operação. Mantém contadores de
+    tentativas, desistências e tempo total de espera.
+    """
+
+    def __init__(self, base=0.005, maximo=0.5, prazo=30.0):
+        self.base = base
+        self.maximo = maximo
+        self.prazo = prazo
+        self._lock = threading.Lock()
+        self._stats = {
+            "retries": 0,
+            "recuperadas": 0,     # operações que deram certo depois de pelo menos uma nova tentativa
+            "desistencias": 0,
+            "tempo_espera_total": 0.0,
+        }
+
+    @staticmethod
+    def is_busy(exc):
+        if not isinstance(exc, sqlite3.OperationalError):
+            return False
+        msg = str(exc).lower()
+        return "locked" in msg or "busy" in msg
+
+    def espera(self, tentativa):
+        return random.uniform(0, min(self.maximo, self.base * (2 ** tentativa)))
+
+    def aguardar(self, tentativa, limite=None):
+        """Dorme o backoff da tentativa (sem ultrapassar o instante 'limite') e contabiliza."""
+        espera = self.espera(tentativa)
+        if limite is not None:
+            espera = max(0.0, min(espera, limite - time.monotonic()))
+        time.sleep(espera)
+        with self._lock:
+            self._stats["retries"] += 1
+            self._stats["tempo_espera_total"] += espera
+
+    def registrar_recuperada(self):
+        with self._lock:
+            self._stats["recuperadas"] += 1
+
+    def registrar_desistencia(self, n=1):
+        with self._lock:
+            self._stats["desistencias"] += n
+
+    def run(self, fn, *args, prazo=None, **kwargs):
+        """Executa fn(*args, **kwargs) repetindo enquanto o banco estiver ocupado."""
+        limite = time.monotonic() + (prazo if prazo is not None else self.prazo)
+        tentativa = 0
+        while True:
+            try:
+                resultado = fn(*args, **kwargs)
+                if tentativa:
+                    self.registrar_recuperada()
+                return resultado
+            except sqlite3.OperationalError as e:
+                if not self.is_busy(e) or time.monotonic() >= limite:
+                    if self.is_busy(e):
+                        self.registrar_desistencia()
+                    raise
+                self.aguardar(tentativa, limite)
+                tentativa += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,279 @@
+# db_writer.py
+import itertools
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+from db_retry import RetryPolicy
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "agrupar", "future", "enfileirado_em", "limite")
+
+    def __init__(self, fn, args, kwargs, agrupar, prazo=None):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.agrupar = agrupar
+        self.future = Future()
+        self.enfileirado_em = time.perf_counter()
+        # Instante (time.monotonic) a partir do qual o job desiste de novas tentativas
+        self.limite = time.monotonic() + prazo if prazo is not None else None
+
+
+def _limpar_frames(exc):
+    """
+    Solta as variáveis locais guardadas no traceback da exceção antes de entregá-la
+    a outra thread. Sem isso, cursores da conexão do escritor seriam destruídos na
+    thread de quem chamou, resetando statements do cache que o escritor pode
+    estar usando naquele momento.
+    """
+    vistos = set()
+    while exc is not None and id(exc) not in vistos:
+        vistos.add(id(exc))
+        traceback.clear_frames(exc.__traceback__)
+        exc = exc.__cause__ or exc.__context__
+
+
+class WriterThread:
+    """
+    Thread única responsável por todas as escritas no banco.
+
+    As funções enviadas recebem a conexão do escritor como primeiro argumento e
+    apenas executam seus comandos; quem abre e confirma a transação é a thread.
+    Escritas pequenas que chegam juntas são confirmadas em um único COMMIT
+    (group commit), cada uma protegida por um SAVEPOINT próprio: se uma falhar,
+    só ela é desfeita e as demais seguem no mesmo commit.
+
+    Se o banco estiver ocupado (SQLITE_BUSY), a transação inteira é desfeita e
+    reiniciada segundo a RetryPolicy: os jobs são executados de novo do zero,
+    por isso não devem guardar estado fora da transação.
+    """
+
+    def __init__(self, connect, max_fila=1000, max_lote=32, timeout_fila=30, retry=None):
+        self._connect = connect
+        self._fila = queue.Queue(maxsize=max_fila)
+        self.max_lote = max_lote
+        self.timeout_fila = timeout_fila
+        self.retry = retry or RetryPolicy()
+
+        self._thread = None
+        self._conn = None
+        self._pendente = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._savepoints = itertools.count()
+        self._stats = {
+            "jobs": 0,
+            "lotes": 0,
+            "maior_lote": 0,
+            "falhas": 0,
+            "erros_escritor": 0,
+            "fila_max": 0,
+            "tempo_commit_total": 0.0,
+            "tempo_commit_max": 0.0,
+            "tempo_fila_total": 0.0,
+        }
+
+    # --- API PÚBLICA ---
+    def submit(self, fn, *args, agrupar=True, prazo=None, **kwargs):
+        """
+        Enfileira fn(conn, *args, **kwargs) e retorna um Future com o resultado.
+        Use agrupar=False para escritas que devem rodar sozinhas na transação.
+        'prazo' (segundos) limita o tempo total de novas tentativas; o padrão vem da RetryPolicy.
+        """
+        if self._thread is not None and threading.current_thread() is self._thread:
+            # Chamada feita de dentro de outro job: executa direto na transação atual
+            future = Future()
+            try:
+                future.set_result(self._executar_job(_Job(fn, args, kwargs, agrupar)))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        self._iniciar()
+        job = _Job(fn, args, kwargs, agrupar, self.retry.prazo if prazo is None else prazo)
+        try:
+            self._fila.put(job, timeout=self.timeout_fila)
+        except queue.Full:
+            raise sqlite3.OperationalError("Fila de escrita cheia; tente novamente em instantes")
+        profundidade = self._fila.qsize()
+        with self._stats_lock:
+            self._stats["fila_max"] = max(self._stats["fila_max"], profundidade)
+        return job.future
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["fila_atual"] = self._fila.qsize()
+        stats["retry"] = self.retry.stats()
+        lotes = stats["lotes"]
+        jobs = stats["jobs"]
+        stats["lote_medio"] = jobs / lotes if lotes else 0.0
+        stats["tempo_commit_medio"] = stats["tempo_commit_total"] / lotes if lotes else 0.0
+        stats["tempo_fila_medio"] = stats["tempo_fila_total"] / jobs if jobs else 0.0
+        return stats
+
+    # --- THREAD DO ESCRITOR ---
+    def _iniciar(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+                thread.start()
+                self._thread = thread
+
+    def _proximo_lote(self):
+        job = self._fila.get()
+        lote = [job]
+        if not job.agrupar:
+            return lote
+        while len(lote) < self.max_lote:
+            try:
+                proximo = self._fila.get_nowait()
+            except queue.Empty:
+                break
+            if not proximo.agrupar:
+                # Devolve para a frente da fila: roda sozinho no próximo ciclo
+                self._pendente = proximo
+                break
+            lote.append(proximo)
+        return lote
+
+    def _loop(self):
+        while True:
+            if self._pendente is not None:
+                lote, self._pendente = [self._pendente], None
+            else:
+                lote = self._proximo_lote()
+            if self._conn is None:
+                try:
+                    self._conn = self._connect()
+                except Exception as e:
+                    # Sem conexão nada pode ser gravado: falham o lote e tudo o que já
+                    # está na fila; a próxima escrita tenta conectar de novo
+                    self._falhar(lote + self._esvaziar_fila(), e)
+                    continue
+            try:
+                self._executar_lote(lote)
+            except Exception as e:
+                # Erro fora do tratamento de cada job (ex.: rollback com a conexão
+                # quebrada): o lote falha e a conexão é refeita na próxima escrita.
+                # Sem isso a thread morreria e quem espera um Future ficaria preso.
+                self._falhar(lote, e)
+                self._descartar_conexao()
+
+    def _esvaziar_fila(self):
+        jobs = [self._pendente] if self._pendente is not None else []
+        self._pendente = None
+        while True:
+            try:
+                jobs.append(self._fila.get_nowait())
+            except queue.Empty:
+                return jobs
+
+    def _falhar(self, jobs, erro):
+        """Entrega o erro a cada job ainda sem resultado (os cancelados são ignorados)."""
+        _limpar_frames(erro)
+        falhas = 0
+        for job in jobs:
+            future = job.future
+            if future.done() or not (future.running() or future.set_running_or_notify_cancel()):
+                continue
+            future.set_exception(erro)
+            falhas += 1
+        with self._stats_lock:
+            self._stats["falhas"] += falhas
+            self._stats["erros_escritor"] += 1
+
+    def _descartar_conexao(self):
+        conn, self._conn = self._conn, None
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _executar_job(self, job):
+        return job.fn(self._conn, *job.args, **job.kwargs)
+
+    def _transacao(self, lote):
+        """Executa o lote em uma transação. Erros de banco ocupado sobem para reiniciar tudo."""
+        conn = self._conn
+        resultados = []
+        conn.execute("BEGIN IMMEDIATE")
+        for job in lote:
+            nome = f"job_{next(self._savepoints)}"
+            conn.execute(f"SAVEPOINT {nome}")
+            try:
+                resultados.append((job, True, self._executar_job(job)))
+                conn.execute(f"RELEASE {nome}")
+            except Exception as e:
+                if self.retry.is_busy(e):
+                    # Lock perdido no meio do job (ex.: create_pedido): não dá para
+                    # salvar só parte da transação, então ela é reiniciada inteira
+                    raise
+                conn.execute(f"ROLLBACK TO {nome}")
+                conn.execute(f"RELEASE {nome}")
+                resultados.append((job, False, e))
+        conn.commit()
+        return resultados
+
+    def _executar_lote(self, lote):
+        # Descarta jobs cancelados por quem os enviou antes de começarem
+        lote = [job for job in lote if job.future.set_running_or_notify_cancel()]
+        if not lote:
+            return
+        conn = self._conn
+        inicio = time.perf_counter()
+        falhas = []
+        tentativa = 0
+        while True:
+            try:
+                resultados = self._transacao(lote)
+                if tentativa:
+                    self.retry.registrar_recuperada()
+                break
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                if not self.retry.is_busy(e):
+                    # Falha no BEGIN/COMMIT: nada foi gravado, todos os jobs do lote falham
+                    resultados = [(job, False, e) for job in lote]
+                    break
+                # Banco ocupado: quem estourou o prazo desiste, o resto tenta de novo
+                agora = time.monotonic()
+                vencidos = [job for job in lote if job.limite is not None and agora >= job.limite]
+                if vencidos:
+                    self.retry.registrar_desistencia(len(vencidos))
+                    falhas.extend((job, False, e) for job in vencidos)
+                    lote = [job for job in lote if job not in vencidos]
+                if not lote:
+                    resultados = []
+                    break
+                limites = [job.limite for job in lote if job.limite is not None]
+                self.retry.aguardar(tentativa, min(limites) if limites else None)
+                tentativa += 1
+        resultados += falhas
+        lote = [job for job, _, _ in resultados]
+
+        fim = time.perf_counter()
+        with self._stats_lock:
+            self._stats["lotes"] += 1
+            self._stats["jobs"] += len(lote)
+            self._stats["maior_lote"] = max(self._stats["maior_lote"], len(lote))
+            self._stats["tempo_commit_total"] += fim - inicio
+            self._stats["tempo_commit_max"] = max(self._stats["tempo_commit_max"], fim - inicio)
+            self._stats["tempo_fila_total"] += sum(inicio - job.enfileirado_em for job in lote)
+            self._stats["falhas"] += sum(1 for _, ok, _ in resultados if not ok)
+
+        # Os resultados só são entregues depois do COMMIT
+        for job, ok, valor in resultados:
+            if ok:
+                job.future.set_result(valor)
+            else:
+                _limpar_frames(valor)
+                job.future.set_exception(valor)
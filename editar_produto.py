@@ -38,7 +38,7 @@ def EditarProdutoView(page: ft.Page, produto_id: int):
     quantidade_input = ft.TextField(label="Quantidade em Estoque", value=str(produto['quantidade']), keyboard_type=ft.KeyboardType.NUMBER)
     
     path_imagem_produto = ft.Text(value="", visible=False)
-    nome_imagem_produto = ft.Text(f"Imagem atual: {'Sim' if produto.get('img') else 'Nenhuma'}")
+    nome_imagem_produto = ft.Text(f"Imagem atual: {'Sim' if produto.get('img_hash') else 'Nenhuma'}")
     remover_imagem_chk = ft.Checkbox(label="Remover imagem atual", value=False)
 
     def carregar_categorias():
@@ -0,0 +1,91 @@
+# exportacao.py
+"""
+Exportação dos pedidos de um vendedor para CSV ou JSONL (contabilidade).
+
+Os pedidos são lidos do banco em lotes (db.iter_pedidos_exportacao) e
+escritos no arquivo à medida que chegam, sem montar a lista inteira na
+memória. No CSV cada linha é um item (com os dados do pedido repetidos);
+no JSONL cada linha é um pedido com a lista de seus itens.
+"""
+import csv
+import json
+import os
+
+from db import iter_pedidos_exportacao
+
+FORMATOS = ("csv", "jsonl")
+CAMPOS_PEDIDO = ["pedido_id", "data_pedido", "status", "total", "taxa_entrega", "comprador_nome",
+                 "rua", "numero", "bairro", "cidade", "estado", "cep"]
+CAMPOS_ITEM = ["produto_id", "produto_nome", "quantidade", "preco_unitario"]
+
+
+def iter_pedidos(vendedor_id, inicio=None, fim=None):
+    """Agrupa as linhas de item consecutivas em pedidos: gera um dict por pedido com a chave 'itens'."""
+    pedido = None
+    for linha in iter_pedidos_exportacao(vendedor_id, inicio, fim):
+        if pedido is None or pedido["pedido_id"] != linha["pedido_id"]:
+            if pedido is not None:
+                yield pedido
+            pedido = {campo: linha[campo] for campo in CAMPOS_PEDIDO}
+            pedido["itens"] = []
+        if linha["produto_id"] is not None:
+            pedido["itens"].append({campo: linha[campo] for campo in CAMPOS_ITEM})
+    if pedido is not None:
+        yield pedido
+
+
+def _escrever_csv(arquivo, vendedor_id, inicio, fim, progresso):
+    # ';' e BOM para abrir direto no Excel em português
+    escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS_PEDIDO + CAMPOS_ITEM, delimiter=";")
+    escritor.writeheader()
+    pedidos = itens = 0
+    ultimo = None
+    for linha in iter_pedidos_exportacao(vendedor_id, inicio, fim):
+        escritor.writerow(linha)
+        if linha["produto_id"] is not None:  # pedido sem itens sai em uma linha só, sem produto
+            itens += 1
+        if linha["pedido_id"] != ultimo:
+            ultimo = linha["pedido_id"]
+            pedidos += 1
+            if progresso and pedidos % 1000 == 0:
+                progresso(pedidos)
+    return pedidos, itens
+
+
+def _escrever_jsonl(arquivo, vendedor_id, inicio, fim, progresso):
+    pedidos = itens = 0
+    for pedido in iter_pedidos(vendedor_id, inicio, fim):
+        arquivo.write(json.dumps(pedido, ensure_ascii=False) + "\n")
+        pedidos += 1
+        itens += len(pedido["itens"])
+        if progresso and pedidos % 1000 == 0:
+            progresso(pedidos)
+    return pedidos, itens
+
+
+def exportar_pedidos(vendedor_id, caminho, formato=None, inicio=None, fim=None, progresso=None):
+    """
+    Escreve os pedidos do vendedor em 'caminho'. O formato ('csv' ou 'jsonl')
+    vem da extensão do arquivo quando não é informado. 'inicio' e 'fim' são
+    datas 'AAAA-MM-DD' (inclusive). progresso(pedidos), se informada, é
+    chamada a cada 1000 pedidos escritos.
+
+    Retorna {"pedidos", "itens", "caminho"}, com as mesmas contagens nos dois
+    formatos (no CSV cada item é uma linha; no JSONL, cada pedido).
+    """
+    formato = (formato or os.path.splitext(caminho)[1].lstrip(".")).lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato não suportado: {formato}. Use CSV ou JSONL.")
+    escrever = _escrever_csv if formato == "csv" else _escrever_jsonl
+    # Escreve em um arquivo temporário e renomeia no fim: uma exportação que
+    # falhe no meio não deixa um arquivo pela metade no lugar do anterior
+    temporario = caminho + ".parcial"
+    try:
+        with open(temporario, "w", encoding="utf-8-sig" if formato == "csv" else "utf-8", newline="") as arquivo:
+            pedidos, itens = escrever(arquivo, vendedor_id, inicio, fim, progresso)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    return {"pedidos": pedidos, "itens": itens, "caminho": caminho}
@@ -1,20 +1,36 @@
 import flet as ft
-from create_user import create_user
-from login import LoginView
-from vendedor.cadastro_vendedor import CadastroVendedorView
-from vendedor.cadastro_produto import CadastroProdutoView
-from painel_adm.painel_adm import PainelAdmView
-from lojas.lojas import LojasView
-from vendedor.editar_produto import EditarProdutoView
-from lojas.lojas_produtos import LojasProdutosView
-from pedidos.carrinho_compras import CarrinhoComprasView
-from pedidos.taxa_de_entrega import TaxaEntregaView
 from db import init_db
+from imagens import ASSETS_DIR
+from rotas import Rotas
+from sessoes import esquecer_sessao, restaurar, sair
+
+# --- ROTAS ---
+# Os módulos das views só são importados na primeira visita à rota.
+# Sem rota correspondente (padrão None), route_change abre a HomeView.
+rotas = Rotas()
+rotas.registrar("/login", "login:LoginView")
+rotas.registrar("/lojas", "lojas.lojas:LojasView")
+rotas.registrar("/create_user", "create_user:create_user")
+rotas.registrar("/cadastro_vendedor", "vendedor.cadastro_vendedor:CadastroVendedorView")
+rotas.registrar("/cadastro_produto", "vendedor.cadastro_produto:CadastroProdutoView")
+rotas.registrar("/painel_adm", "painel_adm.painel_adm:PainelAdmView")
+rotas.registrar("/carrinho", "pedidos.carrinho_compras:CarrinhoComprasView")
+rotas.registrar("/taxa_entrega", "pedidos.taxa_de_entrega:TaxaEntregaView")
+rotas.registrar("/busca", "busca:BuscaView")
+rotas.registrar("/lojas/{slug}", "lojas.lojas_produtos:LojasProdutosView")
+rotas.registrar("/editar_produto/{id:int}", "vendedor.editar_produto:EditarProdutoView")
+# Id inválido volta ao painel
+rotas.registrar("/editar_produto/{id}", "painel_adm.painel_adm:PainelAdmView", repassar=False)
 
 
 def main(page: ft.Page):
     # Garante que o banco de dados e todas as tabelas estejam criados
     init_db()
+    # Aba nova ou reconexão do mesmo navegador: volta logado, sem ir ao banco
+    restaurar(page)
+    # Sessão encerrada pelo Flet (navegador fechado e prazo de reconexão esgotado):
+    # tira a sessão da contabilidade de memória
+    page.on_close = lambda e: esquecer_sessao(page.session_id)
 
     page.adaptive = True
     page.title = "Mercado Aberto"  # Nome mais convidativo
@@ -89,8 +105,8 @@ def main(page: ft.Page):
         page.update()
 
     def logout_click(e):
-        """Limpa a sessão e redireciona para a home, atualizando a AppBar."""
-        page.session.clear()
+        """Encerra o login e redireciona para a home, atualizando a AppBar."""
+        sair(page)
         page.go("/")
 
     # --- APP BAR MODERNA COM BOTÃO HAMBÚRGUER ---
@@ -248,24 +264,13 @@ def main(page: ft.Page):
             scroll=ft.ScrollMode.AUTO,
         )
 
-    # --- ROTAS ---
-    app_routes = {
-        "/": HomeView,
-        "/login": LoginView,
-        "/lojas": LojasView,
-        "/create_user": create_user,
-        "/cadastro_vendedor": CadastroVendedorView,
-        "/cadastro_produto": CadastroProdutoView,
-        "/painel_adm": PainelAdmView,
-        "/carrinho": CarrinhoComprasView,
-    }
-
     def route_change(route):
         user_name = page.session.get("user_name")
         page.appbar.actions.clear()
 
         if user_name:
             page.appbar.actions.extend([
+                ft.IconButton(ft.Icons.SEARCH, tooltip="Pesquisar", icon_color=ft.Colors.WHITE, on_click=lambda e: page.go("/busca")),
                 ft.IconButton(
                     ft.Icons.SHOPPING_CART_OUTLINED,
                     tooltip="Carrinho",
@@ -283,7 +288,7 @@ def main(page: ft.Page):
             ])
         else:
             page.appbar.actions.extend([
-                ft.IconButton(ft.Icons.SEARCH, tooltip="Pesquisar", icon_color=ft.Colors.WHITE),
+                ft.IconButton(ft.Icons.SEARCH, tooltip="Pesquisar", icon_color=ft.Colors.WHITE, on_click=lambda e: page.go("/busca")),
                 ft.IconButton(
                     ft.Icons.SHOPPING_CART_OUTLINED, 
                     tooltip="Carrinho", 
@@ -302,27 +307,9 @@ def main(page: ft.Page):
         # Limpa as views anteriores
         page.views.clear()
 
-        # Lógica para rota de edição de produto
-        if page.route.startswith("/editar_produto/"):
-            try:
-                produto_id = int(page.route.split("/")[-1])
-                new_view = EditarProdutoView(page, produto_id)
-            except (ValueError, IndexError):
-                new_view = PainelAdmView(page) # Volta ao painel se o ID for inválido
-
-        # Lógica para rotas dinâmicas de produtos da loja
-        elif page.route.startswith("/lojas/"):
-            # Pega o slug da URL, que é a parte depois de "/lojas/"
-            slug = page.route.split("/")[-1]
-            if slug:
-                new_view = LojasProdutosView(page, slug)
-            else:
-                # Se a URL for apenas "/lojas/", redireciona para a lista de lojas
-                new_view = LojasView(page)
-        else:
-            # Lógica para rotas estáticas
-            view_builder = app_routes.get(page.route, HomeView)
-            new_view = view_builder(page)
+        # Rotas estáticas e com parâmetros ("/lojas/{slug}", "/editar_produto/{id}")
+        view_builder, parametros = rotas.resolver(page.route)
+        new_view = (view_builder or HomeView)(page, *parametros)
 
         # Adiciona a nova view à pilha de navegação
         new_view.appbar = page.appbar
@@ -355,4 +342,6 @@ def main(page: ft.Page):
     page.go(page.route)
 
 
-ft.app(target=main, view=ft.WEB_BROWSER)
+if __name__ == "__main__":
+    # assets_dir também serve as imagens de produto publicadas em assets/img
+    ft.app(target=main, view=ft.WEB_BROWSER, assets_dir=ASSETS_DIR)
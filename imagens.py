@@ -0,0 +1,159 @@
+# imagens.py
+"""
+Geração das variantes (miniaturas) das imagens de produto e publicação delas
+como arquivos estáticos.
+
+As variantes são geradas em um pool de threads para não travar o painel do
+vendedor. O Pillow é opcional: sem ele nenhuma variante é gerada e as telas
+continuam usando a imagem original.
+"""
+import glob
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow não instalado
+    Image = None
+
+# Caixa máxima (largura, altura) de cada contexto, já pensando em telas 2x.
+# A proporção da imagem é mantida; o ft.Image faz o recorte com ImageFit.COVER.
+TAMANHOS = {
+    "card": (480, 320),      # grade da loja (exibida com altura 120)
+    "carrinho": (400, 260),  # carrinho (exibida em 200x130)
+    "detalhe": (1200, 1200),
+}
+
+FORMATO = "WEBP"
+QUALIDADE = 80
+
+ESPERA_APOS_FALHA = 600  # segundos até tentar de novo uma imagem que falhou
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="imagens")
+_lock = threading.Lock()
+_agendadas = set()  # hashes em processamento
+_falhas = {}        # hash -> instante (time.monotonic) da última falha
+
+
+def disponivel():
+    """Indica se o Pillow está instalado e as variantes podem ser geradas."""
+    return Image is not None
+
+
+def gerar_variantes(dados):
+    """Retorna {tamanho: (formato, bytes)} para cada entrada de TAMANHOS."""
+    if Image is None:
+        return {}
+    original = Image.open(io.BytesIO(dados))
+    original = ImageOps.exif_transpose(original)  # respeita a rotação das fotos de celular
+    if original.mode not in ("RGB", "RGBA"):
+        original = original.convert("RGBA" if "A" in original.getbands() else "RGB")
+
+    variantes = {}
+    for nome, caixa in TAMANHOS.items():
+        img = original.copy()
+        img.thumbnail(caixa, Image.LANCZOS)
+        buffer = io.BytesIO()
+        try:
+            img.save(buffer, FORMATO, quality=QUALIDADE, method=4)
+            formato = FORMATO
+        except (KeyError, OSError):
+            # Pillow compilado sem suporte a WEBP
+            buffer = io.BytesIO()
+            img.convert("RGB").save(buffer, "JPEG", quality=QUALIDADE, optimize=True)
+            formato = "JPEG"
+        variantes[nome] = (formato, buffer.getvalue())
+    return variantes
+
+
+def agendar(img_hash, carregar, salvar, pronto=None):
+    """
+    Gera as variantes da imagem em segundo plano: carregar() devolve os bytes
+    da original e salvar(img_hash, variantes) grava o resultado.
+
+    pronto(img_hash), se informado, é consultado antes de gerar: variantes que
+    já existem não são refeitas, e as que sumiram são geradas de novo. Um hash
+    não é processado duas vezes ao mesmo tempo; depois de uma falha, só volta
+    a ser tentado após ESPERA_APOS_FALHA segundos.
+    """
+    if Image is None or not img_hash:
+        return None
+    with _lock:
+        falhou_em = _falhas.get(img_hash)
+        if img_hash in _agendadas or (falhou_em is not None and time.monotonic() - falhou_em < ESPERA_APOS_FALHA):
+            return None
+        _agendadas.add(img_hash)
+
+    def _tarefa():
+        try:
+            if pronto is not None and pronto(img_hash):
+                return
+            dados = carregar()
+            if dados:
+                salvar(img_hash, gerar_variantes(dados))
+            with _lock:
+                _falhas.pop(img_hash, None)
+        except Exception as e:
+            print(f"Erro ao gerar miniaturas da imagem {img_hash[:12]}: {e}")
+            with _lock:
+                _falhas[img_hash] = time.monotonic()
+        finally:
+            with _lock:
+                _agendadas.discard(img_hash)
+
+    return _executor.submit(_tarefa)
+
+
+# --- ARQUIVOS ESTÁTICOS ---
+# As imagens são servidas pelo servidor de assets do Flet a partir de URLs com o
+# hash no nome (/img/<hash>-<tamanho>.<ext>). Como o conteúdo de uma URL nunca
+# muda, o navegador pode guardá-la em cache; o servidor responde com ETag e
+# Last-Modified e devolve 304 nas revalidações.
+ASSETS_DIR = os.environ.get("APP_ASSETS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets"))
+PASTA_URL = "img"
+
+_EXTENSOES = {"WEBP": "webp", "JPEG": "jpg", "PNG": "png", "GIF": "gif"}
+
+
+def formato_dos_bytes(dados):
+    """Descobre o formato da imagem pelos bytes iniciais."""
+    if dados.startswith(b"\x89PNG"):
+        return "PNG"
+    if dados.startswith(b"\xff\xd8"):
+        return "JPEG"
+    if dados[:4] == b"RIFF" and dados[8:12] == b"WEBP":
+        return "WEBP"
+    if dados[:3] == b"GIF":
+        return "GIF"
+    return "JPEG"
+
+
+def publicar(img_hash, tamanho, formato, dados):
+    """
+    Grava a imagem em assets/img (uma única vez) e retorna a URL para o ft.Image(src=...).
+    """
+    nome = f"{img_hash}-{tamanho or 'original'}.{_EXTENSOES.get(formato, 'bin')}"
+    pasta = os.path.join(ASSETS_DIR, PASTA_URL)
+    caminho = os.path.join(pasta, nome)
+    if not os.path.exists(caminho):
+        os.makedirs(pasta, exist_ok=True)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(dados)
+        os.replace(temporario, caminho)  # troca atômica: nunca serve um arquivo pela metade
+    return f"/{PASTA_URL}/{nome}"
+
+
+def despublicar(img_hash):
+    """Apaga de assets/img os arquivos da imagem (original e variantes). Retorna quantos foram apagados."""
+    apagados = 0
+    for caminho in glob.glob(os.path.join(ASSETS_DIR, PASTA_URL, f"{glob.escape(img_hash)}-*")):
+        try:
+            os.remove(caminho)
+            apagados += 1
+        except FileNotFoundError:
+            pass
+    return apagados
@@ -0,0 +1,201 @@
+# importacao.py
+"""
+Importação em massa de produtos de um vendedor a partir de CSV ou JSONL.
+
+O arquivo é lido linha a linha (nunca inteiro na memória) e os produtos são
+gravados em lotes de TAMANHO_LOTE, cada lote em uma única transação com
+executemany (db.create_produtos_lote). Colunas reconhecidas:
+
+    nome (obrigatório), descricao, categoria, preco (obrigatório),
+    quantidade (obrigatório), imagem
+
+'categoria' é o nome da categoria: as que ainda não existem são criadas com
+db.create_categoria. 'imagem' é o nome de um arquivo dentro da pasta de
+imagens informada. Linhas inválidas não interrompem a importação; vão para o
+relatório de erros (salvar_relatorio grava esse relatório em CSV).
+"""
+import csv
+import json
+import math
+import os
+
+from db import create_categoria, create_produtos_lote, get_categorias_by_vendedor
+
+TAMANHO_LOTE = 500
+EXTENSOES = (".csv", ".jsonl")
+COLUNAS_RELATORIO = ["linha", "nome", "erro"]
+
+
+def _ler_csv(arquivo):
+    # Planilhas exportadas no Brasil costumam usar ';' como separador
+    amostra = arquivo.read(4096)
+    arquivo.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(arquivo, dialect=dialeto)
+    for registro in leitor:
+        yield leitor.line_num, registro
+
+
+def _ler_jsonl(arquivo):
+    for numero, texto in enumerate(arquivo, start=1):
+        if not texto.strip():
+            continue
+        try:
+            registro = json.loads(texto)
+        except ValueError as e:
+            yield numero, ValueError(f"JSON inválido: {e}")
+            continue
+        if not isinstance(registro, dict):
+            registro = ValueError("cada linha deve ser um objeto JSON")
+        yield numero, registro
+
+
+def ler_registros(caminho):
+    """Gera (numero_da_linha, registro) do arquivo; registro é um dict ou a exceção da linha."""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in EXTENSOES:
+        raise ValueError(f"Formato não suportado: {extensao or caminho}. Use CSV ou JSONL.")
+    # utf-8-sig ignora o BOM que o Excel coloca no início do arquivo
+    with open(caminho, encoding="utf-8-sig", newline="") as arquivo:
+        leitor = _ler_csv(arquivo) if extensao == ".csv" else _ler_jsonl(arquivo)
+        yield from leitor
+
+
+def contar_linhas(caminho):
+    """Total aproximado de registros (linhas não vazias, sem o cabeçalho do CSV), para a barra de progresso."""
+    with open(caminho, "rb") as arquivo:
+        total = sum(1 for linha in arquivo if linha.strip())
+    return total - 1 if caminho.lower().endswith(".csv") and total else total
+
+
+def _texto(registro, campo):
+    valor = registro.get(campo)
+    return str(valor).strip() if valor is not None else ""
+
+
+def _numero(texto, campo, tipo):
+    # Aceita "1.234,56" e "1234.56"
+    if tipo is float and "," in texto:
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        valor = tipo(texto)
+    except ValueError:
+        raise ValueError(f"valor inválido para {campo}: '{texto}'")
+    if not math.isfinite(valor):
+        raise ValueError(f"valor inválido para {campo}: '{texto}'")
+    if valor < 0:
+        raise ValueError(f"{campo} não pode ser negativo")
+    return valor
+
+
+class _Categorias:
+    """Nome -> id das categorias do vendedor, criando as que faltarem."""
+
+    def __init__(self, vendedor_id):
+        self.vendedor_id = vendedor_id
+        self.criadas = 0
+        self._ids = {}
+        self._carregar()
+
+    def _carregar(self):
+        self._ids = {nome.casefold(): categoria_id for categoria_id, nome in get_categorias_by_vendedor(self.vendedor_id)}
+
+    def resolver(self, nome):
+        if not nome:
+            return None
+        chave = nome.casefold()
+        if chave not in self._ids:
+            if create_categoria(self.vendedor_id, nome):
+                self.criadas += 1
+            # Relê mesmo se a criação falhou: outra sessão pode ter criado a mesma categoria
+            self._carregar()
+            if chave not in self._ids:
+                raise ValueError(f"não foi possível criar a categoria '{nome}'")
+        return self._ids[chave]
+
+
+def _ler_imagem(pasta, nome_arquivo):
+    if not nome_arquivo:
+        return None
+    if not pasta:
+        raise ValueError("a linha tem imagem, mas nenhuma pasta de imagens foi informada")
+    caminho = os.path.join(pasta, os.path.basename(nome_arquivo))
+    try:
+        with open(caminho, "rb") as f:
+            return f.read()
+    except OSError:
+        raise ValueError(f"imagem não encontrada: {nome_arquivo}")
+
+
+def _validar(registro, categorias, pasta_imagens):
+    nome = _texto(registro, "nome")
+    if not nome:
+        raise ValueError("nome é obrigatório")
+    preco = _texto(registro, "preco")
+    quantidade = _texto(registro, "quantidade")
+    if not preco or not quantidade:
+        raise ValueError("preco e quantidade são obrigatórios")
+    return (
+        nome,
+        _texto(registro, "descricao"),
+        categorias.resolver(_texto(registro, "categoria")),
+        _numero(preco, "preco", float),
+        _numero(quantidade, "quantidade", int),
+        _ler_imagem(pasta_imagens, _texto(registro, "imagem")),
+    )
+
+
+def importar_produtos(vendedor_id, caminho, pasta_imagens=None, progresso=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Importa os produtos do arquivo para o vendedor.
+
+    progresso(resumo), se informada, é chamada depois de cada lote gravado.
+    Retorna o resumo: {"linhas", "inseridos", "categorias_criadas", "erros"},
+    onde erros é uma lista de {"linha", "nome", "erro"}.
+    """
+    categorias = _Categorias(vendedor_id)
+    resumo = {"linhas": 0, "inseridos": 0, "categorias_criadas": 0, "erros": []}
+    lote = []  # (numero_da_linha, produto)
+
+    def gravar():
+        inseridos, erros = create_produtos_lote(vendedor_id, [produto for _, produto in lote])
+        resumo["inseridos"] += inseridos
+        for indice, mensagem in erros:
+            numero, produto = lote[indice]
+            resumo["erros"].append({"linha": numero, "nome": produto[0], "erro": mensagem})
+        lote.clear()
+        resumo["categorias_criadas"] = categorias.criadas
+        if progresso:
+            progresso(resumo)
+
+    for numero, registro in ler_registros(caminho):
+        resumo["linhas"] += 1
+        try:
+            if isinstance(registro, Exception):
+                raise registro
+            lote.append((numero, _validar(registro, categorias, pasta_imagens)))
+        except ValueError as e:
+            nome = _texto(registro, "nome") if isinstance(registro, dict) else ""
+            resumo["erros"].append({"linha": numero, "nome": nome, "erro": str(e)})
+            continue
+        if len(lote) >= tamanho_lote:
+            gravar()
+
+    if lote:
+        gravar()
+    elif progresso:
+        resumo["categorias_criadas"] = categorias.criadas
+        progresso(resumo)
+    return resumo
+
+
+def salvar_relatorio(erros, caminho):
+    """Grava a lista de erros da importação em CSV (linha, nome, erro)."""
+    with open(caminho, "w", encoding="utf-8-sig", newline="") as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=COLUNAS_RELATORIO, delimiter=";")
+        escritor.writeheader()
+        escritor.writerows(erros)
+    return caminho
@@ -1,7 +1,7 @@
 import flet as ft
-# Supondo que a função de login do vendedor esteja no mesmo módulo 'db'
-from db import User
-from db import login_vendedor 
+from db import autenticar
+from sessoes import entrar
+import db_async
 
 def LoginView(page: ft.Page):
 
@@ -11,31 +11,22 @@ def LoginView(page: ft.Page):
         page.snack_bar.open = True
         page.update()
 
-    def login_click(e):
+    async def login_click(e):
         """Função chamada ao clicar no botão de login."""
         if not email_field.value or not password_field.value:
             show_snackbar("Por favor, preencha o e-mail e a senha.", ft.Colors.ORANGE)
             return
 
-        # Tenta logar como vendedor primeiro
-        user_data = login_vendedor(
-            email=email_field.value,
-            password=password_field.value
-        )
-
-        # Se não for vendedor, tenta logar como comprador
-        if not user_data:
-            user_data = User().login_user(
-                email=email_field.value,
-                password=password_field.value
-            )
+        # Vendedor ou comprador em uma consulta (índice de contas), fora do loop da interface (db_async)
+        try:
+            user_data = await db_async.executar(autenticar, email_field.value, password_field.value)
+        except db_async.TempoEsgotado:
+            show_snackbar("O servidor está ocupado. Tente novamente em instantes.", ft.Colors.ORANGE)
+            return
 
         if user_data:
-            # Limpa a sessão antiga e armazena os novos dados do usuário
-            page.session.clear()
-            page.session.set("user_name", user_data["name"])
-            page.session.set("user_id", user_data["id"]) # <-- ADICIONADO
-            page.session.set("user_type", user_data["type"])
+            # Limpa a sessão antiga, armazena os dados do usuário e lembra o login no navegador
+            entrar(page, user_data)
             show_snackbar("Login realizado com sucesso!", ft.Colors.GREEN)
             page.go("/")
         else:
@@ -1,28 +1,26 @@
 import flet as ft
-import base64
-from db import get_vendedor_by_slug, get_produtos_by_vendedor, get_produto_by_id
+import sqlite3
+from sessoes import registrar_memoria
+from db import get_vendedor_by_slug, url_imagem_produto
+from catalogo import get_pagina, get_produto
+import db_async
 
 def LojasProdutosView(page: ft.Page, vendedor_slug: str):
     """
     Exibe os produtos de uma loja específica.
     """
-    # Busca os dados da loja e dos produtos
+    # Busca os dados da loja (os produtos são carregados por página, mais abaixo)
     loja = get_vendedor_by_slug(vendedor_slug)
-    
-    if loja:
-        produtos = get_produtos_by_vendedor(loja['id'])
-    else:
-        # Se a loja não for encontrada, exibe uma mensagem e não busca produtos
-        produtos = []
 
-    def add_to_cart(e):
+    async def add_to_cart(e):
         produto_id = e.control.data
         
-        # Pega o carrinho da sessão ou cria um novo se não existir
-        carrinho = page.session.get("cart") or {}
-        
-        # Busca os detalhes do produto para adicionar ao carrinho
-        produto = get_produto_by_id(produto_id)
+        # Busca os detalhes do produto no snapshot do catálogo da loja. Se o snapshot
+        # tiver expirado, a recarga vai ao banco fora do loop da interface (db_async)
+        try:
+            produto = await db_async.executar(get_produto, loja['id'], produto_id)
+        except (db_async.TempoEsgotado, sqlite3.Error):
+            produto = None
         if not produto:
             snack = ft.SnackBar(content=ft.Text("Produto não encontrado!"), bgcolor=ft.Colors.RED)
             page.overlay.append(snack)
@@ -30,70 +28,119 @@ def LojasProdutosView(page: ft.Page, vendedor_slug: str):
             page.update()
             return
 
+        # Pega o carrinho da sessão ou cria um novo se não existir (depois do await:
+        # outro clique pode ter alterado o carrinho enquanto o produto era buscado)
+        carrinho = page.session.get("cart") or {}
 
         # Se o produto já está no carrinho, incrementa a quantidade
         if str(produto_id) in carrinho:
             carrinho[str(produto_id)]["quantity"] += 1
         else:
-            # Senão, adiciona o produto ao carrinho
+            # Senão, adiciona o produto ao carrinho. A sessão guarda só a referência
+            # (id, quantidade e preço); nome, imagem e loja vêm do cache compartilhado (catalogo)
             carrinho[str(produto_id)] = {
-                "name": produto["nome"],
                 "price": produto["preco"],
                 "quantity": 1,
-                "img": base64.b64encode(produto['img']).decode('utf-8') if produto['img'] else None,
-                "vendedor_id": produto["vendedor_id"] # Adiciona o ID do vendedor ao item do carrinho
             }
         
         page.session.set("cart", carrinho)
+        registrar_memoria(page)
         snack = ft.SnackBar(content=ft.Text(f"'{produto['nome']}' adicionado ao carrinho!"), bgcolor=ft.Colors.GREEN)
         page.overlay.append(snack)
         snack.open = True
         page.update()
 
-    # Cria os cards dos produtos
-    cards_produtos = []
-    if produtos:
-        for produto in produtos:
-            img_produto = ft.Image(
-                src_base64=base64.b64encode(produto['img']).decode('utf-8') if produto['img'] else None,
-                src="Icons/no-image.png" if not produto['img'] else None,
-                height=120,
-                fit=ft.ImageFit.COVER,
-                border_radius=ft.border_radius.only(top_left=10, top_right=10),
-            )
+    # Cria o card de um produto
+    def criar_card(produto):
+        # A imagem é carregada pelo navegador a partir de uma URL com cache
+        img_url = url_imagem_produto(produto['img_hash'], tamanho="card")
+        img_produto = ft.Image(
+            src=img_url or "Icons/no-image.png",
+            height=120,
+            fit=ft.ImageFit.COVER,
+            border_radius=ft.border_radius.only(top_left=10, top_right=10),
+        )
 
-            cards_produtos.append(
-                ft.Card(
-                    col={"xs": 12, "sm": 6, "md": 4, "lg": 3},
-                    elevation=4,
-                    content=ft.Column(
-                        [
-                            img_produto,
-                            ft.Container(
-                                padding=10,
-                                content=ft.Column(
-                                    [
-                                        ft.Text(produto['nome'], size=16, weight="bold"),
-                                        ft.Text(f"R$ {produto['preco']:.2f}", size=20, color=ft.Colors.GREEN_700, weight="bold"),
-                                        ft.Text(f"Em estoque: {produto['quantidade']}", size=12, color=ft.Colors.GREY_600),
-                                        ft.Divider(height=5, color="transparent"),
-                                        ft.FilledButton(
-                                            "Adicionar ao Carrinho",
-                                            icon=ft.Icons.ADD_SHOPPING_CART,
-                                            on_click=add_to_cart,
-                                            data=produto['id'],
-                                        ),
-                                    ],
-                                    spacing=5,
-                                )
-                            )
-                        ],
-                        spacing=0,
+        return ft.Card(
+            col={"xs": 12, "sm": 6, "md": 4, "lg": 3},
+            elevation=4,
+            content=ft.Column(
+                [
+                    img_produto,
+                    ft.Container(
+                        padding=10,
+                        content=ft.Column(
+                            [
+                                ft.Text(produto['nome'], size=16, weight="bold"),
+                                ft.Text(f"R$ {produto['preco']:.2f}", size=20, color=ft.Colors.GREEN_700, weight="bold"),
+                                ft.Text(f"Em estoque: {produto['quantidade']}", size=12, color=ft.Colors.GREY_600),
+                                ft.Divider(height=5, color="transparent"),
+                                ft.FilledButton(
+                                    "Adicionar ao Carrinho",
+                                    icon=ft.Icons.ADD_SHOPPING_CART,
+                                    on_click=add_to_cart,
+                                    data=produto['id'],
+                                ),
+                            ],
+                            spacing=5,
+                        )
                     )
-                )
+                ],
+                spacing=0,
             )
-    else:
-        cards_produtos.append(ft.Text("Esta loja ainda não possui produtos cadastrados.", size=18, col=12, text_align="center"))
+        )
+
+    # --- Paginação ---
+    # Só a primeira página é montada antes de exibir a tela; as próximas são
+    # carregadas quando o usuário rola até perto do fim (ou clica em "Carregar mais").
+    grade_produtos = ft.ResponsiveRow(controls=[], spacing=20, run_spacing=20)
+    estado = {"cursor": None, "tem_mais": False, "carregando": False, "erro": False}
+
+    carregar_mais_button = ft.OutlinedButton(
+        "Carregar mais",
+        icon=ft.Icons.EXPAND_MORE,
+        on_click=lambda e: carregar_pagina(),
+        visible=False,
+    )
+    carregando_indicator = ft.ProgressRing(width=24, height=24, visible=False)
+
+    def carregar_pagina(atualizar=True):
+        if estado["carregando"] or not loja:
+            return
+        estado["carregando"] = True
+        if atualizar:
+            carregando_indicator.visible = True
+            carregar_mais_button.visible = False
+            page.update()
+        try:
+            # Páginas fatiadas do snapshot compartilhado do catálogo da loja
+            produtos, estado["cursor"] = get_pagina(loja['id'], apos=estado["cursor"])
+            estado["tem_mais"] = estado["cursor"] is not None
+            grade_produtos.controls.extend(criar_card(produto) for produto in produtos)
+            estado["erro"] = False
+        except sqlite3.Error as e:
+            # Nada fica em cache (catalogo); o botão "carregar mais" tenta de novo
+            print(f"Erro ao carregar produtos da loja: {e}")
+            estado["erro"] = True
+            estado["tem_mais"] = True
+        finally:
+            estado["carregando"] = False
+        carregando_indicator.visible = False
+        carregar_mais_button.visible = estado["tem_mais"]
+        if atualizar:
+            page.update()
+
+    def on_scroll(e: ft.OnScrollEvent):
+        # Carrega a próxima página quando faltar menos de uma tela para o fim
+        if estado["tem_mais"] and e.pixels >= e.max_scroll_extent - e.viewport_dimension:
+            carregar_pagina()
+
+    # Primeira página (montada junto com a tela)
+    carregar_pagina(atualizar=False)
+    if estado["erro"]:
+        grade_produtos.controls.append(ft.Text("Não foi possível carregar os produtos. Tente novamente.", size=18, col=12, text_align="center"))
+    elif not grade_produtos.controls:
+        grade_produtos.controls.append(ft.Text("Esta loja ainda não possui produtos cadastrados.", size=18, col=12, text_align="center"))
 
     # Monta a View
     return ft.View(
@@ -102,8 +149,11 @@ def LojasProdutosView(page: ft.Page, vendedor_slug: str):
             ft.Text(f"Produtos da Loja: {loja['name'] if loja else 'Desconhecida'}", size=32, weight="bold"),
             ft.Text(f"Localização: {loja['cidade']}, {loja['estado']}" if loja else "", size=16, color=ft.Colors.GREY_700),
             ft.Divider(height=20),
-            ft.ResponsiveRow(controls=cards_produtos, spacing=20, run_spacing=20)
+            grade_produtos,
+            ft.Row([carregar_mais_button, carregando_indicator], alignment=ft.MainAxisAlignment.CENTER),
         ],
         padding=30,
         scroll=ft.ScrollMode.AUTO,
+        on_scroll=on_scroll,
+        on_scroll_interval=100,
     )
\ No newline at end of file
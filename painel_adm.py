@@ -1,8 +1,14 @@
 import flet as ft
-from db import (create_produto, create_categoria, get_categorias_by_vendedor, get_produtos_by_vendedor, 
+import sqlite3
+from db import (create_produto, create_categoria, get_categorias_by_vendedor, 
                 update_categoria, delete_categoria, cadastrar_taxa_entrega, get_taxas_by_vendedor, 
-                delete_taxa_entrega, get_pedidos_by_vendedor)
+                delete_taxa_entrega, get_pedidos_by_vendedor, get_resumo_vendas)
 from datetime import datetime
+from catalogo import get_produtos
+from importacao import importar_produtos, contar_linhas, salvar_relatorio
+from exportacao import exportar_pedidos
+import db_async
+import os
 
 def PainelAdmView(page: ft.Page):
     # --- VERIFICAÇÃO DE SEGURANÇA ---
@@ -23,6 +29,18 @@ def PainelAdmView(page: ft.Page):
         page.snack_bar.open = True
         page.update()
 
+    async def consultar(fn, *args, **kwargs):
+        """Executa a consulta fora do loop da interface (db_async); None se passar do tempo limite ou falhar."""
+        try:
+            return await db_async.executar(fn, *args, **kwargs)
+        except db_async.TempoEsgotado:
+            show_snackbar("A consulta demorou demais. Tente novamente.", ft.Colors.ORANGE)
+            return None
+        except sqlite3.Error as e:
+            print(f"Erro na consulta do painel: {e}")
+            show_snackbar("Não foi possível carregar os dados. Tente novamente.", ft.Colors.RED)
+            return None
+
     # --- LÓGICA DO FILE PICKER (UPLOAD DE IMAGEM) ---
     def on_dialog_result(e: ft.FilePickerResultEvent):
         if e.files:
@@ -85,6 +103,94 @@ def PainelAdmView(page: ft.Page):
             show_snackbar(
                 "Erro ao cadastrar o produto. Tente novamente.", ft.Colors.RED)
 
+    # --- COMPONENTES DA ABA "IMPORTAR PRODUTOS" ---
+    # Importação em massa (CSV/JSONL + pasta de imagens opcional), gravada em lotes
+    path_arquivo_importacao = ft.Text(value="", visible=False)
+    nome_arquivo_importacao = ft.Text("Nenhum arquivo selecionado.")
+    path_pasta_imagens = ft.Text("Nenhuma pasta selecionada (opcional).")
+    progresso_importacao = ft.ProgressBar(value=0, visible=False)
+    status_importacao = ft.Text("")
+    lista_erros_importacao = ft.ListView(spacing=5, height=200)
+    importar_button = ft.FilledButton("Importar Produtos", icon=ft.Icons.UPLOAD)
+
+    def on_arquivo_importacao(e: ft.FilePickerResultEvent):
+        if e.files:
+            path_arquivo_importacao.value = e.files[0].path
+            nome_arquivo_importacao.value = e.files[0].name
+            page.update()
+
+    def on_pasta_imagens(e: ft.FilePickerResultEvent):
+        if e.path:
+            path_pasta_imagens.value = e.path
+            page.update()
+
+    arquivo_importacao_picker = ft.FilePicker(on_result=on_arquivo_importacao)
+    pasta_imagens_picker = ft.FilePicker(on_result=on_pasta_imagens)
+    page.overlay.extend([arquivo_importacao_picker, pasta_imagens_picker])
+
+    def importar_produtos_click(e):
+        vendedor_id = page.session.get("user_id")
+        caminho = path_arquivo_importacao.value
+        if not caminho:
+            show_snackbar("Selecione um arquivo CSV ou JSONL.", ft.Colors.ORANGE)
+            return
+        pasta = path_pasta_imagens.value if os.path.isdir(path_pasta_imagens.value) else None
+        total = max(contar_linhas(caminho), 1)
+        parcial = {"resumo": None}  # último lote gravado, para o relatório se o banco falhar
+
+        def atualizar_progresso(resumo):
+            parcial["resumo"] = resumo
+            progresso_importacao.value = min(resumo["linhas"] / total, 1)
+            status_importacao.value = (
+                f"{resumo['linhas']} de {total} linhas lidas - "
+                f"{resumo['inseridos']} produtos importados, {len(resumo['erros'])} erros"
+            )
+            page.update()
+
+        importar_button.disabled = True
+        progresso_importacao.value = 0
+        progresso_importacao.visible = True
+        lista_erros_importacao.controls.clear()
+        page.update()
+        try:
+            resumo = importar_produtos(vendedor_id, caminho, pasta, progresso=atualizar_progresso)
+        except (OSError, ValueError) as ex:
+            show_snackbar(f"Erro ao importar: {ex}", ft.Colors.RED)
+            return
+        except sqlite3.Error as ex:
+            # Os lotes já gravados ficam; o relatório cobre as linhas lidas até eles
+            resumo = parcial["resumo"]
+            mensagem = f"Erro no banco ao importar: {ex}."
+            if resumo:
+                mensagem += f" {resumo['inseridos']} produtos já tinham sido importados."
+                if resumo["erros"]:
+                    relatorio = salvar_relatorio(resumo["erros"], os.path.splitext(caminho)[0] + "_erros.csv")
+                    mensagem += f" Relatório: {relatorio}"
+            status_importacao.value = mensagem
+            show_snackbar(mensagem, ft.Colors.RED)
+            return
+        finally:
+            importar_button.disabled = False
+            progresso_importacao.visible = False
+            page.update()
+
+        status_importacao.value = (
+            f"{resumo['inseridos']} produtos importados, {resumo['categorias_criadas']} categorias criadas, "
+            f"{len(resumo['erros'])} linhas com erro."
+        )
+        if resumo["erros"]:
+            # O relatório completo fica ao lado do arquivo importado; a tela mostra só o começo
+            relatorio = salvar_relatorio(resumo["erros"], os.path.splitext(caminho)[0] + "_erros.csv")
+            status_importacao.value += f" Relatório: {relatorio}"
+            for erro in resumo["erros"][:100]:
+                lista_erros_importacao.controls.append(
+                    ft.Text(f"Linha {erro['linha']}: {erro['nome']} - {erro['erro']}", size=12, color=ft.Colors.RED_700)
+                )
+        show_snackbar("Importação concluída!", ft.Colors.GREEN)
+        page.run_task(carregar_categorias)
+
+    importar_button.on_click = importar_produtos_click
+
     # --- COMPONENTES DA ABA "GERENCIAR PRODUTOS" ---
     lista_produtos = ft.ListView(expand=True, spacing=10)
 
@@ -92,10 +198,12 @@ def PainelAdmView(page: ft.Page):
         produto_id = e.control.data
         page.go(f"/editar_produto/{produto_id}")
 
-    def carregar_produtos():
+    async def carregar_produtos():
         """Busca produtos no DB e atualiza a ListView."""
         vendedor_id = page.session.get("user_id")
-        produtos_db = get_produtos_by_vendedor(vendedor_id)
+        produtos_db = await consultar(get_produtos, vendedor_id) # snapshot compartilhado do catálogo da loja
+        if produtos_db is None:
+            return
 
         lista_produtos.controls.clear()
         if not produtos_db:
@@ -137,7 +245,7 @@ def PainelAdmView(page: ft.Page):
                 show_snackbar(
                     "Categoria atualizada com sucesso!", ft.Colors.GREEN)
                 dialog.open = False
-                carregar_categorias()
+                page.run_task(carregar_categorias)
             else:
                 show_snackbar(
                     "Erro ao atualizar. O nome pode já existir.", ft.Colors.RED)
@@ -166,7 +274,7 @@ def PainelAdmView(page: ft.Page):
                 show_snackbar(
                     f"Categoria '{cat_nome}' deletada com sucesso.", ft.Colors.GREEN)
                 dialog.open = False
-                carregar_categorias()
+                page.run_task(carregar_categorias)
             else:
                 show_snackbar("Erro ao deletar a categoria.", ft.Colors.RED)
             page.update()
@@ -192,10 +300,12 @@ def PainelAdmView(page: ft.Page):
         dialog.open = False
         page.update()
 
-    def carregar_categorias():
+    async def carregar_categorias():
         """Busca categorias no DB e atualiza o Dropdown e a Lista."""
         vendedor_id = page.session.get("user_id")
-        categorias_db = get_categorias_by_vendedor(vendedor_id)
+        categorias_db = await consultar(get_categorias_by_vendedor, vendedor_id)
+        if categorias_db is None:
+            return
 
         # Atualiza o Dropdown de produtos
         categoria_produto.options.clear()
@@ -236,20 +346,22 @@ def PainelAdmView(page: ft.Page):
         if create_categoria(vendedor_id, nome_nova_categoria.value):
             show_snackbar("Categoria cadastrada com sucesso!", ft.Colors.GREEN)
             nome_nova_categoria.value = ""
-            carregar_categorias()  # Recarrega a lista e o dropdown
+            page.run_task(carregar_categorias)  # Recarrega a lista e o dropdown
         else:
             show_snackbar(
                 "Você já possui uma categoria com este nome.", ft.Colors.RED)
         page.update()
 
     # --- COMPONENTES DA ABA "TAXAS DE ENTREGA" ---
-    cidade_taxa = ft.TextField(label="Cidade")
-    bairro_taxa = ft.TextField(label="Bairro")
+    # Bairro vazio: taxa da cidade inteira; cidade e bairro vazios: do estado inteiro
+    cidade_taxa = ft.TextField(label="Cidade", hint_text="Vazio: todo o estado")
+    bairro_taxa = ft.TextField(label="Bairro", hint_text="Vazio: toda a cidade")
     estado_taxa = ft.TextField(label="Estado (UF)", width=100)
     valor_taxa = ft.TextField(label="Valor da Entrega", prefix="R$", keyboard_type=ft.KeyboardType.NUMBER)
 
     tabela_taxas = ft.DataTable(
         columns=[
+            ft.DataColumn(ft.Text("Estado")),
             ft.DataColumn(ft.Text("Cidade")),
             ft.DataColumn(ft.Text("Bairro")),
             ft.DataColumn(ft.Text("Valor")),
@@ -258,18 +370,21 @@ def PainelAdmView(page: ft.Page):
         rows=[],
     )
 
-    def carregar_taxas():
+    async def carregar_taxas():
         vendedor_id = page.session.get("user_id")
-        taxas_db = get_taxas_by_vendedor(vendedor_id)
+        taxas_db = await consultar(get_taxas_by_vendedor, vendedor_id)
+        if taxas_db is None:
+            return
         tabela_taxas.rows.clear()
         if not taxas_db:
-            tabela_taxas.rows.append(ft.DataRow(cells=[ft.DataCell(ft.Text("Nenhuma taxa cadastrada.", colspan=4, text_align="center"))]))
+            tabela_taxas.rows.append(ft.DataRow(cells=[ft.DataCell(ft.Text("Nenhuma taxa cadastrada.", colspan=5, text_align="center"))]))
         else:
             for taxa in taxas_db:
                 tabela_taxas.rows.append(
                     ft.DataRow(cells=[
-                        ft.DataCell(ft.Text(taxa['cidade'])),
-                        ft.DataCell(ft.Text(taxa['bairro'])),
+                        ft.DataCell(ft.Text(taxa['estado'])),
+                        ft.DataCell(ft.Text(taxa['cidade'] or "Todas")),
+                        ft.DataCell(ft.Text(taxa['bairro'] or "Todos")),
                         ft.DataCell(ft.Text(f"R$ {taxa['valor']:.2f}")),
                         ft.DataCell(ft.IconButton(
                             icon=ft.Icons.DELETE,
@@ -284,8 +399,12 @@ def PainelAdmView(page: ft.Page):
 
     def cadastrar_taxa_click(e):
         vendedor_id = page.session.get("user_id")
-        if not all([cidade_taxa.value, bairro_taxa.value, estado_taxa.value, valor_taxa.value]):
-            show_snackbar("Todos os campos da taxa de entrega são obrigatórios.", ft.Colors.ORANGE)
+        cidade, bairro, estado = (c.value.strip() for c in (cidade_taxa, bairro_taxa, estado_taxa))
+        if not all([estado, valor_taxa.value]):
+            show_snackbar("Estado e valor da taxa de entrega são obrigatórios.", ft.Colors.ORANGE)
+            return
+        if bairro and not cidade:
+            show_snackbar("Informe a cidade do bairro.", ft.Colors.ORANGE)
             return
         try:
             valor = float(valor_taxa.value.replace(',', '.'))
@@ -295,9 +414,9 @@ def PainelAdmView(page: ft.Page):
 
         cadastrar_taxa_entrega(
             vendedor_id=vendedor_id,
-            cidade=cidade_taxa.value,
-            bairro=bairro_taxa.value,
-            estado=estado_taxa.value,
+            cidade=cidade,
+            bairro=bairro,
+            estado=estado,
             valor=valor
         )
         show_snackbar("Taxa de entrega cadastrada com sucesso!", ft.Colors.GREEN)
@@ -306,23 +425,70 @@ def PainelAdmView(page: ft.Page):
         bairro_taxa.value = ""
         estado_taxa.value = ""
         valor_taxa.value = ""
-        carregar_taxas()
+        page.run_task(carregar_taxas)
 
     def excluir_taxa_click(e):
         taxa_id = e.control.data
         vendedor_id = page.session.get("user_id")
         if delete_taxa_entrega(taxa_id, vendedor_id):
             show_snackbar("Taxa de entrega excluída com sucesso!", ft.Colors.GREEN)
-            carregar_taxas()
+            page.run_task(carregar_taxas)
         else:
             show_snackbar("Erro ao excluir a taxa.", ft.Colors.RED)
 
     # --- COMPONENTES DA ABA "PEDIDOS RECEBIDOS" ---
     lista_pedidos = ft.ListView(expand=True, spacing=10)
 
-    def carregar_pedidos():
+    # Exportação para contabilidade (CSV/JSONL), gravada em streaming pelo módulo exportacao
+    inicio_exportacao = ft.TextField(label="De (DD/MM/AAAA)", width=180)
+    fim_exportacao = ft.TextField(label="Até (DD/MM/AAAA)", width=180)
+    formato_exportacao = ft.Dropdown(
+        label="Formato", width=130, value="csv",
+        options=[ft.dropdown.Option("csv", "CSV"), ft.dropdown.Option("jsonl", "JSONL")],
+    )
+    status_exportacao = ft.Text("")
+
+    def data_iso(campo):
+        """Converte DD/MM/AAAA do campo para AAAA-MM-DD (None se vazio)."""
+        if not campo.value:
+            return None
+        return datetime.strptime(campo.value.strip(), '%d/%m/%Y').strftime('%Y-%m-%d')
+
+    def on_exportacao_result(e: ft.FilePickerResultEvent):
+        if not e.path:
+            return
         vendedor_id = page.session.get("user_id")
-        pedidos_db = get_pedidos_by_vendedor(vendedor_id)
+        try:
+            inicio, fim = data_iso(inicio_exportacao), data_iso(fim_exportacao)
+        except ValueError:
+            show_snackbar("Datas devem estar no formato DD/MM/AAAA.", ft.Colors.RED)
+            return
+
+        def atualizar_progresso(pedidos):
+            status_exportacao.value = f"{pedidos} pedidos exportados..."
+            page.update()
+
+        caminho = e.path
+        if not caminho.lower().endswith("." + formato_exportacao.value):
+            caminho += "." + formato_exportacao.value
+        try:
+            resultado = exportar_pedidos(vendedor_id, caminho, formato_exportacao.value, inicio, fim, progresso=atualizar_progresso)
+        except (OSError, ValueError, sqlite3.Error) as ex:
+            # sqlite3.Error: banco bloqueado ou ocupado durante a leitura dos pedidos
+            status_exportacao.value = f"Erro ao exportar: {ex}"  # no lugar do progresso parcial
+            show_snackbar(f"Erro ao exportar: {ex}", ft.Colors.RED)
+            return
+        status_exportacao.value = f"{resultado['pedidos']} pedidos ({resultado['itens']} itens) exportados para {resultado['caminho']}"
+        show_snackbar("Exportação concluída!", ft.Colors.GREEN)
+
+    exportacao_picker = ft.FilePicker(on_result=on_exportacao_result)
+    page.overlay.append(exportacao_picker)
+
+    async def carregar_pedidos():
+        vendedor_id = page.session.get("user_id")
+        pedidos_db = await consultar(get_pedidos_by_vendedor, vendedor_id)
+        if pedidos_db is None:
+            return
         lista_pedidos.controls.clear()
 
         if not pedidos_db:
@@ -359,22 +525,88 @@ def PainelAdmView(page: ft.Page):
         page.update()
 
 
+    # --- COMPONENTES DA ABA "VENDAS" ---
+    # Lê só o resumo diário (vendas_diarias), nunca a tabela de pedidos
+    periodo_vendas = ft.Dropdown(
+        label="Período", width=180, value="30",
+        options=[ft.dropdown.Option("7", "Últimos 7 dias"), ft.dropdown.Option("30", "Últimos 30 dias"),
+                 ft.dropdown.Option("90", "Últimos 90 dias"), ft.dropdown.Option("365", "Últimos 12 meses")],
+        on_change=lambda e: page.run_task(carregar_vendas),
+    )
+    receita_vendas = ft.Text("R$ 0.00", size=24, weight="bold", color=ft.Colors.GREEN_700)
+    pedidos_vendas = ft.Text("0", size=24, weight="bold")
+    ticket_vendas = ft.Text("R$ 0.00", size=24, weight="bold")
+    # A receita é o total dos pedidos; a dos produtos (lista abaixo) não inclui a entrega
+    composicao_receita = ft.Text(size=12, color=ft.Colors.GREY_600)
+    grafico_vendas = ft.Row(spacing=2, height=120, vertical_alignment=ft.CrossAxisAlignment.END, scroll=ft.ScrollMode.AUTO)
+    lista_top_produtos = ft.Column(spacing=5)
+
+    def card_metrica(titulo, valor, detalhe=None):
+        linhas = [ft.Text(titulo, color=ft.Colors.GREY_600), valor] + ([detalhe] if detalhe else [])
+        return ft.Card(
+            ft.Container(ft.Column(linhas), padding=15),
+            expand=True,
+        )
+
+    async def carregar_vendas():
+        vendedor_id = page.session.get("user_id")
+        resumo = await consultar(get_resumo_vendas, vendedor_id, dias=int(periodo_vendas.value))
+        if resumo is None:
+            return
+        receita_vendas.value = f"R$ {resumo['receita']:.2f}"
+        composicao_receita.value = f"Produtos R$ {resumo['receita_produtos']:.2f} + entrega R$ {resumo['taxas_entrega']:.2f}"
+        pedidos_vendas.value = str(resumo['pedidos'])
+        ticket_vendas.value = f"R$ {resumo['ticket_medio']:.2f}"
+
+        # Barras simples da receita por dia (só os dias com vendas)
+        grafico_vendas.controls.clear()
+        maior = max((d['receita'] for d in resumo['por_dia']), default=0)
+        for dia in resumo['por_dia']:
+            grafico_vendas.controls.append(
+                ft.Container(
+                    width=12,
+                    height=max(100 * dia['receita'] / maior, 2) if maior > 0 else 2,
+                    bgcolor=ft.Colors.GREEN_400,
+                    tooltip=f"{datetime.strptime(dia['dia'], '%Y-%m-%d').strftime('%d/%m/%Y')}: "
+                            f"{dia['pedidos']} pedidos, R$ {dia['receita']:.2f}",
+                )
+            )
+
+        lista_top_produtos.controls.clear()
+        if not resumo['top_produtos']:
+            lista_top_produtos.controls.append(ft.Text("Nenhuma venda no período."))
+        for posicao, produto in enumerate(resumo['top_produtos'], start=1):
+            lista_top_produtos.controls.append(
+                ft.Row([
+                    ft.Text(f"{posicao}. {produto['nome']}", expand=True),
+                    ft.Text(f"{produto['quantidade']} un."),
+                    ft.Text(f"R$ {produto['receita']:.2f}", weight="bold", width=120, text_align=ft.TextAlign.RIGHT),
+                ])
+            )
+        page.update()
+
     # Carrega as categorias ao iniciar a view
-    def on_tab_change(e):
+    # Os carregadores são assíncronos (db_async): trocar de aba não trava a tela
+    # enquanto a consulta roda. Handlers síncronos os agendam com page.run_task.
+    async def on_tab_change(e):
         selected_tab = e.control.selected_index
         if selected_tab == 0:  # Aba "Cadastrar Produto"
-            carregar_categorias()
+            await carregar_categorias()
         elif selected_tab == 1:  # Aba "Gerenciar Produtos"
-            carregar_produtos()
+            await carregar_produtos()
         elif selected_tab == 2:  # Aba "Gerenciar Categorias"
-            carregar_categorias()
+            await carregar_categorias()
         elif selected_tab == 3: # Aba "Taxas de Entrega"
-            carregar_taxas()
+            await carregar_taxas()
         elif selected_tab == 4: # Aba "Pedidos Recebidos"
-            carregar_pedidos()
+            await carregar_pedidos()
+        elif selected_tab == 5: # Aba "Importar Produtos"
+            await carregar_categorias()
+        elif selected_tab == 6: # Aba "Vendas"
+            await carregar_vendas()
 
     # Carrega as categorias para o dropdown de cadastro assim que a view é criada
-    carregar_categorias()
+    page.run_task(carregar_categorias)
 
     # --- LAYOUT DA VIEW ---
     return ft.View(
@@ -496,10 +728,82 @@ def PainelAdmView(page: ft.Page):
                                 text="Pedidos Recebidos",
                                 icon=ft.Icons.INVENTORY,
                                 content=ft.Container(
-                                    content=lista_pedidos,
+                                    ft.Column([
+                                        ft.Text("Exportar Pedidos", weight="bold"),
+                                        ft.Row([
+                                            inicio_exportacao,
+                                            fim_exportacao,
+                                            formato_exportacao,
+                                            ft.ElevatedButton(
+                                                "Exportar",
+                                                icon=ft.Icons.DOWNLOAD,
+                                                on_click=lambda _: exportacao_picker.save_file(
+                                                    file_name=f"pedidos.{formato_exportacao.value}",
+                                                    allowed_extensions=["csv", "jsonl"])
+                                            ),
+                                        ], wrap=True),
+                                        status_exportacao,
+                                        ft.Divider(),
+                                        ft.Container(content=lista_pedidos, height=500),
+                                    ], spacing=15),
                                     padding=ft.padding.symmetric(vertical=20),
                                 )
                             ),
+                            ft.Tab(
+                                text="Importar Produtos",
+                                icon=ft.Icons.UPLOAD_FILE,
+                                content=ft.Container(
+                                    ft.Column([
+                                        ft.Text("Importar Produtos em Massa", weight="bold"),
+                                        ft.Text(
+                                            "Arquivo CSV ou JSONL com as colunas: nome, descricao, categoria, preco, quantidade e imagem. "
+                                            "Categorias que não existem são criadas; 'imagem' é o nome do arquivo na pasta de imagens.",
+                                            size=12, color=ft.Colors.GREY_600),
+                                        ft.Row([
+                                            ft.ElevatedButton(
+                                                "Selecionar Arquivo",
+                                                icon=ft.Icons.DESCRIPTION,
+                                                on_click=lambda _: arquivo_importacao_picker.pick_files(
+                                                    allow_multiple=False, allowed_extensions=["csv", "jsonl"])
+                                            ),
+                                            nome_arquivo_importacao,
+                                        ]),
+                                        ft.Row([
+                                            ft.ElevatedButton(
+                                                "Pasta de Imagens",
+                                                icon=ft.Icons.FOLDER_OPEN,
+                                                on_click=lambda _: pasta_imagens_picker.get_directory_path()
+                                            ),
+                                            path_pasta_imagens,
+                                        ]),
+                                        importar_button,
+                                        progresso_importacao,
+                                        status_importacao,
+                                        lista_erros_importacao,
+                                    ], spacing=15),
+                                    padding=ft.padding.symmetric(vertical=20)
+                                )
+                            ),
+                            ft.Tab(
+                                text="Vendas",
+                                icon=ft.Icons.BAR_CHART,
+                                content=ft.Container(
+                                    ft.Column([
+                                        periodo_vendas,
+                                        ft.Row([
+                                            card_metrica("Receita", receita_vendas, composicao_receita),
+                                            card_metrica("Pedidos", pedidos_vendas),
+                                            card_metrica("Ticket médio", ticket_vendas),
+                                        ]),
+                                        ft.Text("Receita por dia", weight="bold"),
+                                        grafico_vendas,
+                                        ft.Divider(),
+                                        ft.Text("Produtos mais vendidos (receita sem a taxa de entrega)", weight="bold"),
+                                        lista_top_produtos,
+                                    ], spacing=15),
+                                    padding=ft.padding.symmetric(vertical=20)
+                                )
+                            ),
                         ],
                         expand=1,
                     ),
@@ -0,0 +1,108 @@
+# rotas.py
+"""
+Registro de rotas do app com carregamento preguiçoso das views.
+
+Cada rota aponta para "modulo:Funcao" e o módulo só é importado na primeira
+vez que a rota é visitada: o servidor sobe e abre sessões sem carregar o
+painel do vendedor, o carrinho etc. A maioria das sessões nunca passa da
+home e das lojas.
+
+Rotas com parâmetros usam chaves no padrão e são compiladas uma vez em
+expressões regulares:
+
+    rotas.registrar("/lojas/{slug}", "lojas.lojas_produtos:LojasProdutosView")
+    rotas.registrar("/editar_produto/{id:int}", "vendedor.editar_produto:EditarProdutoView")
+
+Os parâmetros são passados à view na ordem do padrão, depois de 'page'.
+"""
+import importlib
+import re
+import threading
+
+# Tipo do parâmetro -> (expressão, conversão)
+TIPOS = {
+    "str": (r"[^/]+", str),
+    "int": (r"\d+", int),
+}
+_PARAMETRO = re.compile(r"\{(\w+)(?::(\w+))?\}")
+
+
+def _compilar(padrao):
+    """'/lojas/{slug}' -> (regex, [conversões]) na ordem dos parâmetros."""
+    partes = []
+    conversoes = []
+    posicao = 0
+    for parametro in _PARAMETRO.finditer(padrao):
+        tipo = parametro.group(2) or "str"
+        if tipo not in TIPOS:
+            raise ValueError(f"Tipo de parâmetro desconhecido na rota {padrao}: {tipo}")
+        expressao, conversao = TIPOS[tipo]
+        partes.append(re.escape(padrao[posicao:parametro.start()]))
+        partes.append(f"({expressao})")
+        conversoes.append(conversao)
+        posicao = parametro.end()
+    partes.append(re.escape(padrao[posicao:]))
+    return re.compile("".join(partes) + r"\Z"), conversoes
+
+
+class Rotas:
+    """Rotas estáticas em um dict; rotas com parâmetros testadas em ordem de registro."""
+
+    def __init__(self, padrao=None):
+        self.padrao = padrao  # alvo usado quando nenhuma rota casa
+        self._estaticas = {}
+        self._dinamicas = []  # (regex, conversões, alvo)
+        self._carregadas = {}  # "modulo:Funcao" -> função da view
+        self._lock = threading.Lock()
+
+    def registrar(self, padrao, alvo, repassar=True):
+        """
+        alvo é "modulo:Funcao" (importado na primeira visita) ou a própria
+        função da view. Com repassar=False os parâmetros casam a rota mas não
+        são passados à view (ex.: voltar ao painel quando o id é inválido).
+        """
+        if _PARAMETRO.search(padrao):
+            regex, conversoes = _compilar(padrao)
+            self._dinamicas.append((regex, conversoes if repassar else None, alvo))
+        else:
+            self._estaticas[padrao] = alvo
+
+    def _carregar(self, alvo):
+        if alvo is None or callable(alvo):
+            return alvo
+        view = self._carregadas.get(alvo)
+        if view is None:
+            # Duas sessões podem abrir a mesma rota ao mesmo tempo
+            with self._lock:
+                view = self._carregadas.get(alvo)
+                if view is None:
+                    modulo, nome = alvo.split(":")
+                    view = getattr(importlib.import_module(modulo), nome)
+                    self._carregadas[alvo] = view
+        return view
+
+    def resolver(self, rota):
+        """Retorna (view, parametros) da rota; sem rota correspondente, (padrao, ())."""
+        rota = rota.split("?", 1)[0]
+        if len(rota) > 1:
+            rota = rota.rstrip("/")  # "/lojas/" é a mesma rota que "/lojas"
+        alvo = self._estaticas.get(rota)
+        if alvo is not None:
+            return self._carregar(alvo), ()
+        for regex, conversoes, alvo in self._dinamicas:
+            encontrado = regex.match(rota)
+            if encontrado:
+                if conversoes is None:
+                    return self._carregar(alvo), ()
+                parametros = tuple(conversao(valor) for conversao, valor in zip(conversoes, encontrado.groups()))
+                return self._carregar(alvo), parametros
+        return self._carregar(self.padrao), ()
+
+    def precarregar(self):
+        """Importa todas as views (ex.: em segundo plano depois que o servidor subiu)."""
+        alvos = list(self._estaticas.values()) + [alvo for _, _, alvo in self._dinamicas]
+        for alvo in alvos:
+            self._carregar(alvo)
+
+    def carregadas(self):
+        return sorted(self._carregadas)
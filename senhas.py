@@ -0,0 +1,155 @@
+# senhas.py
+"""
+Hash de senhas com KDF com sal (scrypt ou PBKDF2-SHA256, ambos do hashlib).
+
+O custo é configurável por variáveis de ambiente, por exemplo:
+
+    APP_SENHA_ALGORITMO=pbkdf2_sha256 APP_SENHA_PBKDF2_ITERACOES=600000 python home.py
+
+O hash guarda o algoritmo e os parâmetros usados:
+
+    scrypt$16384$8$1$<sal base64>$<hash base64>
+    pbkdf2_sha256$600000$<sal base64>$<hash base64>
+
+Assim, quando o custo configurado muda, os hashes antigos continuam válidos e
+verificar() indica que devem ser refeitos: o login regrava o hash com o custo
+atual. Senhas antigas em texto puro (antes deste módulo) são aceitas do mesmo
+jeito e trocadas pelo hash no primeiro login. Um valor que começa com o nome de
+um algoritmo, mas não decodifica (truncado, corrompido), nunca confere.
+
+Quando não há conta para o e-mail, verificar(senha, None) roda o KDF contra um
+hash fictício: o login custa o mesmo tempo e não revela quais e-mails existem.
+
+O cálculo roda em um pool de threads próprio (o hashlib libera o GIL durante
+o KDF), limitado ao número de núcleos: vários logins simultâneos fazem fila em
+vez de disputar CPU e memória, e a thread que chama (nunca o loop da
+interface, ver db_async) só espera o resultado.
+"""
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+CONFIG = {
+    "algoritmo": os.environ.get("APP_SENHA_ALGORITMO", "scrypt"),
+    # scrypt: memória usada = 128 * n * r bytes (16 MiB com os valores padrão)
+    "scrypt_n": int(os.environ.get("APP_SENHA_SCRYPT_N", str(2 ** 14))),
+    "scrypt_r": int(os.environ.get("APP_SENHA_SCRYPT_R", "8")),
+    "scrypt_p": int(os.environ.get("APP_SENHA_SCRYPT_P", "1")),
+    "pbkdf2_iteracoes": int(os.environ.get("APP_SENHA_PBKDF2_ITERACOES", "600000")),
+    "threads": int(os.environ.get("APP_SENHA_THREADS", str(os.cpu_count() or 1))),
+}
+
+TAMANHO_SAL = 16
+TAMANHO_HASH = 32
+ALGORITMOS = ("scrypt", "pbkdf2_sha256")
+
+_executor = ThreadPoolExecutor(max_workers=CONFIG["threads"], thread_name_prefix="senhas")
+_ficticios = {}  # (algoritmo, parâmetros) -> hash de uma senha aleatória
+
+
+def _b64(dados):
+    return base64.b64encode(dados).decode("ascii")
+
+
+def _scrypt(senha, sal, n, r, p):
+    # maxmem com folga: o limite padrão do OpenSSL (32 MiB) barraria custos maiores
+    return hashlib.scrypt(senha, salt=sal, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024, dklen=TAMANHO_HASH)
+
+
+def _pbkdf2(senha, sal, iteracoes):
+    return hashlib.pbkdf2_hmac("sha256", senha, sal, iteracoes, dklen=TAMANHO_HASH)
+
+
+def _parametros_atuais():
+    algoritmo = CONFIG["algoritmo"]
+    if algoritmo == "scrypt":
+        return algoritmo, (CONFIG["scrypt_n"], CONFIG["scrypt_r"], CONFIG["scrypt_p"])
+    if algoritmo == "pbkdf2_sha256":
+        return algoritmo, (CONFIG["pbkdf2_iteracoes"],)
+    raise ValueError(f"Algoritmo de senha desconhecido: {algoritmo}")
+
+
+def _calcular(algoritmo, parametros, senha, sal):
+    senha = senha.encode("utf-8")
+    if algoritmo == "scrypt":
+        return _scrypt(senha, sal, *parametros)
+    return _pbkdf2(senha, sal, *parametros)
+
+
+def _gerar(senha):
+    algoritmo, parametros = _parametros_atuais()
+    sal = os.urandom(TAMANHO_SAL)
+    digest = _calcular(algoritmo, parametros, senha, sal)
+    return "$".join([algoritmo, *map(str, parametros), _b64(sal), _b64(digest)])
+
+
+def _decodificar(armazenado):
+    """'algoritmo$p1$...$sal$hash' -> (algoritmo, parametros, sal, hash); None se não for um hash deste módulo."""
+    partes = armazenado.split("$")
+    if partes[0] not in ALGORITMOS:
+        return None
+    try:
+        parametros = tuple(int(p) for p in partes[1:-2])
+        sal, digest = base64.b64decode(partes[-2]), base64.b64decode(partes[-1])
+    except (ValueError, IndexError):
+        return None
+    esperado = 3 if partes[0] == "scrypt" else 1
+    if len(parametros) != esperado:
+        return None
+    return partes[0], parametros, sal, digest
+
+
+def _hash_ficticio():
+    """Hash de uma senha que ninguém conhece, com o custo atual (refeito se o custo mudar)."""
+    chave = _parametros_atuais()
+    ficticio = _ficticios.get(chave)
+    if ficticio is None:
+        ficticio = _ficticios[chave] = _gerar(_b64(os.urandom(TAMANHO_SAL)))
+    return ficticio
+
+
+def _verificar(senha, armazenado):
+    if armazenado is None:
+        # Conta inexistente ou inativa: mesmo custo de uma senha errada
+        _verificar(senha, _hash_ficticio())
+        return False, False
+    decodificado = _decodificar(armazenado)
+    if decodificado is None:
+        if armazenado.split("$", 1)[0] in ALGORITMOS:
+            # Parece um hash, mas está corrompido: não vira senha em texto puro
+            return False, False
+        # Senha gravada em texto puro antes dos hashes
+        return hmac.compare_digest(senha.encode("utf-8"), armazenado.encode("utf-8")), True
+    algoritmo, parametros, sal, digest = decodificado
+    ok = hmac.compare_digest(_calcular(algoritmo, parametros, senha, sal), digest)
+    return ok, (algoritmo, parametros) != _parametros_atuais()
+
+
+# --- API ---
+def gerar_hash(senha):
+    """Hash da senha com o algoritmo e o custo configurados (calculado no pool de senhas)."""
+    return agendar_hash(senha).result()
+
+
+def agendar_hash(senha):
+    """Como gerar_hash, mas sem esperar: retorna o Future do hash."""
+    return _executor.submit(_gerar, senha)
+
+
+def texto_puro(armazenado):
+    """True se o valor gravado é uma senha antiga em texto puro (nem hash, nem hash corrompido)."""
+    return bool(armazenado) and armazenado.split("$", 1)[0] not in ALGORITMOS
+
+
+def verificar(senha, armazenado):
+    """
+    Confere a senha com o valor gravado (hash ou texto puro antigo).
+    Retorna (ok, precisa_atualizar): precisa_atualizar indica que o valor
+    gravado deve ser trocado por gerar_hash(senha) depois de um login válido.
+    armazenado=None (conta não encontrada) gasta o mesmo tempo e retorna (False, False).
+    """
+    if armazenado == "":
+        return False, False
+    return _executor.submit(_verificar, senha, armazenado).result()
@@ -0,0 +1,175 @@
+# sessoes.py
+"""
+Contabilidade de memória das sessões do Flet e tokens de login.
+
+As views chamam registrar_memoria(page) depois de alterar dados da sessão
+(ex.: carrinho) para acompanhar quanto cada sessão ocupa no servidor.
+"""
+import os
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+
+import db
+from cache import CacheTTL
+
+_lock = threading.Lock()
+_memoria = {}  # session_id -> bytes aproximados
+
+
+def tamanho_aproximado(valor, _vistos=None):
+    """Soma recursiva de sys.getsizeof para dicts, listas, tuplas e sets."""
+    if _vistos is None:
+        _vistos = set()
+    if id(valor) in _vistos:
+        return 0
+    _vistos.add(id(valor))
+    total = sys.getsizeof(valor)
+    if isinstance(valor, dict):
+        for chave, item in valor.items():
+            total += tamanho_aproximado(chave, _vistos) + tamanho_aproximado(item, _vistos)
+    elif isinstance(valor, (list, tuple, set, frozenset)):
+        for item in valor:
+            total += tamanho_aproximado(item, _vistos)
+    return total
+
+
+def registrar_memoria(page, chaves=("cart",)):
+    """Mede as chaves informadas da sessão da página e guarda o total."""
+    total = 0
+    for chave in chaves:
+        if page.session.contains_key(chave):
+            total += tamanho_aproximado(page.session.get(chave))
+    with _lock:
+        _memoria[page.session_id] = total
+    return total
+
+
+def esquecer_sessao(session_id):
+    with _lock:
+        _memoria.pop(session_id, None)
+
+
+def get_memoria_sessoes():
+    """Resumo do uso de memória: total, média e maior sessão (em bytes)."""
+    with _lock:
+        valores = list(_memoria.values())
+    return {
+        "sessoes": len(valores),
+        "total": sum(valores),
+        "media": sum(valores) / len(valores) if valores else 0,
+        "maior": max(valores) if valores else 0,
+    }
+
+
+# --- TOKENS DE LOGIN ---
+# Depois do login a conta fica em memória associada a um token aleatório, que o
+# navegador guarda (client_storage). Uma nova sessão do mesmo navegador (aba
+# nova, reconexão) restaura o login pelo token, sem recalcular o hash da senha
+# (só uma consulta pela chave primária confere se a conta segue ativa). Os tokens expiram em TTL_TOKEN e se perdem quando
+# o servidor reinicia: aí o usuário só precisa entrar de novo.
+#
+# Quando a senha de uma conta sai do texto puro para o hash ou a conta é
+# desativada (evento "conta" do db.py), os tokens dela criados antes disso
+# deixam de valer. Refazer o hash com outro custo não revoga nada.
+# restaurar() ainda confere no banco se a conta continua ativa, o que cobre
+# contas desativadas fora do app.
+TTL_TOKEN = float(os.environ.get("APP_SESSAO_TTL", str(8 * 3600)))  # segundos
+CHAVE_TOKEN = "mercado_aberto.token"  # chave no client_storage do navegador
+
+_tokens = CacheTTL(max_itens=int(os.environ.get("APP_SESSAO_MAX_TOKENS", "100000")), ttl=TTL_TOKEN)  # token -> (conta, criado_em)
+_revogadas = {}  # (tipo, conta_id) -> instante (time.monotonic) antes do qual os tokens não valem
+
+
+def criar_token(conta):
+    """Guarda a conta autenticada ({"id", "name", "email", "type"}) e retorna o token."""
+    token = secrets.token_urlsafe(32)
+    _tokens.set(token, (dict(conta), time.monotonic()))
+    return token
+
+
+def conta_do_token(token):
+    """Conta do token, ou None se ele não existir, tiver expirado ou sido revogado."""
+    if not token:
+        return None
+    achou, valor = _tokens.get(token)
+    if not achou:
+        return None
+    conta, criado_em = valor
+    with _lock:
+        revogada_em = _revogadas.get((conta["type"], conta["id"]))
+    if revogada_em is not None and criado_em <= revogada_em:
+        _tokens.invalidar(token)
+        return None
+    return dict(conta)
+
+
+def revogar_token(token):
+    if token:
+        _tokens.invalidar(token)
+
+
+def revogar_conta(tipo, conta_id, antes_de=None):
+    """Invalida os tokens da conta criados até 'antes_de' (time.monotonic; padrão: agora)."""
+    antes_de = time.monotonic() if antes_de is None else antes_de
+    with _lock:
+        chave = (tipo, conta_id)
+        _revogadas[chave] = max(_revogadas.get(chave, antes_de), antes_de)
+
+
+db.ouvir("conta", revogar_conta)
+
+
+def get_tokens_stats():
+    return _tokens.stats()
+
+
+def _abrir_sessao(page, conta, token):
+    page.session.set("user_name", conta["name"])
+    page.session.set("user_id", conta["id"])
+    page.session.set("user_type", conta["type"])
+    page.session.set("token", token)
+
+
+def entrar(page, conta):
+    """Inicia a sessão da página com a conta autenticada e lembra o login no navegador."""
+    token = criar_token(conta)
+    # O login anterior deste navegador (outra conta ou a mesma) deixa de valer
+    revogar_token(page.client_storage.get(CHAVE_TOKEN))
+    revogar_token(page.session.get("token"))
+    # Limpa a sessão antiga antes de armazenar os dados do usuário
+    page.session.clear()
+    _abrir_sessao(page, conta, token)
+    page.client_storage.set(CHAVE_TOKEN, token)
+    return token
+
+
+def restaurar(page):
+    """Restaura o login de uma sessão nova a partir do token do navegador. Retorna a conta ou None."""
+    token = page.client_storage.get(CHAVE_TOKEN)
+    conta = conta_do_token(token)
+    if conta is not None:
+        try:
+            ativa = db.conta_ativa(conta["type"], conta["id"])
+        except sqlite3.Error as e:
+            # Sem como conferir agora: não restaura, mas mantém o token para a próxima sessão
+            print(f"Erro ao restaurar o login: {e}")
+            return None
+        if not ativa:
+            revogar_token(token)
+            conta = None
+    if conta is None:
+        if token:
+            page.client_storage.remove(CHAVE_TOKEN)
+        return None
+    _abrir_sessao(page, conta, token)
+    return conta
+
+
+def sair(page):
+    """Encerra o login: revoga o token e limpa a sessão e o navegador."""
+    revogar_token(page.session.get("token"))
+    page.session.clear()
+    page.client_storage.remove(CHAVE_TOKEN)
@@ -1,10 +1,19 @@
 import flet as ft
-from db import get_connection
+from db import get_taxas_by_vendedor
 
 def TaxaEntregaView(page: ft.Page):
     """
-    Página para gerenciar taxas de entrega.
+    Página com as taxas de entrega do vendedor logado.
     """
+    # Só o vendedor vê (e só as suas) taxas; o cadastro fica no painel
+    if page.session.get("user_type") != "vendedor":
+        page.go("/login")
+        return ft.View(
+            "/taxa_entrega",
+            [ft.Text("Acesso negado. Redirecionando...", weight="bold")],
+            vertical_alignment=ft.MainAxisAlignment.CENTER,
+            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+        )
 
     taxa_list = ft.DataTable(
         columns=[
@@ -18,33 +27,30 @@ def TaxaEntregaView(page: ft.Page):
     )
 
     def load_taxas():
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT cidade, bairro, estado, valor FROM taxa_entrega")
-        taxas = cursor.fetchall()
-        conn.close()
+        # Consulta pelo índice de vendedor_id, em vez de ler a tabela de todas as lojas
+        taxas = get_taxas_by_vendedor(page.session.get("user_id"))
 
         taxa_list.rows.clear()
         for taxa in taxas:
-            cidade, bairro, estado, valor = taxa
             taxa_list.rows.append(
                 ft.DataRow(
                     cells=[
-                        ft.DataCell(ft.Text(cidade)),
-                        ft.DataCell(ft.Text(bairro)),
-                        ft.DataCell(ft.Text(estado)),
-                        ft.DataCell(ft.Text(f"R$ {valor:.2f}")),
+                        # Campo vazio: a taxa vale para toda a cidade (ou todo o estado)
+                        ft.DataCell(ft.Text(taxa["cidade"] or "Todas")),
+                        ft.DataCell(ft.Text(taxa["bairro"] or "Todos")),
+                        ft.DataCell(ft.Text(taxa["estado"])),
+                        ft.DataCell(ft.Text(f"R$ {taxa['valor']:.2f}")),
                     ]
                 )
             )
-        page.update()
 
     load_taxas()
 
-    return ft.Column(
+    return ft.View(
+        "/taxa_entrega",
         [
             ft.Text("Taxas de Entrega", size=24, weight="bold"),
             taxa_list,
         ],
-        expand=True,
+        scroll=ft.ScrollMode.AUTO,
     )
\ No newline at end of file
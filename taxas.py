@@ -0,0 +1,93 @@
+# taxas.py
+"""
+Taxa de entrega de cada loja para um endereço, calculada em memória.
+
+As taxas cadastradas no painel (tabela taxa_entrega) viram, por loja, um dict
+indexado por (estado, cidade, bairro) normalizados: minúsculas, sem acentos e
+sem pontuação, como os slugs (db._generate_slug). "São Paulo", "sao paulo" e
+"SAO  PAULO" caem na mesma chave. A procura vai do mais específico ao mais
+geral:
+
+    bairro da cidade -> cidade inteira (bairro vazio) -> estado inteiro (cidade e bairro vazios)
+
+O índice de uma loja é montado na primeira consulta e descartado quando as
+taxas dela mudam (evento "taxa" do db.py). A consulta roda a cada tecla no
+formulário de endereço do carrinho, por isso não vai ao banco: são até três
+buscas em dict, mais a normalização dos textos (também em cache). Se o banco
+falhar ao montar o índice, o erro sobe e nada fica em cache: uma falha não
+pode virar "loja sem taxas" (entrega grátis).
+
+No checkout, as taxas são calculadas antes de enviar a escrita
+(fretes_do_carrinho), e não dentro da transação do escritor.
+"""
+from functools import lru_cache
+
+import db
+from cache import CacheTTL
+from catalogo import get_resumos
+
+TTL_INDICE = 3600  # segundos; cadastros e exclusões pelo app invalidam na hora
+
+_indices = CacheTTL(max_itens=4096, ttl=TTL_INDICE)  # vendedor_id -> {(estado, cidade, bairro): valor}
+
+# Os mesmos nomes de cidade e bairro se repetem a cada tecla e entre compradores
+_normalizar = lru_cache(maxsize=8192)(db._generate_slug)
+
+
+def _taxas_mudaram(vendedor_id):
+    _indices.invalidar(vendedor_id)
+
+
+db.ouvir("taxa", _taxas_mudaram)
+
+
+def _chave(estado, cidade, bairro):
+    return _normalizar(estado or ""), _normalizar(cidade or ""), _normalizar(bairro or "")
+
+
+def _indice(vendedor_id):
+    achou, indice = _indices.get(vendedor_id)
+    if achou:
+        return indice
+    geracao = _indices.geracao
+    indice = {}
+    # Mais de uma taxa para o mesmo lugar: vale a cadastrada por último
+    for taxa in sorted(db.ler_taxas_vendedor(vendedor_id), key=lambda t: t["id"]):
+        indice[_chave(taxa["estado"], taxa["cidade"], taxa["bairro"])] = taxa["valor"]
+    _indices.set(vendedor_id, indice, geracao)
+    return indice
+
+
+def taxa_entrega(vendedor_id, estado, cidade, bairro):
+    """
+    Taxa da loja para o endereço: a do bairro, senão a da cidade, senão a do estado.
+    Retorna 0.0 se a loja não cadastrou nenhuma taxa (entrega sem custo, como
+    antes das taxas) e None se ela tem taxas, mas nenhuma cobre o endereço.
+    Levanta sqlite3.Error se as taxas da loja não puderem ser lidas.
+    """
+    indice = _indice(vendedor_id)
+    if not indice:
+        return 0.0
+    estado, cidade, bairro = _chave(estado, cidade, bairro)
+    valor = indice.get((estado, cidade, bairro))
+    if valor is None:
+        valor = indice.get((estado, cidade, ""))
+        if valor is None:
+            valor = indice.get((estado, "", ""))
+    return valor
+
+
+def taxas_por_loja(vendedor_ids, endereco):
+    """{vendedor_id: taxa ou None} para o endereço (dict com estado, cidade e bairro)."""
+    estado, cidade, bairro = endereco.get("estado"), endereco.get("cidade"), endereco.get("bairro")
+    return {vendedor_id: taxa_entrega(vendedor_id, estado, cidade, bairro) for vendedor_id in vendedor_ids}
+
+
+def fretes_do_carrinho(carrinho, endereco):
+    """Taxas das lojas do carrinho da sessão para o endereço, no formato de db.checkout_carrinho(fretes=...)."""
+    vendedores = {resumo["vendedor_id"] for resumo in get_resumos(carrinho.keys()).values()}
+    return taxas_por_loja(vendedores, endereco)
+
+
+def get_cache_stats():
+    return {"indices": _indices.stats(), "normalizacao": _normalizar.cache_info()._asdict()}